@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Compare cluster resource allocation strategies.
+
+"legacy" is the original read-check-write allocation: load the cluster,
+compare in Python, subtract, commit and refresh. "conditional" is the
+current single guarded UPDATE on the integer counters in src.services.cluster.
+For each strategy the benchmark reports:
+
+- allocations per second: allocate/release pairs on one session
+- overcommit: many threads, each with its own session, race to allocate
+  one unit from a cluster with fewer units than threads. Any successes
+  beyond capacity (or negative availability) mean the cluster was
+  overcommitted.
+
+Usage:
+    python -m benchmarks.allocation_benchmark [--allocations 5000] [--threads 16] [--capacity 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.models.base import Base
+from src.models.models import Cluster
+from src.services import cluster as cluster_service
+from src.utils.resources import to_units
+
+
+def legacy_allocate(db: Session, cluster_id: int, ram: float, cpu: float, gpu: float) -> bool:
+    """The original read-modify-write allocation, kept for comparison."""
+    db_cluster = db.query(Cluster).filter(Cluster.id == cluster_id).first()
+    if not db_cluster:
+        return False
+    if (db_cluster.available_ram < ram or
+        db_cluster.available_cpu < cpu or
+        db_cluster.available_gpu < gpu):
+        return False
+    db_cluster.available_ram -= ram
+    db_cluster.available_cpu -= cpu
+    db_cluster.available_gpu -= gpu
+    db.commit()
+    db.refresh(db_cluster)
+    return True
+
+
+def legacy_release(db: Session, cluster_id: int, ram: float, cpu: float, gpu: float) -> bool:
+    """The original read-modify-write release, kept for comparison."""
+    db_cluster = db.query(Cluster).filter(Cluster.id == cluster_id).first()
+    if not db_cluster:
+        return False
+    db_cluster.available_ram = min(db_cluster.available_ram + ram, db_cluster.total_ram)
+    db_cluster.available_cpu = min(db_cluster.available_cpu + cpu, db_cluster.total_cpu)
+    db_cluster.available_gpu = min(db_cluster.available_gpu + gpu, db_cluster.total_gpu)
+    db.commit()
+    db.refresh(db_cluster)
+    return True
+
+
+STRATEGIES = {
+    "legacy": (legacy_allocate, legacy_release),
+    "conditional": (cluster_service.allocate_cluster_resources, cluster_service.release_cluster_resources),
+}
+
+
+def make_cluster(session_factory, capacity: float) -> int:
+    db = session_factory()
+    ram_mib, cpu_millicores, _ = to_units(capacity, capacity, 0.0)
+    cluster = Cluster(
+        name="bench",
+        total_ram=capacity, total_cpu=capacity, total_gpu=0.0,
+        available_ram=capacity, available_cpu=capacity, available_gpu=0.0,
+        total_ram_mib=ram_mib, total_cpu_millicores=cpu_millicores
+    )
+    db.add(cluster)
+    db.commit()
+    cluster_id = cluster.id
+    db.close()
+    return cluster_id
+
+
+def measure_throughput(session_factory, allocate, release, allocations: int) -> float:
+    """Allocate/release pairs per second on a single session."""
+    cluster_id = make_cluster(session_factory, 1.0)
+    db = session_factory()
+    start_time = time.perf_counter()
+    for _ in range(allocations):
+        allocate(db, cluster_id, 1.0, 1.0, 0.0)
+        release(db, cluster_id, 1.0, 1.0, 0.0)
+    elapsed = time.perf_counter() - start_time
+    db.close()
+    return allocations / elapsed
+
+
+def measure_overcommit(session_factory, allocate, threads: int, capacity: int):
+    """Race `threads` single-unit allocations against `capacity` units. Returns (successes, final available)."""
+    cluster_id = make_cluster(session_factory, float(capacity))
+    barrier = threading.Barrier(threads)
+    successes = []
+
+    def worker():
+        db = session_factory()
+        try:
+            barrier.wait()
+            if allocate(db, cluster_id, 1.0, 1.0, 0.0):
+                successes.append(1)
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    db = session_factory()
+    available = db.get(Cluster, cluster_id).available_cpu
+    db.close()
+    return len(successes), available
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--allocations", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(), "allocation.db")
+        database_url = f"sqlite:///{path}"
+
+    engine = create_engine(database_url, connect_args={"timeout": 30} if database_url.startswith("sqlite") else {})
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    print(f"{args.allocations} allocations; {args.threads} threads racing for {args.capacity} units")
+    print(f"{'strategy':<12} {'allocs/s':>10} {'succeeded':>10} {'available':>10}")
+    for name, (allocate, release) in STRATEGIES.items():
+        throughput = measure_throughput(session_factory, allocate, release, args.allocations)
+        successes, available = measure_overcommit(session_factory, allocate, args.threads, args.capacity)
+        flag = "  OVERCOMMITTED" if successes > args.capacity or available < 0 else ""
+        print(f"{name:<12} {throughput:>10.0f} {successes:>10} {available:>10.1f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Measure the hot queries before and after finished deployments are archived.
+
+The fixture is a long-lived installation: --rows deployments, of which one
+in --live-every is pending or running and the rest finished at some point
+over the past year, spread over --clusters clusters and --users users, with
+a dependency edge on every seventh deployment. The benchmark times:
+
+- snapshot: the scheduler loading a cluster's capacity, ready queue and
+  running set (DeploymentScheduler._load_snapshot)
+- user page: the first page of a user's deployments (GET /deployments)
+- user running: the first page of a user's running deployments
+
+then runs the compaction job with --retention-days (src.services.history)
+and times the same queries again on the smaller live table. It reports the
+mean and p95 of each query, the live row count, and the compaction rate.
+
+Usage:
+    python -m benchmarks.archive_benchmark [--rows 10000000] [--live-every 1000] [--samples 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from src.models.models import Deployment
+from src.models.schemas import DeploymentStatusEnum
+from src.scheduler.scheduler import DeploymentScheduler
+from src.services import deployment as deployment_service
+from src.services.history import compact_history
+from src.utils.migrations import run_migrations
+
+
+def seed(engine, rows: int, live_every: int, clusters: int, users: int):
+    """Fill a migrated SQLite database with the fixture, in a few set-based statements."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"""
+            INSERT INTO clusters (
+                id, name, total_ram, total_cpu, total_gpu, available_ram, available_cpu, available_gpu,
+                total_ram_mib, total_cpu_millicores, total_gpu_milli,
+                allocated_ram_mib, allocated_cpu_millicores, allocated_gpu_milli
+            )
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {clusters})
+            SELECT i, 'bench-' || i, 1024.0, 256.0, 0.0, 1024.0, 256.0, 0.0, 1048576, 256000, 0, 0, 0, 0 FROM n
+        """)
+        # Live rows alternate between pending (ready) and running; the rest
+        # finished up to a year ago
+        conn.exec_driver_sql(f"""
+            INSERT INTO deployments (
+                name, docker_image, status, priority, required_ram, required_cpu, required_gpu,
+                cluster_id, user_id, created_at, started_at, finished_at, unmet_dependencies
+            )
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {rows}),
+            aged(i, at) AS (
+                SELECT i, datetime('now', '-' || (({rows} - i) * 31536000 / {rows}) || ' seconds') FROM n
+            )
+            SELECT
+                'bench-' || i, 'bench/image:latest',
+                CASE
+                    WHEN i % {live_every} = 0 THEN CASE (i / {live_every}) % 2 WHEN 0 THEN 'PENDING' ELSE 'RUNNING' END
+                    WHEN i % 20 = 1 THEN 'FAILED'
+                    WHEN i % 20 = 2 THEN 'CANCELLED'
+                    ELSE 'COMPLETED'
+                END,
+                CASE i % 3 WHEN 0 THEN 'LOW' WHEN 1 THEN 'MEDIUM' ELSE 'HIGH' END,
+                1.0, 1.0, 0.0,
+                i % {clusters} + 1, i % {users} + 1,
+                at, at, CASE WHEN i % {live_every} = 0 THEN NULL ELSE at END,
+                0
+            FROM aged
+        """)
+        conn.exec_driver_sql("""
+            INSERT INTO deployment_dependencies (dependent_id, dependency_id)
+            SELECT id, id - 1 FROM deployments WHERE id % 7 = 0
+        """)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def measure(session_factory, clusters: int, users: int, samples: int, rng: random.Random):
+    """Time each hot query on `samples` random clusters or users. Returns {query: [ms, ...]}."""
+    db = session_factory()
+    scheduler = DeploymentScheduler(db)
+
+    def snapshot():
+        scheduler._load_snapshot(rng.randint(1, clusters))
+        db.rollback()
+
+    def user_page():
+        db.execute(deployment_service._user_deployments_select(rng.randint(1, users)).limit(101)).all()
+
+    def user_running():
+        db.execute(deployment_service._user_deployments_select(
+            rng.randint(1, users), status=DeploymentStatusEnum.RUNNING
+        ).limit(101)).all()
+
+    timings = {}
+    for name, query in (("snapshot", snapshot), ("user page", user_page), ("user running", user_running)):
+        latencies = []
+        for _ in range(samples):
+            start_time = time.perf_counter()
+            query()
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            db.expunge_all()
+        timings[name] = sorted(latencies)
+    db.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--live-every", type=int, default=1000, help="one deployment in this many is still live")
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=200, help="timed runs of each query, before and after")
+    parser.add_argument("--retention-days", type=float, default=30)
+    parser.add_argument("--batch-size", type=int, default=10000, help="deployments archived per transaction")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-path", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    path = args.database_path or os.path.join(tempfile.mkdtemp(), "archive.db")
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    start_time = time.perf_counter()
+    seed(engine, args.rows, args.live_every, args.clusters, args.users)
+    print(f"Seeded {args.rows} deployments in {time.perf_counter() - start_time:.0f}s", flush=True)
+
+    def live_rows():
+        db = session_factory()
+        count = db.scalar(select(func.count()).select_from(Deployment))
+        db.close()
+        return count
+
+    results = {"before": (live_rows(), measure(session_factory, args.clusters, args.users, args.samples, random.Random(args.seed)))}
+
+    db = session_factory()
+    start_time = time.perf_counter()
+    archived = compact_history(db, timedelta(days=args.retention_days), args.batch_size)
+    elapsed = time.perf_counter() - start_time
+    db.close()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    print(f"Archived {archived} deployments in {elapsed:.0f}s ({archived / elapsed:.0f}/s)", flush=True)
+
+    results["after"] = (live_rows(), measure(session_factory, args.clusters, args.users, args.samples, random.Random(args.seed)))
+
+    print(f"{'query':<14} {'phase':<7} {'live rows':>10} {'mean ms':>9} {'p95 ms':>9}")
+    for name in results["before"][1]:
+        for phase, (rows, timings) in results.items():
+            latencies = timings[name]
+            print(
+                f"{name:<14} {phase:<7} {rows:>10} {statistics.mean(latencies):>9.3f} "
+                f"{latencies[int(0.95 * (len(latencies) - 1))]:>9.3f}"
+            )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Measure the cost of authorizing requests by organization membership.
+
+--threads clients, each opening a session per request like the API does,
+authorize --requests requests in total. A request checks that its user is
+a member of --checks organizations (a deployment route checks one), for
+users in --orgs organizations of --members members each.
+
+- "relationship" loads the user's organizations with their members and
+  searches their IDs, as every route did before memberships were resolved
+  per request
+- "exists" resolves memberships per request (src.utils.auth.Memberships)
+  without the shared cache: one indexed existence query per organization
+  asked about
+- "shared-cache" adds the Redis cache shared by the API workers
+  (src.utils.memberships), so a request only reads one key. Skipped if
+  Redis isn't reachable at REDIS_URL
+
+For each mode the benchmark reports authorized requests per second, the
+microseconds spent authorizing each request and the SQL statements per
+request.
+
+Usage:
+    python -m benchmarks.auth_benchmark [--threads 8] [--requests 20000] [--orgs 5] [--members 50]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import redis
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.models.base import Base
+from src.models.models import Organization, User
+from src.services import organization as org_service
+from src.utils import memberships
+from src.utils.auth import Memberships
+
+
+def relationship_check(db, user_id: int, org_ids):
+    user_org_ids = [org.id for org in org_service.get_user_organizations(db, user_id)]
+    return all(org_id in user_org_ids for org_id in org_ids)
+
+
+def memberships_check(db, user_id: int, org_ids):
+    checks = Memberships(user_id)
+    return all(checks.includes(db, org_id) for org_id in org_ids)
+
+
+def shared_cache_check(db, user_id: int, org_ids):
+    checks = Memberships(user_id)
+    # Resolve the whole set, as listing routes do, so misses fill the cache
+    return org_ids[0] in checks.org_ids(db) and all(checks.includes(db, org_id) for org_id in org_ids)
+
+
+# Each mode's check, and whether it uses the shared cache
+MODES = {
+    "relationship": (relationship_check, False),
+    "exists": (memberships_check, False),
+    "shared-cache": (shared_cache_check, True),
+}
+
+
+def redis_available() -> bool:
+    try:
+        return memberships.redis_client.ping()
+    except redis.RedisError:
+        return False
+
+
+def make_users(session_factory, users: int, orgs: int, members: int):
+    """`users` users to authorize, with `orgs` organizations each of `members` members. Returns {user ID: org IDs}."""
+    db = session_factory()
+    others = [
+        User(username=f"member-{i}", email=f"member-{i}@example.com", hashed_password="", is_active=True)
+        for i in range(members - 1)
+    ]
+    authorized = {}
+    for u in range(users):
+        user = User(username=f"user-{u}", email=f"user-{u}@example.com", hashed_password="", is_active=True)
+        user_orgs = [Organization(name=f"org-{u}-{o}", invite_code=f"{u}-{o}") for o in range(orgs)]
+        for org in user_orgs:
+            org.users.extend([user] + others)
+        db.add_all(user_orgs)
+        db.flush()
+        authorized[user.id] = [org.id for org in user_orgs]
+    db.commit()
+    db.close()
+    return authorized
+
+
+def measure(session_factory, check, authorized, threads: int, requests: int, checks: int):
+    """Authorize the requests. Returns (requests per second, microseconds authorizing each)."""
+    users = list(authorized.items())
+    barrier = threading.Barrier(threads)
+    spent = []
+
+    def worker(offset: int):
+        elapsed = 0.0
+        barrier.wait()
+        for n in range(offset, requests, threads):
+            user_id, org_ids = users[n % len(users)]
+            db = session_factory()
+            try:
+                start_time = time.perf_counter()
+                assert check(db, user_id, org_ids[:checks])
+                elapsed += time.perf_counter() - start_time
+            finally:
+                db.close()
+        spent.append(elapsed)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start_time = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - start_time
+    return requests / wall, sum(spent) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--orgs", type=int, default=5, help="organizations per user")
+    parser.add_argument("--members", type=int, default=50, help="members per organization")
+    parser.add_argument("--checks", type=int, default=1, help="organizations checked per request")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(), "auth.db")
+        database_url = f"sqlite:///{path}"
+
+    engine = create_engine(
+        database_url, pool_size=args.threads, connect_args={"timeout": 30} if database_url.startswith("sqlite") else {}
+    )
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    authorized = make_users(session_factory, args.users, args.orgs, args.members)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *_: statements.append(1))
+
+    ttl = memberships.MEMBERSHIP_CACHE_TTL_SECONDS
+    cache_available = ttl > 0 and redis_available()
+
+    print(
+        f"{args.threads} threads x {args.requests} requests, {args.checks} check(s) each; "
+        f"users in {args.orgs} organizations of {args.members} members"
+    )
+    print(f"{'mode':<14} {'requests/s':>11} {'us/request':>11} {'statements/request':>19}")
+    for name, (check, shared) in MODES.items():
+        if shared and not cache_available:
+            print(f"{name:<14} skipped, Redis unavailable at {memberships.REDIS_URL} or MEMBERSHIP_CACHE_TTL_SECONDS=0")
+            continue
+        memberships.MEMBERSHIP_CACHE_TTL_SECONDS = ttl if shared else 0
+        memberships.invalidate(authorized)
+        statements.clear()
+        throughput, spent = measure(session_factory, check, authorized, args.threads, args.requests, args.checks)
+        print(f"{name:<14} {throughput:>11.0f} {spent:>11.0f} {len(statements) / args.requests:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
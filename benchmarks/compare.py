@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Compare two scheduler benchmark results.
+
+Prints every summary metric of both runs with the relative change, and flags
+changes in the wrong direction larger than the threshold as regressions.
+Exits with status 1 if there are any, so it can gate CI.
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 10]
+"""
+
+import argparse
+import json
+import sys
+
+# Metrics where a higher value is better; for every other metric lower is better
+HIGHER_IS_BETTER = {"placed", "placements_per_second", "utilisation_mean", "utilisation_final"}
+
+# Metrics that describe the run rather than its quality
+INFORMATIONAL = {"cycles", "preempted"}
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> int:
+    """Print the comparison and return the number of regressions."""
+    print(f"baseline:  {baseline['revision']} ({baseline['timestamp']})")
+    print(f"candidate: {candidate['revision']} ({candidate['timestamp']})")
+    for section in ("workload", "settings"):
+        if baseline[section] != candidate[section]:
+            print(f"warning: {section} differs, results may not be comparable")
+    print()
+
+    regressions = 0
+    print(f"{'metric':<24} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for metric, old in baseline["summary"].items():
+        new = candidate["summary"].get(metric)
+        if new is None:
+            continue
+
+        change = (new - old) / old * 100 if old else 0.0
+        worse = -change if metric in HIGHER_IS_BETTER else change
+        flag = ""
+        if metric not in INFORMATIONAL and worse > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{metric:<24} {old:>12.2f} {new:>12.2f} {change:>+8.1f}%{flag}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change tolerated before flagging")
+    args = parser.parse_args()
+
+    regressions = compare(load(args.baseline), load(args.candidate), args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Measure lost updates under contention, with and without version checks.
+
+--threads clients, each with its own session, increment the expected
+runtime of the same deployment --increments times each by reading it and
+writing back the value plus one: the read-modify-write a client does with
+GET and PUT.
+
+- "blind" writes the new value without any version check, the way updates
+  were written before deployments had a version
+- "if-match" sends the version it read as the expected version
+  (src.services.deployment.update_deployment, as PUT with If-Match does).
+  On 412 the client reads again and retries.
+
+For each mode the benchmark reports updates per second, the increments that
+were lost (overwritten by a concurrent write) and the 412 retries it took.
+Blind writes lose increments, version-checked ones lose none.
+
+Usage:
+    python -m benchmarks.contention_benchmark [--threads 8] [--increments 100]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.models.base import Base
+from src.models.models import Deployment, DeploymentPriority, DeploymentStatus
+from src.models.schemas import DeploymentUpdate
+from src.services import deployment as deployment_service
+from src.services.concurrency import VersionMismatchError
+
+
+def read(db: Session, deployment_id: int):
+    """The deployment's expected runtime and version, as a GET would return them."""
+    row = db.execute(
+        select(Deployment.expected_runtime, Deployment.version).where(Deployment.id == deployment_id)
+    ).one()
+    db.commit()
+    return row
+
+
+def blind_increment(db: Session, deployment_id: int) -> int:
+    """Read, add one and write it back unconditionally. Returns the retries it took (none)."""
+    runtime, _ = read(db, deployment_id)
+    db.execute(update(Deployment).where(Deployment.id == deployment_id).values(expected_runtime=runtime + 1))
+    db.commit()
+    return 0
+
+
+def if_match_increment(db: Session, deployment_id: int) -> int:
+    """Read, add one and write it back if the version is unchanged, reading again on 412."""
+    retries = 0
+    while True:
+        runtime, version = read(db, deployment_id)
+        try:
+            deployment_service.update_deployment(
+                db, deployment_id, DeploymentUpdate(expected_runtime=runtime + 1), expected_version=version
+            )
+            return retries
+        except VersionMismatchError:
+            db.rollback()
+            retries += 1
+
+
+MODES = {
+    "blind": blind_increment,
+    "if-match": if_match_increment,
+}
+
+
+def make_deployment(session_factory) -> int:
+    db = session_factory()
+    deployment = Deployment(
+        name="contended", docker_image="bench/image:latest",
+        required_ram=1.0, required_cpu=1.0, required_gpu=0.0,
+        priority=DeploymentPriority.MEDIUM, status=DeploymentStatus.PENDING,
+        expected_runtime=1
+    )
+    db.add(deployment)
+    db.commit()
+    deployment_id = deployment.id
+    db.close()
+    return deployment_id
+
+
+def measure(session_factory, increment, threads: int, increments: int):
+    """Race the increments. Returns (updates per second, lost increments, retries)."""
+    deployment_id = make_deployment(session_factory)
+    barrier = threading.Barrier(threads)
+    retries = []
+
+    def worker():
+        db = session_factory()
+        try:
+            barrier.wait()
+            for _ in range(increments):
+                retries.append(increment(db, deployment_id))
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start_time = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start_time
+
+    db = session_factory()
+    final = db.get(Deployment, deployment_id).expected_runtime
+    db.close()
+    total = threads * increments
+    return total / elapsed, total - (final - 1), sum(retries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--increments", type=int, default=100, help="increments per thread")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(), "contention.db")
+        database_url = f"sqlite:///{path}"
+
+    engine = create_engine(database_url, connect_args={"timeout": 30} if database_url.startswith("sqlite") else {})
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    print(f"{args.threads} threads x {args.increments} increments of one deployment")
+    print(f"{'mode':<10} {'updates/s':>10} {'lost':>8} {'412s':>8}")
+    for name, increment in MODES.items():
+        throughput, lost, retries = measure(session_factory, increment, args.threads, args.increments)
+        print(f"{name:<10} {throughput:>10.0f} {lost:>8} {retries:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Compare cycle detection strategies for dependency updates.
+
+"legacy" is the original check from the update route: for each requested
+dependency, load it and walk its dependencies recursively, one lazy load
+per deployment, looking for the deployment being updated. "cte" is the
+current set-based check: one query for the requested dependencies and one
+recursive query over the dependents of the deployment being updated
+(deployment_service.find_dependency_cycles).
+
+Each graph has --nodes deployments:
+
+- chain: every deployment depends on the one before it
+- dag: every deployment depends on up to --fanout random deployments among
+  the --window before it
+
+Each validation checks --dependencies random dependencies for a random
+deployment ("random") or for the first deployment of the graph, which every
+other one depends on ("root", the worst case for the recursive query). For
+each strategy the benchmark reports the validation time, SQL statements per
+validation, the validations that failed and those rejected. The legacy
+walk recurses once per level and runs out of stack on deep graphs.
+
+Usage:
+    python -m benchmarks.cycle_benchmark [--nodes 10000] [--validations 50] [--dependencies 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.models.models import Cluster, Deployment, DeploymentStatus, Organization, User, deployment_dependencies
+from src.services import deployment as deployment_service
+from src.utils.migrations import run_migrations
+
+
+def legacy_is_circular_dependency(db: Session, dep_id: int, deployment_id: int, visited=None):
+    """The original recursive check, kept for comparison."""
+    if visited is None:
+        visited = set()
+
+    if dep_id in visited:
+        return False
+
+    visited.add(dep_id)
+
+    dependency = deployment_service.get_deployment(db, dep_id)
+    if not dependency:
+        return False
+
+    for dep in dependency.dependencies:
+        if dep.id == deployment_id:
+            return True
+        if legacy_is_circular_dependency(db, dep.id, deployment_id, visited):
+            return True
+
+    return False
+
+
+def legacy_validate(db: Session, deployment_id: int, dependency_ids: List[int]) -> bool:
+    """The original validation loop: one dependency at a time, stopping at the first cycle."""
+    for dep_id in dependency_ids:
+        if dep_id == deployment_id:
+            return False
+        if not deployment_service.get_deployment(db, dep_id):
+            return False
+        if legacy_is_circular_dependency(db, dep_id, deployment_id):
+            return False
+    return True
+
+
+def cte_validate(db: Session, deployment_id: int, dependency_ids: List[int]) -> bool:
+    dependencies = deployment_service.get_deployments_by_ids(db, dependency_ids)
+    if len(dependencies) < len(set(dependency_ids)):
+        return False
+    return not deployment_service.find_dependency_cycles(db, deployment_id, dependency_ids)
+
+
+STRATEGIES = {
+    "legacy": legacy_validate,
+    "cte": cte_validate,
+}
+
+
+def build_graph(database_url: Optional[str], shape: str, nodes: int, fanout: int, window: int, rng: random.Random):
+    """Create a migrated database holding one dependency graph. Returns the engine and the deployment IDs in order."""
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), f'cycles-{shape}.db')}"
+    engine = create_engine(database_url)
+    run_migrations(engine)
+    db = sessionmaker(bind=engine)()
+
+    org = Organization(name=f"bench-cycles-{shape}", invite_code=f"bench-cycles-{shape}")
+    user = User(username=f"bench-cycles-{shape}", email=f"bench-cycles-{shape}@example.com", hashed_password="", is_active=True)
+    user.organizations.append(org)
+    db.add_all([org, user])
+    db.flush()
+    cluster = Cluster(
+        name=f"bench-cycles-{shape}",
+        total_ram=64.0, total_cpu=16.0, total_gpu=0.0,
+        available_ram=64.0, available_cpu=16.0, available_gpu=0.0,
+        organization_id=org.id, creator_id=user.id
+    )
+    db.add(cluster)
+    db.flush()
+
+    deployment_ids = db.scalars(
+        insert(Deployment).returning(Deployment.id, sort_by_parameter_order=True),
+        [
+            {
+                "name": f"bench-cycles-{i}", "docker_image": "bench/image:latest",
+                "required_ram": 1.0, "required_cpu": 1.0, "required_gpu": 0.0,
+                "status": DeploymentStatus.PENDING, "cluster_id": cluster.id, "user_id": user.id,
+            }
+            for i in range(nodes)
+        ]
+    ).all()
+
+    edges = []
+    for i in range(1, nodes):
+        if shape == "chain":
+            parents = [i - 1]
+        else:
+            earlier = range(max(0, i - window), i)
+            parents = rng.sample(earlier, min(fanout, len(earlier)))
+        edges.extend({"dependent_id": deployment_ids[i], "dependency_id": deployment_ids[p]} for p in parents)
+    db.execute(insert(deployment_dependencies), edges)
+    db.commit()
+    db.close()
+    return engine, deployment_ids
+
+
+def run(engine, validate, checks):
+    """Run each (deployment, dependencies) check on a fresh session. Returns latencies, statements, results and failures."""
+    session_factory = sessionmaker(bind=engine)
+    statements = []
+    count = lambda *_: statements.append(1)
+    event.listen(engine, "before_cursor_execute", count)
+    latencies, results, failed = [], [], 0
+    try:
+        for deployment_id, dependency_ids in checks:
+            db = session_factory()
+            start_time = time.perf_counter()
+            try:
+                results.append(validate(db, deployment_id, dependency_ids))
+            except RecursionError:
+                results.append(None)
+                failed += 1
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return latencies, len(statements), results, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10000, help="deployments in each graph")
+    parser.add_argument("--shapes", nargs="+", choices=["chain", "dag"], default=["chain", "dag"])
+    parser.add_argument("--fanout", type=int, default=3, help="dependencies per deployment in the dag")
+    parser.add_argument("--window", type=int, default=50, help="how far back a dag deployment picks its dependencies")
+    parser.add_argument("--validations", type=int, default=50, help="random validations per graph")
+    parser.add_argument("--dependencies", type=int, default=5, help="dependency IDs per validation")
+    parser.add_argument("--strategies", nargs="+", choices=list(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file per graph")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{args.nodes} deployments per graph, {args.dependencies} dependencies per validation")
+    print(
+        f"{'shape':<6} {'checks':<7} {'strategy':<8} {'mean ms':>9} {'p95 ms':>9} "
+        f"{'statements':>11} {'failed':>7} {'rejected':>9}"
+    )
+    for shape in args.shapes:
+        engine, deployment_ids = build_graph(args.database_url, shape, args.nodes, args.fanout, args.window, rng)
+        root = deployment_ids[0]
+        scenarios = {
+            "random": [
+                (rng.choice(deployment_ids), rng.sample(deployment_ids, args.dependencies))
+                for _ in range(args.validations)
+            ],
+            "root": [
+                (root, rng.sample(deployment_ids[1:], args.dependencies))
+                for _ in range(max(1, args.validations // 10))
+            ],
+        }
+        for scenario, checks in scenarios.items():
+            outcomes = {}
+            for name in args.strategies:
+                latencies, statements, results, failed = run(engine, STRATEGIES[name], checks)
+                outcomes[name] = results
+                latencies.sort()
+                print(
+                    f"{shape:<6} {scenario:<7} {name:<8} {statistics.mean(latencies):>9.2f} "
+                    f"{latencies[int(0.95 * (len(latencies) - 1))]:>9.2f} "
+                    f"{statements / len(checks):>11.1f} {failed:>7} {results.count(False):>9}",
+                    flush=True
+                )
+            # Wherever both strategies finished, they must agree
+            if len(outcomes) == 2:
+                legacy, cte = outcomes.values()
+                assert all(a == b for a, b in zip(legacy, cte) if a is not None), f"{shape}/{scenario} results differ"
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
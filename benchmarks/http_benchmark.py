@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Compare the async and the sync request paths of the read-heavy endpoints.
+
+"async" is the application itself (src.main:app), whose GET /deployments/
+and GET /clusters/ run on the async engine. "sync" is `legacy_app` below:
+the same endpoints issuing the same statements, but as sync routes on a
+blocking Session that Starlette runs on its threadpool. Both are served by
+uvicorn with the same number of workers, from the same database, and driven
+by the same async client at each concurrency level. The benchmark reports throughput, latency
+percentiles and errors.
+
+SQLite serialises much of the work on a single file, so use
+--database-url postgresql://... for numbers representative of production.
+
+Usage:
+    python -m benchmarks.http_benchmark [--workers 1] [--concurrency 50 500 2000] [--requests 4000] [--modes sync async]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+
+from src.models.base import get_db
+from src.models.models import Cluster, Deployment, DeploymentStatus, Organization, User, user_organization
+from src.models import schemas
+from src.utils.auth import create_access_token, get_current_active_user
+from src.utils.migrations import run_migrations
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+USERNAME = "bench-http"
+
+legacy_router = APIRouter()
+
+
+@legacy_router.get("/deployments/", response_model=List[schemas.Deployment])
+def legacy_get_deployments(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: schemas.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """GET /deployments/ on the sync path, issuing the same statements as the async route."""
+    return db.execute(
+        select(Deployment)
+        .options(selectinload(Deployment.dependencies), selectinload(Deployment.dependents))
+        .where(Deployment.user_id == current_user.id)
+        .order_by(Deployment.id)
+        .offset(skip)
+        .limit(limit)
+    ).scalars().all()
+
+
+@legacy_router.get("/clusters/", response_model=List[schemas.Cluster])
+def legacy_get_clusters(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: schemas.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """GET /clusters/ on the sync path, issuing the same statements as the async route."""
+    org_ids = db.execute(
+        select(user_organization.c.organization_id).where(user_organization.c.user_id == current_user.id)
+    ).scalars().all()
+    return db.execute(
+        select(Cluster).where(Cluster.organization_id.in_(org_ids)).order_by(Cluster.id).offset(skip).limit(limit)
+    ).scalars().all()
+
+
+legacy_app = FastAPI()
+legacy_app.include_router(legacy_router)
+
+SERVERS = {
+    "sync": "benchmarks.http_benchmark:legacy_app",
+    "async": "src.main:app",
+}
+
+
+def seed(database_url: str, clusters: int, deployments: int):
+    """Migrate the database and create a user with clusters and deployments to read."""
+    engine = create_engine(database_url)
+    run_migrations(engine)
+    db = sessionmaker(bind=engine)()
+
+    org = Organization(name=f"{USERNAME}-org", invite_code=USERNAME)
+    user = User(username=USERNAME, email=f"{USERNAME}@example.com", hashed_password="", is_active=True)
+    user.organizations.append(org)
+    db.add_all([org, user])
+    db.flush()
+
+    cluster_rows = [
+        Cluster(
+            name=f"{USERNAME}-{c}",
+            total_ram=512.0, total_cpu=128.0, total_gpu=16.0,
+            available_ram=512.0, available_cpu=128.0, available_gpu=16.0,
+            organization_id=org.id, creator_id=user.id
+        )
+        for c in range(clusters)
+    ]
+    db.add_all(cluster_rows)
+    db.flush()
+
+    db.add_all(
+        Deployment(
+            name=f"{USERNAME}-{i}",
+            docker_image="bench/image:latest",
+            required_ram=1.0, required_cpu=1.0, required_gpu=0.0,
+            status=DeploymentStatus.COMPLETED,
+            cluster_id=cluster_rows[i % clusters].id,
+            user_id=user.id
+        )
+        for i in range(deployments)
+    )
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def start_server(target: str, port: int, workers: int, database_url: str) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url, TESTING="true")
+    env.pop("ASYNC_DATABASE_URL", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{target} did not start")
+
+
+async def drive(url: str, headers: Dict[str, str], concurrency: int, total: int) -> Dict[str, float]:
+    """Send `total` GET requests with `concurrency` in flight and measure them."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start_time = time.perf_counter()
+                try:
+                    response = await client.get(url, headers=headers)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start_time) * 1000)
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests_per_second": total / elapsed,
+        "latency_ms_p50": statistics.median(latencies),
+        "latency_ms_p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "latency_ms_p99": latencies[int(0.99 * (len(latencies) - 1))],
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for both servers")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--requests", type=int, default=4000, help="per endpoint and concurrency level")
+    parser.add_argument("--modes", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument("--paths", nargs="+", default=["/deployments/", "/clusters/"])
+    parser.add_argument("--clusters", type=int, default=20)
+    parser.add_argument("--deployments", type=int, default=100, help="deployments owned by the benchmark user")
+    parser.add_argument("--port", type=int, default=8100, help="the sync server's; the async server uses the next")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'http.db')}"
+    seed(database_url, args.clusters, args.deployments)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': USERNAME})}"}
+
+    print(f"{args.workers} worker(s), {args.requests} requests per run", flush=True)
+    print(f"{'path':<14} {'conc':>6} {'mode':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for offset, (mode, target) in enumerate(SERVERS.items()):
+        if mode not in args.modes:
+            continue
+        # A port per server, so the next one never binds while the last is shutting down
+        port = args.port + offset
+        server = start_server(target, port, args.workers, database_url)
+        try:
+            for path in args.paths:
+                for concurrency in args.concurrency:
+                    result = asyncio.run(drive(
+                        f"http://127.0.0.1:{port}{path}", headers, concurrency, args.requests
+                    ))
+                    print(
+                        f"{path:<14} {concurrency:>6} {mode:<6} {result['requests_per_second']:>9.0f} "
+                        f"{result['latency_ms_p50']:>9.1f} {result['latency_ms_p95']:>9.1f} "
+                        f"{result['latency_ms_p99']:>9.1f} {result['errors']:>7}",
+                        flush=True
+                    )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare starting and stopping deployments one at a time and in bulk.
+
+"single" calls POST /deployments/{id}/start (then /stop) for each
+deployment, and "bulk" sends them to POST /deployments/bulk/start (then
+/bulk/stop) --batch-size at a time. Every other deployment depends on the
+one before it, so stopping also starts dependents that become ready. The
+API runs in-process behind a TestClient, as in the submission benchmark.
+For each mode and action the benchmark reports deployments per second, SQL
+statements per deployment and commits per deployment. A stop and the starts
+of the dependents it made ready are one transaction (a unit of work, see
+src.services.transaction), and so is each bulk request.
+
+Usage:
+    python -m benchmarks.lifecycle_benchmark [--deployments 500] [--batch-size 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import event
+
+from benchmarks.submission_benchmark import make_client, submit_batch
+
+
+def run_single(client, headers, action: str, deployment_ids):
+    for deployment_id in deployment_ids:
+        response = client.post(f"/deployments/{deployment_id}/{action}", headers=headers)
+        # Dependents may already have been started by a stop, or not be ready yet
+        assert response.status_code in (200, 400), response.text
+
+
+def run_bulk(client, headers, action: str, deployment_ids, batch_size: int):
+    for start in range(0, len(deployment_ids), batch_size):
+        response = client.post(
+            f"/deployments/bulk/{action}",
+            json={"deployment_ids": deployment_ids[start:start + batch_size]},
+            headers=headers
+        )
+        assert response.status_code == 200, response.text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployments", type=int, default=500, help="deployments started and stopped per mode")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    engine, client, headers, cluster_id = make_client(args.database_url)
+    statements = []
+    commits = []
+    event.listen(engine, "before_cursor_execute", lambda *_: statements.append(1))
+    event.listen(engine, "commit", lambda *_: commits.append(1))
+
+    modes = {
+        "single": lambda action, ids: run_single(client, headers, action, ids),
+        "bulk": lambda action, ids: run_bulk(client, headers, action, ids, args.batch_size),
+    }
+    print(f"{args.deployments} deployments in pairs (the second depends on the first); batches of {args.batch_size}")
+    print(f"{'mode':<8} {'action':<6} {'deployments/s':>14} {'statements/deployment':>22} {'commits/deployment':>19}")
+    for name, run in modes.items():
+        deployment_ids = submit_batch(client, headers, cluster_id, args.deployments, 2, args.batch_size)
+        for action in ("start", "stop"):
+            statements.clear()
+            commits.clear()
+            start_time = time.perf_counter()
+            run(action, deployment_ids)
+            elapsed = time.perf_counter() - start_time
+            print(
+                f"{name:<8} {action:<6} {len(deployment_ids) / elapsed:>14.0f} "
+                f"{len(statements) / len(deployment_ids):>22.2f} {len(commits) / len(deployment_ids):>19.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
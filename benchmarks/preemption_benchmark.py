@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare preemption victim selection strategies on synthetic clusters.
+
+Each scenario packs a cluster with running LOW and MEDIUM deployments of
+mixed shapes (RAM-heavy, CPU-heavy and GPU jobs) and then asks every strategy
+to make room for a HIGH priority deployment. For each strategy the benchmark
+reports the number of evictions, the resources freed beyond the deficit
+(normalised by cluster totals), the runtime lost by the victims and the time
+spent selecting.
+
+Usage:
+    python -m benchmarks.preemption_benchmark [--scenarios 500] [--running 40] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.scheduler.planner import DeploymentSnapshot
+from src.scheduler.preemption import COST_FUNCTIONS, GREEDY, select_victims, wasted_resources
+
+CLUSTER_TOTALS = (512.0, 128.0, 16.0)
+
+# (ram, cpu, gpu) shapes of running deployments
+SHAPES = [
+    (64.0, 8.0, 0.0),   # RAM-heavy
+    (16.0, 16.0, 0.0),  # CPU-heavy
+    (16.0, 4.0, 2.0),   # small GPU job
+    (32.0, 8.0, 4.0),   # large GPU job
+    (4.0, 1.0, 0.0),    # small job
+]
+
+
+def generate_scenario(rng: random.Random, running_count: int, now: datetime):
+    """Return (needed, running deployments) for one packed cluster."""
+    running = []
+    used = [0.0, 0.0, 0.0]
+    next_id = 1
+    while len(running) < running_count:
+        shape = rng.choice(SHAPES)
+        if any(u + s > t for u, s, t in zip(used, shape, CLUSTER_TOTALS)):
+            break
+        used = [u + s for u, s in zip(used, shape)]
+        running.append(DeploymentSnapshot(
+            id=next_id,
+            priority=rng.choice([1, 1, 2]),
+            ram=shape[0],
+            cpu=shape[1],
+            gpu=shape[2],
+            started_at=now - timedelta(minutes=rng.randint(1, 24 * 60))
+        ))
+        next_id += 1
+
+    available = [t - u for t, u in zip(CLUSTER_TOTALS, used)]
+    pending = rng.choice(SHAPES + [(8.0, 2.0, 2.0), (128.0, 16.0, 0.0)])
+    needed = tuple(max(p - a, 0.0) for p, a in zip(pending, available))
+    return needed, running
+
+
+def run(scenarios: int, running_count: int, seed: int):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    strategies = [GREEDY] + sorted(COST_FUNCTIONS)
+    totals = {s: {"evictions": 0, "wasted": 0.0, "lost_hours": 0.0, "seconds": 0.0, "covered": 0} for s in strategies}
+
+    for _ in range(scenarios):
+        needed, running = generate_scenario(rng, running_count, now)
+        if not any(needed):
+            continue
+        for strategy in strategies:
+            start_time = time.perf_counter()
+            victims = select_victims(needed, running, cost=strategy, now=now, scale=CLUSTER_TOTALS)
+            totals[strategy]["seconds"] += time.perf_counter() - start_time
+            if not victims:
+                continue
+            totals[strategy]["covered"] += 1
+            totals[strategy]["evictions"] += len(victims)
+            totals[strategy]["wasted"] += wasted_resources(victims, needed, CLUSTER_TOTALS)
+            totals[strategy]["lost_hours"] += sum((now - v.started_at).total_seconds() for v in victims) / 3600
+
+    print(f"{scenarios} scenarios, up to {running_count} running deployments per cluster")
+    print(f"{'strategy':<10} {'covered':>8} {'evictions':>10} {'wasted':>8} {'lost h':>10} {'ms/select':>10}")
+    for strategy in strategies:
+        t = totals[strategy]
+        covered = max(t["covered"], 1)
+        print(
+            f"{strategy:<10} {t['covered']:>8} "
+            f"{t['evictions'] / covered:>10.2f} "
+            f"{t['wasted'] / covered:>8.3f} "
+            f"{t['lost_hours'] / covered:>10.1f} "
+            f"{t['seconds'] * 1000 / scenarios:>10.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=500)
+    parser.add_argument("--running", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.scenarios, args.running, args.seed)
+
+
+if __name__ == "__main__":
+    main()
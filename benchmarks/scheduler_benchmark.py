@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Measure DeploymentScheduler throughput and placement quality on a synthetic workload.
+
+The benchmark generates a workload (see benchmarks/workload.py) in a local
+SQLite database, then runs schedule_all_clusters for a number of cycles.
+Between cycles a fraction of the running deployments completes, releasing
+capacity and unblocking dependency chains. For every cycle it records the
+latency, the number of SQL statements executed, the deployments placed and
+preempted, and the cluster utilisation afterwards.
+
+Results are written as JSON to benchmarks/results/ so runs of different
+versions can be compared with benchmarks/compare.py.
+
+Usage:
+    python -m benchmarks.scheduler_benchmark [--clusters 10] [--deployments 200] [--cycles 10]
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.models.base import Base
+from src.models.models import Cluster, Deployment, DeploymentStatus
+from src.scheduler.scheduler import DeploymentScheduler
+from src.services.cluster import release_cluster_resources
+from src.services.deployment import adjust_dependent_counters
+from benchmarks.workload import SIZE_DISTRIBUTIONS, WorkloadSpec, generate_workload
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class QueryCounter:
+    """Counts the SQL statements executed on an engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def make_session_factory(database_url: str):
+    """Create a fresh schema and return (engine, session factory)."""
+    if database_url in ("sqlite://", "sqlite:///:memory:"):
+        # One shared connection, so every session sees the same in-memory database
+        engine = create_engine(database_url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def utilisation(db: Session) -> float:
+    """Fraction of total capacity in use, averaged over RAM, CPU and GPU and all clusters."""
+    totals = db.query(
+        func.sum(Cluster.total_ram), func.sum(Cluster.available_ram),
+        func.sum(Cluster.total_cpu), func.sum(Cluster.available_cpu),
+        func.sum(Cluster.total_gpu), func.sum(Cluster.available_gpu)
+    ).one()
+    ratios = [
+        1 - available / total
+        for total, available in zip(totals[0::2], totals[1::2])
+        if total
+    ]
+    return sum(ratios) / len(ratios) if ratios else 0.0
+
+
+def complete_running(db: Session, rng: random.Random, fraction: float) -> int:
+    """Mark a random fraction of running deployments COMPLETED and release their resources."""
+    running = db.query(Deployment).filter(Deployment.status == DeploymentStatus.RUNNING).order_by(Deployment.id).all()
+    finished = [d for d in running if rng.random() < fraction]
+
+    for deployment in finished:
+        deployment.status = DeploymentStatus.COMPLETED
+        adjust_dependent_counters(db, deployment.id, -1)
+        release_cluster_resources(
+            db,
+            deployment.cluster_id,
+            deployment.required_ram,
+            deployment.required_cpu,
+            deployment.required_gpu,
+            deployment_id=deployment.id
+        )
+
+    db.commit()
+    return len(finished)
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarise(cycles: List[Dict[str, Any]]) -> Dict[str, float]:
+    latencies = [c["latency_ms"] for c in cycles]
+    placed = sum(c["placed"] for c in cycles)
+    seconds = sum(latencies) / 1000
+    return {
+        "cycles": len(cycles),
+        "latency_ms_mean": statistics.mean(latencies),
+        "latency_ms_p50": percentile(latencies, 50),
+        "latency_ms_p95": percentile(latencies, 95),
+        "latency_ms_max": max(latencies),
+        "queries_per_cycle": statistics.mean(c["queries"] for c in cycles),
+        "placed": placed,
+        "placements_per_second": placed / seconds if seconds else 0.0,
+        "preempted": sum(c["preempted"] for c in cycles),
+        "utilisation_mean": statistics.mean(c["utilisation"] for c in cycles),
+        "utilisation_final": cycles[-1]["utilisation"],
+        "unschedulable_final": cycles[-1]["unschedulable"],
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(__file__),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(
+    spec: WorkloadSpec,
+    cycles: int,
+    finish_fraction: float,
+    database_url: str,
+    preemption_cost: str,
+    backfill: bool,
+    max_workers: int
+) -> Dict[str, Any]:
+    engine, session_factory = make_session_factory(database_url)
+    counter = QueryCounter(engine)
+    rng = random.Random(spec.seed + 1)
+
+    db = session_factory()
+    generate_workload(db, spec)
+
+    scheduler = DeploymentScheduler(
+        db,
+        preemption_cost=preemption_cost,
+        backfill=backfill,
+        session_factory=session_factory,
+        max_workers=max_workers
+    )
+
+    results = []
+    for cycle in range(cycles):
+        counter.count = 0
+        start_time = time.perf_counter()
+        cluster_results = scheduler.schedule_all_clusters()
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        queries = counter.count
+
+        results.append({
+            "cycle": cycle,
+            "latency_ms": latency_ms,
+            "queries": queries,
+            "placed": sum(r["scheduled"] for r in cluster_results.values()),
+            "preempted": sum(r["preempted"] for r in cluster_results.values()),
+            "unschedulable": sum(r["unschedulable"] for r in cluster_results.values()),
+            "plan_ms": sum(r["plan_ms"] for r in cluster_results.values()),
+            "commit_ms": sum(r["commit_ms"] for r in cluster_results.values()),
+            "utilisation": utilisation(db),
+        })
+        results[-1]["completed"] = complete_running(db, rng, finish_fraction)
+
+    db.close()
+    engine.dispose()
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "workload": spec.to_dict(),
+        "settings": {
+            "cycles": cycles,
+            "finish_fraction": finish_fraction,
+            "database_url": database_url,
+            "preemption_cost": preemption_cost,
+            "backfill": backfill,
+            "max_workers": max_workers,
+        },
+        "summary": summarise(results),
+        "cycles": results,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{'cycle':>5} {'ms':>9} {'queries':>8} {'placed':>7} {'preempt':>8} {'unsched':>8} {'util':>6}")
+    for c in report["cycles"]:
+        print(
+            f"{c['cycle']:>5} {c['latency_ms']:>9.1f} {c['queries']:>8} {c['placed']:>7} "
+            f"{c['preempted']:>8} {c['unschedulable']:>8} {c['utilisation']:>6.1%}"
+        )
+    print()
+    for key, value in report["summary"].items():
+        print(f"{key:<24} {value:>12.2f}" if isinstance(value, float) else f"{key:<24} {value:>12}")
+
+
+def main():
+    defaults = WorkloadSpec()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clusters", type=int, default=defaults.clusters)
+    parser.add_argument("--deployments", type=int, default=defaults.deployments_per_cluster, help="per cluster")
+    parser.add_argument("--sizes", choices=sorted(SIZE_DISTRIBUTIONS), default=defaults.sizes)
+    parser.add_argument("--priority-mix", type=float, nargs=3, default=defaults.priority_mix, metavar=("LOW", "MEDIUM", "HIGH"))
+    parser.add_argument("--chain-fraction", type=float, default=defaults.chain_fraction)
+    parser.add_argument("--chain-length", type=int, default=defaults.chain_length)
+    parser.add_argument("--group-fraction", type=float, default=defaults.group_fraction)
+    parser.add_argument("--group-size", type=int, default=defaults.group_size)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--finish-fraction", type=float, default=0.3, help="running deployments completing between cycles")
+    parser.add_argument("--database-url", default="sqlite://", help="use a file database for --workers > 1")
+    parser.add_argument("--preemption-cost", default="fewest")
+    parser.add_argument("--backfill", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--name", default="scheduler", help="prefix of the results file")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<name>-<revision>-<time>.json)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    spec = WorkloadSpec(
+        clusters=args.clusters,
+        deployments_per_cluster=args.deployments,
+        sizes=args.sizes,
+        priority_mix=tuple(args.priority_mix),
+        chain_fraction=args.chain_fraction,
+        chain_length=args.chain_length,
+        group_fraction=args.group_fraction,
+        group_size=args.group_size,
+        seed=args.seed
+    )
+    report = run(
+        spec,
+        cycles=args.cycles,
+        finish_fraction=args.finish_fraction,
+        database_url=args.database_url,
+        preemption_cost=args.preemption_cost,
+        backfill=args.backfill,
+        max_workers=args.workers
+    )
+    print_report(report)
+
+    if not args.no_save:
+        path = args.output or os.path.join(
+            RESULTS_DIR,
+            f"{args.name}-{report['revision']}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
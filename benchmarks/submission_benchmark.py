@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Compare submitting deployments one at a time and in batches.
+
+"single" posts each deployment to POST /deployments/, and "batch" posts
+them to POST /deployments/batch, --batch-size at a time. The workload is
+the same in both cases: chains of --chain deployments, each depending on
+the one before it (by ID for single submissions, by ref within a batch).
+The API runs in-process behind a TestClient, so the numbers show the
+server-side cost of a submission without the network. For each mode the
+benchmark reports deployments created per second and SQL statements per
+deployment.
+
+Usage:
+    python -m benchmarks.submission_benchmark [--deployments 2000] [--batch-size 500] [--chain 4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.api.router import api_router
+from src.models.base import get_db
+from src.models.models import Cluster, Organization, User
+from src.utils.auth import create_access_token
+from src.utils.migrations import run_migrations
+from src.utils.resources import to_units
+
+USERNAME = "bench-submit"
+
+
+def seed(session_factory) -> int:
+    """Create the submitting user, its organization and a cluster. Returns the cluster ID."""
+    db = session_factory()
+    org = Organization(name=f"{USERNAME}-org", invite_code=USERNAME)
+    user = User(username=USERNAME, email=f"{USERNAME}@example.com", hashed_password="", is_active=True)
+    user.organizations.append(org)
+    db.add_all([org, user])
+    db.flush()
+
+    total_ram_mib, total_cpu_millicores, total_gpu_milli = to_units(1024.0, 256.0, 0.0)
+    cluster = Cluster(
+        name=USERNAME,
+        total_ram=1024.0, total_cpu=256.0, total_gpu=0.0,
+        available_ram=1024.0, available_cpu=256.0, available_gpu=0.0,
+        total_ram_mib=total_ram_mib, total_cpu_millicores=total_cpu_millicores, total_gpu_milli=total_gpu_milli,
+        organization_id=org.id, creator_id=user.id
+    )
+    db.add(cluster)
+    db.commit()
+    cluster_id = cluster.id
+    db.close()
+    return cluster_id
+
+
+def make_client(database_url: Optional[str]):
+    """
+    Serve the API in-process on a migrated database (a temporary SQLite file
+    by default) with a seeded user and cluster.
+    Returns the engine, the client, its auth headers and the cluster ID.
+    """
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'submission.db')}"
+    engine = create_engine(database_url)
+    run_migrations(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    cluster_id = seed(session_factory)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(api_router)
+    app.dependency_overrides[get_db] = override_get_db
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': USERNAME})}"}
+    return engine, TestClient(app), headers, cluster_id
+
+
+def deployment(cluster_id: int, i: int) -> dict:
+    return {
+        "name": f"{USERNAME}-{i}",
+        "docker_image": "bench/image:latest",
+        "required_ram": 1.0,
+        "required_cpu": 1.0,
+        "required_gpu": 0.0,
+        "priority": 2,
+        "cluster_id": cluster_id,
+    }
+
+
+def submit_single(client, headers, cluster_id: int, count: int, chain: int):
+    previous = None
+    for i in range(count):
+        body = deployment(cluster_id, i)
+        if i % chain and previous is not None:
+            body["dependency_ids"] = [previous]
+        response = client.post("/deployments/", json=body, headers=headers)
+        assert response.status_code == 200, response.text
+        previous = response.json()["id"]
+
+
+def submit_batch(client, headers, cluster_id: int, count: int, chain: int, batch_size: int) -> List[int]:
+    """Submit the workload in batches. Returns the IDs of the created deployments."""
+    deployment_ids = []
+    for start in range(0, count, batch_size):
+        items = []
+        for i in range(start, min(start + batch_size, count)):
+            item = dict(deployment(cluster_id, i), ref=str(i))
+            # Chains don't cross batches
+            if i % chain and i > start:
+                item["dependency_refs"] = [str(i - 1)]
+            items.append(item)
+        response = client.post("/deployments/batch", json={"deployments": items}, headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["failed"] == 0, response.text
+        deployment_ids.extend(result["id"] for result in response.json()["results"])
+    return deployment_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployments", type=int, default=2000, help="deployments submitted per mode")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--chain", type=int, default=4, help="length of the dependency chains")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    engine, client, headers, cluster_id = make_client(args.database_url)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *_: statements.append(1))
+
+    modes = {
+        "single": lambda: submit_single(client, headers, cluster_id, args.deployments, args.chain),
+        "batch": lambda: submit_batch(client, headers, cluster_id, args.deployments, args.chain, args.batch_size),
+    }
+    print(f"{args.deployments} deployments in chains of {args.chain}; batches of {args.batch_size}")
+    print(f"{'mode':<8} {'deployments/s':>14} {'statements/deployment':>22}")
+    for name, submit in modes.items():
+        statements.clear()
+        start_time = time.perf_counter()
+        submit()
+        elapsed = time.perf_counter() - start_time
+        print(f"{name:<8} {args.deployments / elapsed:>14.0f} {len(statements) / args.deployments:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Synthetic scheduler workloads.
+
+A workload is a set of clusters, each with a queue of pending deployments
+drawn from a size distribution and a priority mix. Some deployments form
+dependency chains, and some are submitted as deployment groups. Workloads
+are fully determined by their WorkloadSpec (including the seed), so two runs
+of the same spec schedule exactly the same deployments.
+"""
+
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.models.models import (
+    Cluster, Deployment, DeploymentGroup, DeploymentPriority, DeploymentStatus, Organization, User,
+    deployment_dependencies
+)
+from src.utils.resources import to_units
+
+# (ram, cpu, gpu) totals of every generated cluster
+CLUSTER_TOTALS = (512.0, 128.0, 16.0)
+
+# (ram, cpu, gpu) shapes and their relative weights
+SIZE_DISTRIBUTIONS: Dict[str, List[Tuple[Tuple[float, float, float], float]]] = {
+    "small": [
+        ((2.0, 0.5, 0.0), 4),
+        ((4.0, 1.0, 0.0), 4),
+        ((8.0, 2.0, 0.0), 2),
+    ],
+    "mixed": [
+        ((4.0, 1.0, 0.0), 4),   # small job
+        ((64.0, 8.0, 0.0), 2),  # RAM-heavy
+        ((16.0, 16.0, 0.0), 2), # CPU-heavy
+        ((16.0, 4.0, 2.0), 2),  # small GPU job
+        ((32.0, 8.0, 4.0), 1),  # large GPU job
+    ],
+    "gpu": [
+        ((16.0, 4.0, 1.0), 3),
+        ((32.0, 8.0, 2.0), 2),
+        ((64.0, 16.0, 4.0), 1),
+    ],
+}
+
+PRIORITIES = [DeploymentPriority.LOW, DeploymentPriority.MEDIUM, DeploymentPriority.HIGH]
+
+
+@dataclass
+class WorkloadSpec:
+    """Parameters of a synthetic workload."""
+    clusters: int = 10
+    deployments_per_cluster: int = 200
+    sizes: str = "mixed"
+    # Relative weights of LOW, MEDIUM and HIGH priority
+    priority_mix: Tuple[float, float, float] = (0.5, 0.35, 0.15)
+    # Fraction of deployments that are part of a dependency chain
+    chain_fraction: float = 0.2
+    chain_length: int = 3
+    # Fraction of deployments submitted as members of a deployment group
+    group_fraction: float = 0.05
+    group_size: int = 4
+    # Range of expected runtimes in minutes
+    runtime_minutes: Tuple[int, int] = (5, 240)
+    seed: int = 42
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def generate_workload(db: Session, spec: WorkloadSpec) -> List[int]:
+    """
+    Insert the clusters and pending deployments described by `spec`.
+    Returns the IDs of the generated clusters.
+    """
+    if spec.sizes not in SIZE_DISTRIBUTIONS:
+        raise ValueError(f"Unknown size distribution '{spec.sizes}'")
+
+    rng = random.Random(spec.seed)
+    shapes, weights = zip(*SIZE_DISTRIBUTIONS[spec.sizes])
+    now = datetime.utcnow()
+
+    org = Organization(name=f"bench-org-{spec.seed}", invite_code=f"bench-{spec.seed}")
+    user = User(username=f"bench-{spec.seed}", email=f"bench-{spec.seed}@example.com", hashed_password="")
+    db.add_all([org, user])
+    db.flush()
+
+    total_units = to_units(*CLUSTER_TOTALS)
+    cluster_ids = []
+    for c in range(spec.clusters):
+        cluster = Cluster(
+            name=f"bench-cluster-{c}",
+            total_ram=CLUSTER_TOTALS[0],
+            total_cpu=CLUSTER_TOTALS[1],
+            total_gpu=CLUSTER_TOTALS[2],
+            available_ram=CLUSTER_TOTALS[0],
+            available_cpu=CLUSTER_TOTALS[1],
+            available_gpu=CLUSTER_TOTALS[2],
+            total_ram_mib=total_units[0],
+            total_cpu_millicores=total_units[1],
+            total_gpu_milli=total_units[2],
+            organization_id=org.id,
+            creator_id=user.id
+        )
+        db.add(cluster)
+        db.flush()
+        cluster_ids.append(cluster.id)
+
+        def new_deployment(name: str, priority: DeploymentPriority, shape=None, group=None) -> Deployment:
+            ram, cpu, gpu = shape or rng.choices(shapes, weights)[0]
+            return Deployment(
+                name=name,
+                docker_image="bench/image:latest",
+                required_ram=ram,
+                required_cpu=cpu,
+                required_gpu=gpu,
+                expected_runtime=rng.randint(*spec.runtime_minutes) * 60,
+                priority=priority,
+                status=DeploymentStatus.PENDING,
+                cluster_id=cluster.id,
+                user_id=user.id,
+                group=group,
+                # Spread submissions over the last hour so age ordering matters
+                created_at=now - timedelta(seconds=rng.randint(0, 3600))
+            )
+
+        edges = []
+        created = 0
+        while created < spec.deployments_per_cluster:
+            priority = rng.choices(PRIORITIES, spec.priority_mix)[0]
+            roll = rng.random()
+
+            if roll < spec.group_fraction:
+                # A gang of identical members
+                group = DeploymentGroup(name=f"bench-group-{c}-{created}", cluster_id=cluster.id, user_id=user.id)
+                shape = rng.choices(shapes, weights)[0]
+                members = [
+                    new_deployment(f"bench-{c}-{created + i}", priority, shape, group)
+                    for i in range(spec.group_size)
+                ]
+                db.add(group)
+                db.add_all(members)
+                created += len(members)
+
+            elif roll < spec.group_fraction + spec.chain_fraction:
+                # A chain where each deployment depends on the previous one;
+                # members share a priority so the chain passes dependency validation
+                chain = [new_deployment(f"bench-{c}-{created + i}", priority) for i in range(spec.chain_length)]
+                db.add_all(chain)
+                db.flush()
+                for previous, current in zip(chain, chain[1:]):
+                    current.unmet_dependencies = 1
+                    edges.append({"dependent_id": current.id, "dependency_id": previous.id})
+                created += len(chain)
+
+            else:
+                db.add(new_deployment(f"bench-{c}-{created}", priority))
+                created += 1
+
+        db.flush()
+        if edges:
+            db.execute(deployment_dependencies.insert(), edges)
+
+    db.commit()
+    return cluster_ids
@@ -0,0 +1,120 @@
+"""Initial schema
+
+The schema before any of the scheduler's additions, as created by
+Base.metadata.create_all on existing installs. Such databases are stamped
+at this revision by src.utils.migrations.run_migrations instead of running
+it, and the following revisions bring them up to date.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 23:07:04.641295
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('organizations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('invite_code', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('invite_code')
+    )
+    op.create_index('ix_organizations_id', 'organizations', ['id'], unique=False)
+    op.create_index('ix_organizations_name', 'organizations', ['name'], unique=True)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table('clusters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('total_ram', sa.Float(), nullable=True),
+    sa.Column('total_cpu', sa.Float(), nullable=True),
+    sa.Column('total_gpu', sa.Float(), nullable=True),
+    sa.Column('available_ram', sa.Float(), nullable=True),
+    sa.Column('available_cpu', sa.Float(), nullable=True),
+    sa.Column('available_gpu', sa.Float(), nullable=True),
+    sa.Column('organization_id', sa.Integer(), nullable=True),
+    sa.Column('creator_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['creator_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_clusters_id', 'clusters', ['id'], unique=False)
+    op.create_index('ix_clusters_name', 'clusters', ['name'], unique=False)
+
+    op.create_table('user_organization',
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('organization_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], )
+    )
+
+    op.create_table('deployments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('docker_image', sa.String(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='deploymentstatus'), nullable=True),
+    sa.Column('priority', sa.Enum('LOW', 'MEDIUM', 'HIGH', name='deploymentpriority'), nullable=True),
+    sa.Column('required_ram', sa.Float(), nullable=True),
+    sa.Column('required_cpu', sa.Float(), nullable=True),
+    sa.Column('required_gpu', sa.Float(), nullable=True),
+    sa.Column('cluster_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deployments_id', 'deployments', ['id'], unique=False)
+    op.create_index('ix_deployments_name', 'deployments', ['name'], unique=False)
+
+    op.create_table('deployment_dependencies',
+    sa.Column('dependent_id', sa.Integer(), nullable=False),
+    sa.Column('dependency_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['dependency_id'], ['deployments.id'], ),
+    sa.ForeignKeyConstraint(['dependent_id'], ['deployments.id'], ),
+    sa.PrimaryKeyConstraint('dependent_id', 'dependency_id')
+    )
+
+
+def downgrade() -> None:
+    for table in (
+        "deployment_dependencies",
+        "deployments",
+        "user_organization",
+        "clusters",
+        "users",
+        "organizations",
+    ):
+        op.drop_table(table)
+
+    # PostgreSQL keeps enum types around after their tables are dropped
+    bind = op.get_bind()
+    sa.Enum(name="deploymentstatus").drop(bind, checkfirst=True)
+    sa.Enum(name="deploymentpriority").drop(bind, checkfirst=True)
@@ -0,0 +1,44 @@
+"""Unmet dependency counters
+
+Adds deployments.unmet_dependencies, the number of a deployment's
+dependencies that haven't completed yet, so the scheduler can tell a
+ready deployment without walking its dependencies. Existing deployments
+get their counters recounted from the dependency edges.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 20:12:09.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001a'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('deployments', sa.Column('unmet_dependencies', sa.Integer(), server_default='0', nullable=False))
+
+    # Otherwise a pending deployment waiting on unfinished dependencies would look ready.
+    # Tables as they are at this revision, not the current models.
+    deployments = sa.table('deployments', sa.column('id'), sa.column('status'), sa.column('unmet_dependencies'))
+    dependency = deployments.alias('dependency')
+    edges = sa.table('deployment_dependencies', sa.column('dependent_id'), sa.column('dependency_id'))
+    unmet = (
+        sa.select(sa.func.count())
+        .select_from(edges.join(dependency, dependency.c.id == edges.c.dependency_id))
+        .where(edges.c.dependent_id == deployments.c.id, dependency.c.status != 'COMPLETED')
+        .scalar_subquery()
+    )
+    op.execute(deployments.update().values(unmet_dependencies=unmet))
+
+
+def downgrade() -> None:
+    op.drop_column('deployments', 'unmet_dependencies')
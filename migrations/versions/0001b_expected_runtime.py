@@ -0,0 +1,29 @@
+"""Expected runtimes
+
+Adds deployments.expected_runtime, the seconds a deployment is expected to
+run for, used to order the scheduler's queue.
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-18 20:13:41.702158
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001b'
+down_revision: Union[str, None] = '0001a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('deployments', sa.Column('expected_runtime', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('deployments', 'expected_runtime')
@@ -0,0 +1,50 @@
+"""Deployment groups
+
+Adds deployment_groups, deployments that are scheduled all together or
+not at all, and deployments.group_id.
+
+Revision ID: 0001c
+Revises: 0001b
+Create Date: 2026-10-18 20:15:27.044719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001c'
+down_revision: Union[str, None] = '0001b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('deployment_groups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('cluster_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deployment_groups_id', 'deployment_groups', ['id'], unique=False)
+    op.create_index('ix_deployment_groups_name', 'deployment_groups', ['name'], unique=False)
+
+    # SQLite can't add a foreign key to an existing table, so batch mode rebuilds it there
+    with op.batch_alter_table('deployments') as batch_op:
+        batch_op.add_column(sa.Column('group_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_deployments_group_id', 'deployment_groups', ['group_id'], ['id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('deployments') as batch_op:
+        batch_op.drop_constraint('fk_deployments_group_id', type_='foreignkey')
+        batch_op.drop_column('group_id')
+    op.drop_index('ix_deployment_groups_name', table_name='deployment_groups')
+    op.drop_index('ix_deployment_groups_id', table_name='deployment_groups')
+    op.drop_table('deployment_groups')
@@ -0,0 +1,43 @@
+"""Scheduler replicas and cluster leases
+
+Adds scheduler_replicas, the live scheduler loops and their heartbeats, and
+cluster_leases, the expiring ownership of each cluster by one of them.
+
+Revision ID: 0001d
+Revises: 0001c
+Create Date: 2026-10-18 20:17:58.590231
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001d'
+down_revision: Union[str, None] = '0001c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('scheduler_replicas',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table('cluster_leases',
+    sa.Column('cluster_id', sa.Integer(), nullable=False),
+    sa.Column('owner', sa.String(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('cluster_id')
+    )
+    op.create_index('ix_cluster_leases_owner', 'cluster_leases', ['owner'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cluster_leases_owner', table_name='cluster_leases')
+    op.drop_table('cluster_leases')
+    op.drop_table('scheduler_replicas')
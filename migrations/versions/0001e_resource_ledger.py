@@ -0,0 +1,100 @@
+"""Resource ledger
+
+Adds the clusters' integer capacity and allocation counters and
+resource_allocations, the ledger of what each running deployment holds.
+Both are seeded from the deployments already running, so existing clusters
+don't look empty to the scheduler.
+
+Revision ID: 0001e
+Revises: 0001d
+Create Date: 2026-10-18 20:21:14.863570
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001e'
+down_revision: Union[str, None] = '0001d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = (
+    'total_ram_mib',
+    'total_cpu_millicores',
+    'total_gpu_milli',
+    'allocated_ram_mib',
+    'allocated_cpu_millicores',
+    'allocated_gpu_milli',
+)
+
+# (resource, integer unit, units per API unit): required_ram is seeded as ram_mib, total_ram as total_ram_mib, ...
+DIMENSIONS = (
+    ('ram', 'mib', 1024),
+    ('cpu', 'millicores', 1000),
+    ('gpu', 'milli', 1000),
+)
+
+
+def upgrade() -> None:
+    for counter in COUNTERS:
+        op.add_column('clusters', sa.Column(counter, sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('resource_allocations',
+    sa.Column('deployment_id', sa.Integer(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=False),
+    sa.Column('ram_mib', sa.Integer(), nullable=False),
+    sa.Column('cpu_millicores', sa.Integer(), nullable=False),
+    sa.Column('gpu_milli', sa.Integer(), nullable=False),
+    sa.Column('allocated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ),
+    sa.ForeignKeyConstraint(['deployment_id'], ['deployments.id'], ),
+    sa.PrimaryKeyConstraint('deployment_id')
+    )
+    op.create_index('ix_resource_allocations_cluster_id', 'resource_allocations', ['cluster_id'], unique=False)
+
+    # Seed the ledger and the counters from the running deployments, as at startup.
+    # Tables as they are at this revision, not the current models.
+    deployments = sa.table('deployments', sa.column('id'), sa.column('cluster_id'), sa.column('status'),
+                           *(sa.column(f'required_{resource}') for resource, _, _ in DIMENSIONS))
+    allocations = sa.table('resource_allocations', sa.column('deployment_id'), sa.column('cluster_id'),
+                           *(sa.column(f'{resource}_{unit}') for resource, unit, _ in DIMENSIONS))
+    clusters = sa.table('clusters', sa.column('id'), *(
+        sa.column(name)
+        for resource, unit, _ in DIMENSIONS
+        for name in (f'total_{resource}', f'available_{resource}', f'total_{resource}_{unit}', f'allocated_{resource}_{unit}')
+    ))
+
+    op.execute(allocations.insert().from_select(
+        ['deployment_id', 'cluster_id'] + [f'{resource}_{unit}' for resource, unit, _ in DIMENSIONS],
+        sa.select(deployments.c.id, deployments.c.cluster_id, *(
+            sa.cast(sa.func.round(deployments.c[f'required_{resource}'] * per_unit), sa.Integer)
+            for resource, _, per_unit in DIMENSIONS
+        )).where(deployments.c.status == 'RUNNING')
+    ))
+
+    counters = {}
+    for resource, unit, per_unit in DIMENSIONS:
+        counters[f'total_{resource}_{unit}'] = sa.cast(sa.func.round(clusters.c[f'total_{resource}'] * per_unit), sa.Integer)
+        counters[f'allocated_{resource}_{unit}'] = sa.select(
+            sa.func.coalesce(sa.func.sum(allocations.c[f'{resource}_{unit}']), 0)
+        ).where(allocations.c.cluster_id == clusters.c.id).scalar_subquery()
+    op.execute(clusters.update().values(counters))
+
+    # Separately, so that available resources are derived from the counters just written
+    op.execute(clusters.update().values({
+        f'available_{resource}': (
+            clusters.c[f'total_{resource}_{unit}'] - clusters.c[f'allocated_{resource}_{unit}']
+        ) / float(per_unit)
+        for resource, unit, per_unit in DIMENSIONS
+    }))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_resource_allocations_cluster_id', table_name='resource_allocations')
+    op.drop_table('resource_allocations')
+    for counter in reversed(COUNTERS):
+        op.drop_column('clusters', counter)
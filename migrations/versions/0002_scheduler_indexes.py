@@ -0,0 +1,61 @@
+"""Scheduler indexes
+
+Indexes for the scheduler's and the API's access paths on deployments:
+
+- ix_deployments_ready_queue: a cluster's pending deployments with no unmet
+  dependencies in priority order. Partial, covering only PENDING rows.
+- ix_deployments_cluster_status: a cluster's deployments in one state
+  (the scheduler's running set) in priority order.
+- ix_deployments_user_id, ix_deployments_group_id: per-user and per-group lookups.
+- ix_deployment_dependencies_dependency_id: the dependents of a deployment.
+
+On PostgreSQL the indexes are built CONCURRENTLY, so a large deployments
+table stays writable while they are created.
+
+Revision ID: 0002
+Revises: 0001e
+Create Date: 2026-10-17 23:07:27.888451
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING_ONLY = sa.text("status = 'PENDING'")
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_deployments_ready_queue', 'deployments',
+            ['cluster_id', 'unmet_dependencies', sa.text('priority DESC'), 'created_at'],
+            postgresql_where=PENDING_ONLY, sqlite_where=PENDING_ONLY, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_deployments_cluster_status', 'deployments',
+            ['cluster_id', 'status', sa.text('priority DESC'), 'created_at'],
+            postgresql_concurrently=True
+        )
+        op.create_index('ix_deployments_user_id', 'deployments', ['user_id'], postgresql_concurrently=True)
+        op.create_index('ix_deployments_group_id', 'deployments', ['group_id'], postgresql_concurrently=True)
+        op.create_index(
+            'ix_deployment_dependencies_dependency_id', 'deployment_dependencies', ['dependency_id'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_deployment_dependencies_dependency_id', table_name='deployment_dependencies')
+    op.drop_index('ix_deployments_group_id', table_name='deployments')
+    op.drop_index('ix_deployments_user_id', table_name='deployments')
+    op.drop_index('ix_deployments_cluster_status', table_name='deployments')
+    op.drop_index('ix_deployments_ready_queue', table_name='deployments')
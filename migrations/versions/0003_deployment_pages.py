@@ -0,0 +1,38 @@
+"""Deployment pages
+
+Replaces ix_deployments_user_id with ix_deployments_user_page on
+(user_id, id), so a page of a user's deployments is read by seeking to
+the last id of the previous page and walking the index in id order,
+without sorting the user's whole history.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 01:12:40.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_deployments_user_page', 'deployments', ['user_id', 'id'], postgresql_concurrently=True
+        )
+        op.drop_index('ix_deployments_user_id', table_name='deployments', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_deployments_user_id', 'deployments', ['user_id'], postgresql_concurrently=True)
+        op.drop_index('ix_deployments_user_page', table_name='deployments', postgresql_concurrently=True)
@@ -0,0 +1,105 @@
+"""Deployment history
+
+Adds deployments.finished_at, set when a deployment reaches a terminal
+state, with ix_deployments_finished over the terminal rows, and the
+deployment_history and deployment_history_dependencies tables the
+compaction job moves finished deployments and their edges into.
+
+Existing terminal rows are backfilled with the time they started (or were
+created), in batches of BACKFILL_BATCH ids that each commit on their own, so
+a large table isn't locked for the whole upgrade. SQL generated offline
+(--sql) backfills them in one statement.
+
+On PostgreSQL deployment_history is partitioned by range of finished_at.
+The compaction job creates a partition per month as it needs them; the
+default partition only catches rows it has no partition for.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:41:05.226731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TERMINAL_ONLY = sa.text("status IN ('COMPLETED', 'FAILED', 'CANCELLED')")
+
+BACKFILL_BATCH = 50000
+
+
+def upgrade() -> None:
+    op.add_column('deployments', sa.Column('finished_at', sa.DateTime(), nullable=True))
+    op.create_table('deployment_history',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('docker_image', sa.String(), nullable=True),
+    # The enum types already exist (revision 0001); only PostgreSQL's ENUM honours create_type
+    sa.Column('status', postgresql.ENUM('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='deploymentstatus', create_type=False), nullable=False),
+    sa.Column('priority', postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', name='deploymentpriority', create_type=False), nullable=True),
+    sa.Column('required_ram', sa.Float(), nullable=True),
+    sa.Column('required_cpu', sa.Float(), nullable=True),
+    sa.Column('required_gpu', sa.Float(), nullable=True),
+    sa.Column('expected_runtime', sa.Integer(), nullable=True),
+    sa.Column('cluster_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('group_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', 'finished_at'),
+    postgresql_partition_by='RANGE (finished_at)'
+    )
+    op.create_index('ix_deployment_history_user_page', 'deployment_history', ['user_id', 'id'])
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE TABLE deployment_history_default PARTITION OF deployment_history DEFAULT')
+    op.create_table('deployment_history_dependencies',
+    sa.Column('dependent_id', sa.Integer(), nullable=False),
+    sa.Column('dependency_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dependent_id', 'dependency_id')
+    )
+    op.create_index(
+        'ix_deployment_history_dependencies_dependency_id', 'deployment_history_dependencies', ['dependency_id']
+    )
+    # The backfill commits a batch at a time, and CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        backfill = (
+            "UPDATE deployments SET finished_at = COALESCE(started_at, created_at) "
+            "WHERE status IN ('COMPLETED', 'FAILED', 'CANCELLED')"
+        )
+        if op.get_context().as_sql:
+            # Generating SQL offline: the table's size isn't known, so backfill it in one statement
+            op.execute(backfill)
+        else:
+            bind = op.get_bind()
+            last_id = bind.execute(sa.text('SELECT MAX(id) FROM deployments')).scalar() or 0
+            for start in range(0, last_id, BACKFILL_BATCH):
+                bind.execute(
+                    sa.text(backfill + " AND id > :start AND id <= :end"),
+                    {'start': start, 'end': start + BACKFILL_BATCH}
+                )
+        op.create_index(
+            'ix_deployments_finished', 'deployments', ['finished_at'],
+            postgresql_where=TERMINAL_ONLY, sqlite_where=TERMINAL_ONLY, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_deployments_finished', table_name='deployments', postgresql_concurrently=True)
+    op.drop_index('ix_deployment_history_dependencies_dependency_id', table_name='deployment_history_dependencies')
+    op.drop_table('deployment_history_dependencies')
+    # Drops the partitions with it
+    op.drop_index('ix_deployment_history_user_page', table_name='deployment_history')
+    op.drop_table('deployment_history')
+    op.drop_column('deployments', 'finished_at')
@@ -0,0 +1,49 @@
+"""Deployment events
+
+Adds deployment_events, the append-only log of deployment state
+transitions, with one index for a deployment's events in order and one
+for the transitions into a state over a time window.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:22:51.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('deployment_events',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('deployment_id', sa.Integer(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=True),
+    # Only transitionactor is new; only PostgreSQL's ENUM honours create_type
+    sa.Column('priority', postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', name='deploymentpriority', create_type=False), nullable=True),
+    sa.Column('from_status', postgresql.ENUM('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='deploymentstatus', create_type=False), nullable=True),
+    sa.Column('to_status', postgresql.ENUM('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='deploymentstatus', create_type=False), nullable=False),
+    sa.Column('actor', sa.Enum('API', 'SCHEDULER', 'PREEMPTION', name='transitionactor'), nullable=False),
+    sa.Column('reason', sa.String(), nullable=False),
+    sa.Column('at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deployment_events_deployment', 'deployment_events', ['deployment_id', 'id'])
+    op.create_index('ix_deployment_events_to_status_at', 'deployment_events', ['to_status', 'at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_deployment_events_to_status_at', table_name='deployment_events')
+    op.drop_index('ix_deployment_events_deployment', table_name='deployment_events')
+    op.drop_table('deployment_events')
+    # PostgreSQL keeps enum types around after their tables are dropped
+    sa.Enum(name='transitionactor').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,33 @@
+"""Row versions
+
+Adds a version column to deployments and clusters. Every update bumps it,
+so an update that read an older version matches no row and the writer
+knows it lost a race instead of overwriting the other change.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:03:12.481925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default, so PostgreSQL adds the column without rewriting the table
+    op.add_column('deployments', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('clusters', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('clusters', 'version')
+    op.drop_column('deployments', 'version')
@@ -0,0 +1,38 @@
+"""Membership index
+
+Adds ix_user_organization_user_org on user_organization (user_id,
+organization_id). Authorization asks on every request whether a user is a
+member of an organization, or for all of a user's organizations; the index
+answers both without reading the table, which had no index at all. On
+PostgreSQL it is built CONCURRENTLY.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 19:41:37.215804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_organization_user_org', 'user_organization', ['user_id', 'organization_id'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_organization_user_org', table_name='user_organization', postgresql_concurrently=True)
@@ -0,0 +1,60 @@
+"""Deployment ID autoincrement
+
+Makes deployments.id AUTOINCREMENT on SQLite, which otherwise hands out the
+ID of the last deployment again once it has been deleted or archived, so an
+ID in deployment_history could stand for two deployments. The table is
+rebuilt, and the sequence starts after every ID already used by either
+table. PostgreSQL sequences never reuse IDs, so nothing changes there.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 21:05:43.127364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING_ONLY = sa.text("status = 'PENDING'")
+
+
+def _rebuild(autoincrement: bool) -> None:
+    with op.batch_alter_table('deployments', recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    # Batch mode copies the indexes as reflected, which loses their descending columns
+    op.drop_index('ix_deployments_ready_queue', table_name='deployments')
+    op.drop_index('ix_deployments_cluster_status', table_name='deployments')
+    op.create_index(
+        'ix_deployments_ready_queue', 'deployments',
+        ['cluster_id', 'unmet_dependencies', sa.text('priority DESC'), 'created_at'],
+        sqlite_where=PENDING_ONLY
+    )
+    op.create_index(
+        'ix_deployments_cluster_status', 'deployments', ['cluster_id', 'status', sa.text('priority DESC'), 'created_at']
+    )
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(autoincrement=True)
+    # Archived IDs are no longer in deployments, so the rebuilt table alone would start below them
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'deployments'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'deployments', coalesce(max(id), 0) FROM ("
+        "SELECT max(id) AS id FROM deployments UNION ALL SELECT max(id) FROM deployment_history)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(autoincrement=False)
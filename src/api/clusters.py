@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.models.base import get_db
+from src.models.base import get_async_db, get_db
 from src.models.schemas import Cluster, ClusterCreate, ClusterUpdate, User
 from src.services import cluster as cluster_service
-from src.services import organization as org_service
-from src.utils.auth import get_current_active_user
+from src.utils.auth import Memberships, get_current_active_user, get_current_active_user_async, get_memberships, get_memberships_async
+from src.utils.etags import parse_if_match, set_etag
+from src.utils.pagination import MAX_PAGE_SIZE, decode_cursor, paginate
 
 router = APIRouter(
     prefix="/clusters",
@@ -15,38 +17,40 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[Cluster])
-def get_clusters(
+async def get_clusters(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user_async),
+    memberships: Memberships = Depends(get_memberships_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all clusters that the current user has access to."""
+    """
+    Get a page of the clusters that the current user has access to, in id
+    order. If there are more, the X-Next-Cursor header holds the cursor of
+    the next page.
+    """
     # Get all organizations the user is a member of
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    org_ids = [org.id for org in user_orgs]
-    
-    # Get all clusters for these organizations
-    clusters = []
-    for org_id in org_ids:
-        org_clusters = cluster_service.get_organization_clusters(db, org_id)
-        clusters.extend(org_clusters)
+    org_ids = await memberships.org_ids_async(db)
     
-    return clusters[skip:skip+limit]
+    # Get the clusters of these organizations, and one more to find out whether there is a next page
+    clusters = await cluster_service.get_organizations_clusters_async(
+        db, org_ids, skip, limit + 1, after_id=decode_cursor(cursor)
+    )
+    return paginate(response, clusters, limit)
 
 
 @router.post("/", response_model=Cluster)
 def create_cluster(
     cluster: ClusterCreate,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Create a new cluster for an organization."""
     # Check if the user is a member of the organization
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if cluster.organization_id not in user_org_ids:
+    if not memberships.includes(db, cluster.organization_id):
         raise HTTPException(status_code=403, detail="Not a member of this organization")
     
     # Create the cluster
@@ -54,24 +58,24 @@ def create_cluster(
 
 
 @router.get("/{cluster_id}", response_model=Cluster)
-def get_cluster(
+async def get_cluster(
     cluster_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: User = Depends(get_current_active_user_async),
+    memberships: Memberships = Depends(get_memberships_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get a specific cluster."""
+    """Get a specific cluster. Its ETag is its version, for If-Match on updates."""
     # First get the cluster
-    db_cluster = cluster_service.get_cluster(db, cluster_id)
+    db_cluster = await cluster_service.get_cluster_async(db, cluster_id)
     if db_cluster is None:
         raise HTTPException(status_code=404, detail="Cluster not found")
     
     # Check if the user is a member of the organization that owns this cluster
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if db_cluster.organization_id not in user_org_ids:
+    if not await memberships.includes_async(db, db_cluster.organization_id):
         raise HTTPException(status_code=403, detail="Not authorized to access this cluster")
     
+    set_etag(response, db_cluster.version)
     return db_cluster
 
 
@@ -79,30 +83,40 @@ def get_cluster(
 def update_cluster(
     cluster_id: int,
     cluster: ClusterUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    """Update a cluster."""
+    """
+    Update a cluster. With If-Match, only if it is still at that ETag
+    (412 otherwise); 409 if concurrent changes kept getting in the way.
+    """
+    expected_version = parse_if_match(if_match)
     # First get the cluster
     db_cluster = cluster_service.get_cluster(db, cluster_id)
     if db_cluster is None:
         raise HTTPException(status_code=404, detail="Cluster not found")
     
     # Check if the user is a member of the organization that owns this cluster
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if db_cluster.organization_id not in user_org_ids:
+    if not memberships.includes(db, db_cluster.organization_id):
         raise HTTPException(status_code=403, detail="Not authorized to update this cluster")
     
     # Update the cluster
-    return cluster_service.update_cluster(db, cluster_id, cluster)
+    updated_cluster = cluster_service.update_cluster(db, cluster_id, cluster, expected_version)
+    if updated_cluster is None:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    set_etag(response, updated_cluster.version)
+    return updated_cluster
 
 
 @router.delete("/{cluster_id}", response_model=bool)
 def delete_cluster(
     cluster_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Delete a cluster."""
@@ -112,10 +126,7 @@ def delete_cluster(
         raise HTTPException(status_code=404, detail="Cluster not found")
     
     # Check if the user is a member of the organization that owns this cluster
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if db_cluster.organization_id not in user_org_ids:
+    if not memberships.includes(db, db_cluster.organization_id):
         raise HTTPException(status_code=403, detail="Not authorized to delete this cluster")
     
     # Delete the cluster
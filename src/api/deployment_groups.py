@@ -0,0 +1,117 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from src.models.base import get_db
+from src.models.schemas import DeploymentGroup, DeploymentGroupCreate, User
+from src.services import deployment as deployment_service
+from src.services import cluster as cluster_service
+from src.utils.auth import Memberships, get_current_active_user, get_memberships
+
+router = APIRouter(
+    prefix="/deployment-groups",
+    tags=["deployment-groups"],
+)
+
+
+def get_authorized_group(db: Session, group_id: int, user: User, memberships: Memberships, action: str):
+    """Get a deployment group, checking the user owns it or belongs to the cluster's organization."""
+    db_group = deployment_service.get_deployment_group(db, group_id)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Deployment group not found")
+    
+    if db_group.user_id != user.id:
+        db_cluster = cluster_service.get_cluster(db, db_group.cluster_id)
+        if db_cluster is None:
+            raise HTTPException(status_code=404, detail="Cluster not found")
+        
+        if not memberships.includes(db, db_cluster.organization_id):
+            raise HTTPException(status_code=403, detail=f"Not authorized to {action} this deployment group")
+    
+    return db_group
+
+
+@router.post("/", response_model=DeploymentGroup)
+def create_deployment_group(
+    group: DeploymentGroupCreate,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Submit a group of deployments that must all run at the same time."""
+    # First check if the cluster exists
+    db_cluster = cluster_service.get_cluster(db, group.cluster_id)
+    if db_cluster is None:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    # Check if the user is a member of the organization that owns this cluster
+    if not memberships.includes(db, db_cluster.organization_id):
+        raise HTTPException(status_code=403, detail="Not authorized to create deployments for this cluster")
+    
+    # Validate dependencies
+    for dep_id in group.dependency_ids:
+        dependency = deployment_service.get_deployment(db, dep_id)
+        if not dependency:
+            raise HTTPException(status_code=404, detail=f"Dependency deployment with ID {dep_id} not found")
+        
+        if dependency.cluster_id != group.cluster_id:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Dependency deployment with ID {dep_id} is not in the same cluster"
+            )
+    
+    db_group = deployment_service.create_deployment_group(db, group, current_user.id)
+    if db_group is None:
+        raise HTTPException(status_code=400, detail="Could not create deployment group")
+    
+    return db_group
+
+
+@router.get("/{group_id}", response_model=DeploymentGroup)
+def get_deployment_group(
+    group_id: int,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Get a deployment group and its members."""
+    return get_authorized_group(db, group_id, current_user, memberships, "access")
+
+
+@router.post("/{group_id}/start", response_model=DeploymentGroup)
+def start_deployment_group(
+    group_id: int,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Start all pending members of a deployment group at once."""
+    get_authorized_group(db, group_id, current_user, memberships, "start")
+    
+    started_group = deployment_service.start_deployment_group(db, group_id)
+    if started_group is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Could not start deployment group. Its members may not all be ready or resources are unavailable."
+        )
+    
+    return started_group
+
+
+@router.post("/{group_id}/cancel", response_model=DeploymentGroup)
+def cancel_deployment_group(
+    group_id: int,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Cancel all pending members of a deployment group."""
+    get_authorized_group(db, group_id, current_user, memberships, "cancel")
+    
+    cancelled_group = deployment_service.cancel_deployment_group(db, group_id)
+    if cancelled_group is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Could not cancel deployment group. It may have no pending deployments."
+        )
+    
+    return cancelled_group
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Callable, List, Dict, Any, Optional
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.models.base import get_db
-from src.models.schemas import Deployment, DeploymentCreate, DeploymentUpdate, User
+from src.models.base import get_async_db, get_db
+from src.models.schemas import (
+    DependencyDirectionEnum, Deployment, DeploymentBatchCreate, DeploymentBatchResult, DeploymentBulkAction, DeploymentBulkResult, DeploymentCreate, DeploymentEvent, DeploymentGraph, DeploymentHistoryDetail, DeploymentHistoryEntry, DeploymentPriorityEnum, DeploymentStatusEnum, DeploymentUpdate, User, WaitTimeStats
+)
 from src.models.models import DeploymentStatus
 from src.services import deployment as deployment_service
 from src.services import cluster as cluster_service
-from src.services import organization as org_service
-from src.utils.auth import get_current_active_user
+from src.services import event_log
+from src.services import history as history_service
+from src.utils.auth import Memberships, get_current_active_user, get_current_active_user_async, get_memberships, get_memberships_async
+from src.utils.etags import parse_if_match, set_etag
+from src.utils.pagination import MAX_PAGE_SIZE, decode_cursor, paginate
 
 router = APIRouter(
     prefix="/deployments",
@@ -17,20 +24,42 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[Deployment])
-def get_deployments(
+async def get_deployments(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[DeploymentStatusEnum] = None,
+    priority: Optional[DeploymentPriorityEnum] = None,
+    cluster_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all deployments for the current user."""
-    return deployment_service.get_user_deployments(db, current_user.id)[skip:skip+limit]
+    """
+    Get a page of the current user's deployments, in id order, optionally
+    filtered. If there are more, the X-Next-Cursor header holds the cursor
+    of the next page.
+    """
+    # Fetch one extra row to find out whether there is a next page
+    deployments = await deployment_service.get_user_deployments_async(
+        db, current_user.id, skip, limit + 1,
+        after_id=decode_cursor(cursor),
+        status=status,
+        priority=priority,
+        cluster_id=cluster_id,
+        created_after=created_after,
+        created_before=created_before
+    )
+    return paginate(response, deployments, limit)
 
 
 @router.post("/", response_model=Deployment)
 def create_deployment(
     deployment: DeploymentCreate,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Create a new deployment for a cluster."""
@@ -40,10 +69,7 @@ def create_deployment(
         raise HTTPException(status_code=404, detail="Cluster not found")
     
     # Check if the user is a member of the organization that owns this cluster
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if db_cluster.organization_id not in user_org_ids:
+    if not memberships.includes(db, db_cluster.organization_id):
         raise HTTPException(status_code=403, detail="Not authorized to create a deployment for this cluster")
     
     # Validate dependencies
@@ -79,31 +105,231 @@ def create_deployment(
     return db_deployment
 
 
-@router.get("/{deployment_id}", response_model=Deployment)
-def get_deployment(
+@router.post("/batch", response_model=DeploymentBatchResult)
+def create_deployment_batch(
+    batch: DeploymentBatchCreate,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """
+    Submit many deployments at once. Items are checked like single
+    submissions and can depend on earlier items in the batch by ref. The
+    valid ones are created in one transaction; each item gets a result
+    with its new ID or the reason it was rejected.
+    """
+    org_ids = memberships.org_ids(db)
+    results = deployment_service.create_deployment_batch(db, batch, current_user.id, org_ids)
+    
+    created = sum(1 for result in results if result["id"] is not None)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+def check_deployment_access(db: Session, db_deployment, user: User, memberships: Memberships, action: str):
+    """Check the user owns the deployment or belongs to the organization that owns its cluster."""
+    if db_deployment.user_id == user.id:
+        return
+    
+    db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
+    if db_cluster is None:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    if not memberships.includes(db, db_cluster.organization_id):
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action} this deployment")
+
+
+def run_bulk_action(
+    db: Session,
+    deployment_ids: List[int],
+    user: User,
+    memberships: Memberships,
+    action: str,
+    apply: Callable[[List[int]], Dict[int, Optional[str]]]
+):
+    """
+    Apply a bulk action to the deployments the user may act on (their own,
+    or those in their organizations' clusters), checked with one query, and
+    report the outcome and resulting status of each.
+    """
+    deployment_ids = list(dict.fromkeys(deployment_ids))
+    org_ids = memberships.org_ids(db)
+    
+    errors = {deployment_id: "Deployment not found" for deployment_id in deployment_ids}
+    allowed = []
+    for row in deployment_service.get_deployment_access(db, deployment_ids):
+        if row.user_id == user.id or row.organization_id in org_ids:
+            allowed.append(row.id)
+        else:
+            errors[row.id] = f"Not authorized to {action} this deployment"
+    
+    if allowed:
+        errors.update(apply(allowed))
+    
+    statuses = deployment_service.get_deployment_statuses(db, deployment_ids)
+    results = [
+        {
+            "id": deployment_id,
+            "status": statuses[deployment_id].value if deployment_id in statuses else None,
+            "error": errors[deployment_id]
+        }
+        for deployment_id in deployment_ids
+    ]
+    succeeded = sum(1 for result in results if result["error"] is None)
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+
+@router.post("/bulk/start", response_model=DeploymentBulkResult)
+def start_deployments(
+    action: DeploymentBulkAction,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Start many deployments at once, as far as their clusters' resources allow."""
+    return run_bulk_action(
+        db, action.deployment_ids, current_user, memberships, "start",
+        lambda deployment_ids: deployment_service.start_deployments(db, deployment_ids)
+    )
+
+
+@router.post("/bulk/stop", response_model=DeploymentBulkResult)
+def stop_deployments(
+    action: DeploymentBulkAction,
+    status: DeploymentStatus = DeploymentStatus.COMPLETED,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Stop many running deployments at once."""
+    return run_bulk_action(
+        db, action.deployment_ids, current_user, memberships, "stop",
+        lambda deployment_ids: deployment_service.stop_deployments(db, deployment_ids, status)
+    )
+
+
+@router.post("/bulk/cancel", response_model=DeploymentBulkResult)
+def cancel_deployments(
+    action: DeploymentBulkAction,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Cancel many pending deployments at once."""
+    return run_bulk_action(
+        db, action.deployment_ids, current_user, memberships, "cancel",
+        lambda deployment_ids: deployment_service.cancel_deployments(db, deployment_ids)
+    )
+
+
+@router.get("/history", response_model=List[DeploymentHistoryEntry])
+def get_deployment_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[DeploymentStatusEnum] = None,
+    cluster_id: Optional[int] = None,
+    finished_after: Optional[datetime] = None,
+    finished_before: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a page of the current user's archived deployments, in id order,
+    optionally filtered. If there are more, the X-Next-Cursor header holds
+    the cursor of the next page.
+    """
+    # Fetch one extra row to find out whether there is a next page
+    entries = history_service.get_user_history(
+        db, current_user.id, limit + 1,
+        after_id=decode_cursor(cursor),
+        status=status,
+        cluster_id=cluster_id,
+        finished_after=finished_after,
+        finished_before=finished_before
+    )
+    return paginate(response, entries, limit)
+
+
+@router.get("/history/{deployment_id}", response_model=DeploymentHistoryDetail)
+def get_archived_deployment(
     deployment_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    """Get a specific deployment."""
+    """Get an archived deployment with the dependency edges it had when it was archived."""
+    entry = history_service.get_history_entry(db, deployment_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Archived deployment not found")
+    
+    # Authorization checks
+    if entry["user_id"] != current_user.id:
+        # If not, check if the user is a member of the organization that owns the cluster
+        db_cluster = cluster_service.get_cluster(db, entry["cluster_id"])
+        if db_cluster is None or not memberships.includes(db, db_cluster.organization_id):
+            raise HTTPException(status_code=403, detail="Not authorized to access this deployment")
+    
+    return entry
+
+
+@router.get("/stats/wait-times", response_model=WaitTimeStats)
+def get_wait_time_stats(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cluster_id: Optional[int] = None,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """
+    Get queue-wait percentiles per priority for the deployments that started
+    between `since` and `until` (the last 24 hours by default) on the
+    clusters of the current user's organizations, or on `cluster_id`.
+    """
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=1)
+    
+    user_org_ids = memberships.org_ids(db)
+    if cluster_id is not None:
+        db_cluster = cluster_service.get_cluster(db, cluster_id)
+        if db_cluster is None:
+            raise HTTPException(status_code=404, detail="Cluster not found")
+        if db_cluster.organization_id not in user_org_ids:
+            raise HTTPException(status_code=403, detail="Not authorized to access this cluster")
+    
+    return {
+        "since": since,
+        "until": until,
+        "cluster_id": cluster_id,
+        "priorities": event_log.get_wait_time_percentiles(db, user_org_ids, since, until, cluster_id)
+    }
+
+
+@router.get("/{deployment_id}", response_model=Deployment)
+async def get_deployment(
+    deployment_id: int,
+    response: Response,
+    current_user: User = Depends(get_current_active_user_async),
+    memberships: Memberships = Depends(get_memberships_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a specific deployment. Its ETag is its version, for If-Match on updates."""
     # Get the deployment
-    db_deployment = deployment_service.get_deployment(db, deployment_id)
+    db_deployment = await deployment_service.get_deployment_async(db, deployment_id)
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
     # Check if this is the user's deployment
     if db_deployment.user_id != current_user.id:
         # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
+        db_cluster = await cluster_service.get_cluster_async(db, db_deployment.cluster_id)
         if db_cluster is None:
             raise HTTPException(status_code=404, detail="Cluster not found")
         
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
+        if not await memberships.includes_async(db, db_cluster.organization_id):
             raise HTTPException(status_code=403, detail="Not authorized to access this deployment")
     
+    set_etag(response, db_deployment.version)
     return db_deployment
 
 
@@ -111,59 +337,56 @@ def get_deployment(
 def update_deployment(
     deployment_id: int,
     deployment: DeploymentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    """Update a deployment."""
+    """
+    Update a deployment. With If-Match, only if it is still at that ETag
+    (412 otherwise); 409 if concurrent changes kept getting in the way.
+    """
+    expected_version = parse_if_match(if_match)
     # Get the deployment
     db_deployment = deployment_service.get_deployment(db, deployment_id)
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
-    # Check if this is the user's deployment
-    if db_deployment.user_id != current_user.id:
-        # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
-        if db_cluster is None:
-            raise HTTPException(status_code=404, detail="Cluster not found")
-        
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to update this deployment")
+    check_deployment_access(db, db_deployment, current_user, memberships, "update")
     
-    # Validate dependencies if provided
+    # Validate dependencies if provided, all of them together
     if deployment.dependency_ids is not None:
+        # Prevent circular dependencies
+        if deployment_id in deployment.dependency_ids:
+            raise HTTPException(
+                status_code=400,
+                detail="A deployment cannot depend on itself"
+            )
+        
+        dependencies = {d.id: d for d in deployment_service.get_deployments_by_ids(db, deployment.dependency_ids)}
         for dep_id in deployment.dependency_ids:
-            # Prevent circular dependencies
-            if dep_id == deployment_id:
-                raise HTTPException(
-                    status_code=400,
-                    detail="A deployment cannot depend on itself"
-                )
-                
-            dependency = deployment_service.get_deployment(db, dep_id)
-            if not dependency:
+            if dep_id not in dependencies:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Dependency deployment with ID {dep_id} not found"
                 )
             
             # Check if the dependency is in the same cluster
-            if dependency.cluster_id != db_deployment.cluster_id:
+            if dependencies[dep_id].cluster_id != db_deployment.cluster_id:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Dependency deployment with ID {dep_id} is not in the same cluster"
                 )
-                
-            # Check for circular dependencies
-            if is_circular_dependency(db, dep_id, deployment_id):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Circular dependency detected"
-                )
-            
+        
+        # Check for circular dependencies
+        if deployment_service.find_dependency_cycles(db, deployment_id, deployment.dependency_ids):
+            raise HTTPException(
+                status_code=400,
+                detail="Circular dependency detected"
+            )
+        
+        for dependency in dependencies.values():
             # Validate priority rule for high priority deployments
             is_high_priority = False
             
@@ -180,40 +403,19 @@ def update_deployment(
                 )
     
     # Update the deployment
-    updated_deployment = deployment_service.update_deployment(db, deployment_id, deployment)
+    updated_deployment = deployment_service.update_deployment(db, deployment_id, deployment, expected_version)
     if updated_deployment is None:
         raise HTTPException(status_code=400, detail="Could not update deployment")
     
+    set_etag(response, updated_deployment.version)
     return updated_deployment
 
 
-def is_circular_dependency(db: Session, dep_id: int, deployment_id: int, visited=None):
-    """Check if adding a dependency would create a circular dependency."""
-    if visited is None:
-        visited = set()
-    
-    if dep_id in visited:
-        return False
-    
-    visited.add(dep_id)
-    
-    dependency = deployment_service.get_deployment(db, dep_id)
-    if not dependency:
-        return False
-    
-    for dep in dependency.dependencies:
-        if dep.id == deployment_id:
-            return True
-        if is_circular_dependency(db, dep.id, deployment_id, visited):
-            return True
-    
-    return False
-
-
 @router.delete("/{deployment_id}", response_model=bool)
 def delete_deployment(
     deployment_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Delete a deployment."""
@@ -222,18 +424,7 @@ def delete_deployment(
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
-    # Check if this is the user's deployment
-    if db_deployment.user_id != current_user.id:
-        # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
-        if db_cluster is None:
-            raise HTTPException(status_code=404, detail="Cluster not found")
-        
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to delete this deployment")
+    check_deployment_access(db, db_deployment, current_user, memberships, "delete")
     
     # Delete the deployment
     result = deployment_service.delete_deployment(db, deployment_id)
@@ -247,6 +438,7 @@ def delete_deployment(
 def start_deployment(
     deployment_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Start a deployment."""
@@ -255,18 +447,7 @@ def start_deployment(
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
-    # Check if this is the user's deployment
-    if db_deployment.user_id != current_user.id:
-        # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
-        if db_cluster is None:
-            raise HTTPException(status_code=404, detail="Cluster not found")
-        
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to start this deployment")
+    check_deployment_access(db, db_deployment, current_user, memberships, "start")
     
     # Start the deployment
     started_deployment = deployment_service.start_deployment(db, deployment_id)
@@ -284,6 +465,7 @@ def stop_deployment(
     deployment_id: int,
     status: DeploymentStatus = DeploymentStatus.COMPLETED,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Stop a deployment."""
@@ -292,18 +474,7 @@ def stop_deployment(
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
-    # Check if this is the user's deployment
-    if db_deployment.user_id != current_user.id:
-        # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
-        if db_cluster is None:
-            raise HTTPException(status_code=404, detail="Cluster not found")
-        
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to stop this deployment")
+    check_deployment_access(db, db_deployment, current_user, memberships, "stop")
     
     # Stop the deployment
     stopped_deployment = deployment_service.stop_deployment(db, deployment_id, status)
@@ -320,6 +491,7 @@ def stop_deployment(
 def cancel_deployment(
     deployment_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Cancel a pending deployment."""
@@ -328,18 +500,7 @@ def cancel_deployment(
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
-    # Check if this is the user's deployment
-    if db_deployment.user_id != current_user.id:
-        # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
-        if db_cluster is None:
-            raise HTTPException(status_code=404, detail="Cluster not found")
-        
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to cancel this deployment")
+    check_deployment_access(db, db_deployment, current_user, memberships, "cancel")
     
     # Cancel the deployment
     cancelled_deployment = deployment_service.cancel_deployment(db, deployment_id)
@@ -356,6 +517,7 @@ def cancel_deployment(
 def get_deployment_dependencies(
     deployment_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Get all dependencies for a deployment."""
@@ -364,26 +526,16 @@ def get_deployment_dependencies(
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
-    # Authorization checks
-    if db_deployment.user_id != current_user.id:
-        # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
-        if db_cluster is None:
-            raise HTTPException(status_code=404, detail="Cluster not found")
-        
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to access this deployment")
+    check_deployment_access(db, db_deployment, current_user, memberships, "access")
     
-    return db_deployment.dependencies
+    return deployment_service.get_deployment_dependencies(db, deployment_id)
 
 
 @router.get("/{deployment_id}/dependents", response_model=List[Deployment])
 def get_deployment_dependents(
     deployment_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Get all deployments that depend on this deployment."""
@@ -392,17 +544,58 @@ def get_deployment_dependents(
     if db_deployment is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
+    check_deployment_access(db, db_deployment, current_user, memberships, "access")
+    
+    return deployment_service.get_deployment_dependents(db, deployment_id) 
+
+
+@router.get("/{deployment_id}/graph", response_model=DeploymentGraph)
+def get_deployment_graph(
+    deployment_id: int,
+    direction: DependencyDirectionEnum = DependencyDirectionEnum.UPSTREAM,
+    max_depth: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """
+    Get every deployment a deployment transitively depends on (upstream) or
+    that transitively depends on it (downstream), optionally up to
+    `max_depth` levels away.
+    """
+    # Get the deployment
+    db_deployment = deployment_service.get_deployment(db, deployment_id)
+    if db_deployment is None:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    check_deployment_access(db, db_deployment, current_user, memberships, "access")
+    
+    return deployment_service.get_deployment_graph(db, deployment_id, direction, max_depth)
+
+
+@router.get("/{deployment_id}/events", response_model=List[DeploymentEvent])
+def get_deployment_events(
+    deployment_id: int,
+    current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    """Get the state transitions of a deployment, live or archived, oldest first."""
+    # The log outlives archiving, so fall back to the history store
+    db_deployment = deployment_service.get_deployment(db, deployment_id)
+    if db_deployment is not None:
+        owner_id, cluster_id = db_deployment.user_id, db_deployment.cluster_id
+    else:
+        entry = history_service.get_history_entry(db, deployment_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Deployment not found")
+        owner_id, cluster_id = entry["user_id"], entry["cluster_id"]
+    
     # Authorization checks
-    if db_deployment.user_id != current_user.id:
+    if owner_id != current_user.id:
         # If not, check if the user is a member of the organization that owns the cluster
-        db_cluster = cluster_service.get_cluster(db, db_deployment.cluster_id)
-        if db_cluster is None:
-            raise HTTPException(status_code=404, detail="Cluster not found")
-        
-        user_orgs = org_service.get_user_organizations(db, current_user.id)
-        user_org_ids = [org.id for org in user_orgs]
-        
-        if db_cluster.organization_id not in user_org_ids:
+        db_cluster = cluster_service.get_cluster(db, cluster_id)
+        if db_cluster is None or not memberships.includes(db, db_cluster.organization_id):
             raise HTTPException(status_code=403, detail="Not authorized to access this deployment")
     
-    return db_deployment.dependents 
\ No newline at end of file
+    return event_log.get_deployment_events(db, deployment_id)
@@ -5,7 +5,7 @@ from sqlalchemy.orm import Session
 from src.models.base import get_db
 from src.models.schemas import Organization, OrganizationCreate, OrganizationUpdate, User
 from src.services import organization as org_service
-from src.utils.auth import get_current_active_user
+from src.utils.auth import Memberships, get_current_active_user, get_memberships
 
 router = APIRouter(
     prefix="/organizations",
@@ -38,14 +38,12 @@ def create_organization(
 def get_organization(
     org_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Get a specific organization."""
     # First check if the user is a member of this organization
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if org_id not in user_org_ids:
+    if not memberships.includes(db, org_id):
         raise HTTPException(status_code=403, detail="Not a member of this organization")
     
     db_org = org_service.get_organization(db, org_id)
@@ -59,14 +57,12 @@ def update_organization(
     org_id: int,
     organization: OrganizationUpdate,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Update an organization."""
     # First check if the user is a member of this organization
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if org_id not in user_org_ids:
+    if not memberships.includes(db, org_id):
         raise HTTPException(status_code=403, detail="Not a member of this organization")
     
     db_org = org_service.update_organization(db, org_id, organization)
@@ -79,14 +75,12 @@ def update_organization(
 def delete_organization(
     org_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Delete an organization."""
     # First check if the user is a member of this organization
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if org_id not in user_org_ids:
+    if not memberships.includes(db, org_id):
         raise HTTPException(status_code=403, detail="Not a member of this organization")
     
     result = org_service.delete_organization(db, org_id)
@@ -99,14 +93,12 @@ def delete_organization(
 def regenerate_invite_code(
     org_id: int,
     current_user: User = Depends(get_current_active_user),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
     """Regenerate the invite code for an organization."""
     # First check if the user is a member of this organization
-    user_orgs = org_service.get_user_organizations(db, current_user.id)
-    user_org_ids = [org.id for org in user_orgs]
-    
-    if org_id not in user_org_ids:
+    if not memberships.includes(db, org_id):
         raise HTTPException(status_code=403, detail="Not a member of this organization")
     
     db_org = org_service.regenerate_invite_code(db, org_id)
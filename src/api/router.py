@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from src.api import auth, organizations, clusters, deployments
+from src.api import auth, organizations, clusters, deployments, deployment_groups
 
 api_router = APIRouter()
 
@@ -8,4 +8,5 @@ api_router = APIRouter()
 api_router.include_router(auth.router)
 api_router.include_router(organizations.router)
 api_router.include_router(clusters.router)
-api_router.include_router(deployments.router) 
\ No newline at end of file
+api_router.include_router(deployments.router) 
+api_router.include_router(deployment_groups.router)
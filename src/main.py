@@ -6,9 +6,12 @@ from fastapi.responses import FileResponse
 from dotenv import load_dotenv
 import logging
 
-from src.models.base import Base, engine
+from src.models.base import SessionLocal
 from src.api.router import api_router
 from src.scheduler.worker import start_scheduler, stop_scheduler
+from src.services.cluster import reconcile_cluster_resources
+from src.utils.migrations import run_migrations
+from src.utils.pagination import NEXT_CURSOR_HEADER
 
 # Load environment variables
 load_dotenv()
@@ -17,8 +20,8 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Bring the database schema up to date
+run_migrations()
 
 # Create FastAPI app
 app = FastAPI(
@@ -34,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Mount static files
@@ -48,6 +52,13 @@ async def startup_event():
     """Start the scheduler when the application starts."""
     logger.info("Starting application")
     
+    # Bring the resource counters in line with the allocation ledger
+    db = SessionLocal()
+    try:
+        reconcile_cluster_resources(db)
+    finally:
+        db.close()
+    
     # Only start the scheduler if not in testing mode
     if os.environ.get("TESTING") != "true":
         start_scheduler()
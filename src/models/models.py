@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Enum, Table, DateTime
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Index, Integer, String, Float, Enum, Table, DateTime, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -10,7 +10,9 @@ user_organization = Table(
     "user_organization",
     Base.metadata,
     Column("user_id", Integer, ForeignKey("users.id")),
-    Column("organization_id", Integer, ForeignKey("organizations.id"))
+    Column("organization_id", Integer, ForeignKey("organizations.id")),
+    # Covers a user's memberships and the check for one, without reading the table
+    Index("ix_user_organization_user_org", "user_id", "organization_id")
 )
 
 # Association table for deployment dependencies
@@ -18,7 +20,9 @@ deployment_dependencies = Table(
     "deployment_dependencies",
     Base.metadata,
     Column("dependent_id", Integer, ForeignKey("deployments.id"), primary_key=True),
-    Column("dependency_id", Integer, ForeignKey("deployments.id"), primary_key=True)
+    Column("dependency_id", Integer, ForeignKey("deployments.id"), primary_key=True),
+    # The primary key covers lookups by dependent; this one covers lookups of dependents
+    Index("ix_deployment_dependencies_dependency_id", "dependency_id")
 )
 
 
@@ -30,12 +34,28 @@ class DeploymentStatus(enum.Enum):
     CANCELLED = "cancelled"
 
 
+# States a deployment never leaves on its own. Deployments that reached one
+# of them are eventually moved to deployment_history (see src.services.history).
+TERMINAL_STATUSES = (DeploymentStatus.COMPLETED, DeploymentStatus.FAILED, DeploymentStatus.CANCELLED)
+
+# The same, as a filter spelled out rather than bound, so that the database
+# can tell a query using it may use the partial index ix_deployments_finished
+TERMINAL_ONLY = text("status IN ('COMPLETED', 'FAILED', 'CANCELLED')")
+
+
 class DeploymentPriority(enum.Enum):
     LOW = 1
     MEDIUM = 2
     HIGH = 3
 
 
+class TransitionActor(enum.Enum):
+    """What moved a deployment from one state to another."""
+    API = "api"
+    SCHEDULER = "scheduler"
+    PREEMPTION = "preemption"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -78,14 +98,43 @@ class Cluster(Base):
     available_cpu = Column(Float)  # in cores
     available_gpu = Column(Float)  # in count
     
+    # Exact capacity accounting in integer units (see src.utils.resources).
+    # The allocated counters always equal the sum of the cluster's rows in
+    # resource_allocations, and available_* are derived from them.
+    total_ram_mib = Column(Integer, default=0, server_default="0", nullable=False)
+    total_cpu_millicores = Column(Integer, default=0, server_default="0", nullable=False)
+    total_gpu_milli = Column(Integer, default=0, server_default="0", nullable=False)
+    allocated_ram_mib = Column(Integer, default=0, server_default="0", nullable=False)
+    allocated_cpu_millicores = Column(Integer, default=0, server_default="0", nullable=False)
+    allocated_gpu_milli = Column(Integer, default=0, server_default="0", nullable=False)
+    
     organization_id = Column(Integer, ForeignKey("organizations.id"))
     creator_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    # Row version, bumped by every update (see src.services.concurrency)
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+    
     # Relationships
     organization = relationship("Organization", back_populates="clusters")
     creator = relationship("User", back_populates="created_clusters")
     deployments = relationship("Deployment", back_populates="cluster")
+    
+    __mapper_args__ = {"version_id_col": version}
+
+
+class DeploymentGroup(Base):
+    """A gang of deployments that must be started (and preempted) all together."""
+    __tablename__ = "deployment_groups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    cluster_id = Column(Integer, ForeignKey("clusters.id"))
+    user_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    deployments = relationship("Deployment", back_populates="group")
 
 
 class Deployment(Base):
@@ -100,15 +149,26 @@ class Deployment(Base):
     required_ram = Column(Float)  # in GB
     required_cpu = Column(Float)  # in cores
     required_gpu = Column(Float)  # in count
+    expected_runtime = Column(Integer, nullable=True)  # in seconds, used for backfill scheduling
     
     cluster_id = Column(Integer, ForeignKey("clusters.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
+    group_id = Column(Integer, ForeignKey("deployment_groups.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)  # When it reached a terminal state
+    
+    # Number of dependencies that have not reached COMPLETED yet.
+    # A pending deployment is ready to be scheduled when this is zero.
+    unmet_dependencies = Column(Integer, default=0, server_default="0", nullable=False)
+    
+    # Row version, bumped by every update (see src.services.concurrency)
+    version = Column(Integer, default=1, server_default="1", nullable=False)
     
     # Relationships
     cluster = relationship("Cluster", back_populates="deployments")
     user = relationship("User", back_populates="deployments")
+    group = relationship("DeploymentGroup", back_populates="deployments")
     
     # Dependencies
     dependencies = relationship(
@@ -117,4 +177,150 @@ class Deployment(Base):
         primaryjoin=(deployment_dependencies.c.dependent_id == id),
         secondaryjoin=(deployment_dependencies.c.dependency_id == id),
         backref="dependents"
-    ) 
\ No newline at end of file
+    )
+    
+    # Never reuse the ID of a deleted or archived deployment, so an ID in
+    # deployment_history stays unambiguous (PostgreSQL sequences never do)
+    __table_args__ = {"sqlite_autoincrement": True}
+    __mapper_args__ = {"version_id_col": version}
+
+
+# Scheduler access paths (see DeploymentScheduler._load_snapshot). The ready
+# queue reads a cluster's pending deployments with no unmet dependencies in
+# priority order; only PENDING rows are indexed, so the index stays small
+# however many deployments have finished.
+Index(
+    "ix_deployments_ready_queue",
+    Deployment.cluster_id,
+    Deployment.unmet_dependencies,
+    Deployment.priority.desc(),
+    Deployment.created_at,
+    postgresql_where=text("status = 'PENDING'"),
+    sqlite_where=text("status = 'PENDING'")
+)
+
+# A cluster's deployments in one state (such as the running set), in priority order
+Index(
+    "ix_deployments_cluster_status",
+    Deployment.cluster_id,
+    Deployment.status,
+    Deployment.priority.desc(),
+    Deployment.created_at
+)
+
+# A user's deployments in id order, read a page at a time (see src.utils.pagination)
+Index("ix_deployments_user_page", Deployment.user_id, Deployment.id)
+
+# Finished deployments by age, for the history compaction job. Only terminal
+# rows are indexed, so the index stays as small as the backlog of rows to move.
+Index(
+    "ix_deployments_finished",
+    Deployment.finished_at,
+    postgresql_where=TERMINAL_ONLY,
+    sqlite_where=TERMINAL_ONLY
+)
+
+
+class DeploymentHistory(Base):
+    """
+    A terminal deployment moved out of `deployments` by the history
+    compaction job. On PostgreSQL the table is partitioned by month of
+    finished_at, so old months can be detached or dropped whole.
+    """
+    __tablename__ = "deployment_history"
+    # The partition key has to be part of the primary key
+    __table_args__ = {"postgresql_partition_by": "RANGE (finished_at)"}
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    finished_at = Column(DateTime, primary_key=True)
+    name = Column(String)
+    docker_image = Column(String)
+    status = Column(Enum(DeploymentStatus), nullable=False)
+    priority = Column(Enum(DeploymentPriority))
+    
+    required_ram = Column(Float)
+    required_cpu = Column(Float)
+    required_gpu = Column(Float)
+    expected_runtime = Column(Integer, nullable=True)
+    
+    # No foreign keys: history outlives the clusters, users and groups it refers to
+    cluster_id = Column(Integer)
+    user_id = Column(Integer)
+    group_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime)
+    started_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=False)
+
+
+# A user's history in id order, read a page at a time
+Index("ix_deployment_history_user_page", DeploymentHistory.user_id, DeploymentHistory.id)
+
+# Dependency edges of archived deployments. Either end may still be in
+# `deployments` (an archived deployment's live dependency, or a finished
+# dependent that hasn't been archived yet), so neither is a foreign key.
+deployment_history_dependencies = Table(
+    "deployment_history_dependencies",
+    Base.metadata,
+    Column("dependent_id", Integer, primary_key=True),
+    Column("dependency_id", Integer, primary_key=True),
+    Index("ix_deployment_history_dependencies_dependency_id", "dependency_id")
+)
+
+
+class DeploymentEvent(Base):
+    """
+    One state transition of a deployment, written in the same transaction
+    as the change itself (see src.services.event_log). Rows are only ever
+    appended. A deployment created before the log existed has no events
+    for its earlier transitions.
+    """
+    __tablename__ = "deployment_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # No foreign keys: events outlive the deployments, which get archived or deleted
+    deployment_id = Column(Integer, nullable=False)
+    cluster_id = Column(Integer)
+    # The deployment's priority at the time, so stats don't need the deployment
+    priority = Column(Enum(DeploymentPriority))
+    from_status = Column(Enum(DeploymentStatus), nullable=True)  # None when it was submitted
+    to_status = Column(Enum(DeploymentStatus), nullable=False)
+    actor = Column(Enum(TransitionActor), nullable=False)
+    reason = Column(String, nullable=False)
+    at = Column(DateTime, nullable=False)
+
+
+# A deployment's events in order
+Index("ix_deployment_events_deployment", DeploymentEvent.deployment_id, DeploymentEvent.id)
+
+# Transitions into a state over a time window, such as the starts behind the wait-time stats
+Index("ix_deployment_events_to_status_at", DeploymentEvent.to_status, DeploymentEvent.at)
+
+
+class ResourceAllocation(Base):
+    """The resources held by one running deployment, in integer units."""
+    __tablename__ = "resource_allocations"
+
+    deployment_id = Column(Integer, ForeignKey("deployments.id"), primary_key=True)
+    cluster_id = Column(Integer, ForeignKey("clusters.id"), index=True, nullable=False)
+    ram_mib = Column(Integer, nullable=False)
+    cpu_millicores = Column(Integer, nullable=False)
+    gpu_milli = Column(Integer, nullable=False)
+    allocated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SchedulerReplica(Base):
+    """A live scheduler loop, kept alive by periodic heartbeats."""
+    __tablename__ = "scheduler_replicas"
+
+    id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime, nullable=False)
+
+
+class ClusterLease(Base):
+    """Exclusive, expiring ownership of a cluster by one scheduler replica."""
+    __tablename__ = "cluster_leases"
+
+    # Not a foreign key, so deleting a cluster never trips over its lease
+    cluster_id = Column(Integer, primary_key=True)
+    owner = Column(String, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
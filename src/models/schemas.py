@@ -18,6 +18,17 @@ class DeploymentPriorityEnum(int, Enum):
     HIGH = 3
 
 
+class TransitionActorEnum(str, Enum):
+    API = "api"
+    SCHEDULER = "scheduler"
+    PREEMPTION = "preemption"
+
+
+class DependencyDirectionEnum(str, Enum):
+    UPSTREAM = "upstream"  # What the deployment depends on
+    DOWNSTREAM = "downstream"  # What depends on the deployment
+
+
 # User Schemas
 class UserBase(BaseModel):
     username: str
@@ -104,6 +115,7 @@ class ClusterInDB(ClusterBase):
     organization_id: int
     creator_id: int
     created_at: datetime
+    version: int  # also sent as the ETag; see src.utils.etags
 
     class Config:
         orm_mode = True
@@ -121,6 +133,7 @@ class DeploymentBase(BaseModel):
     required_cpu: float = Field(..., gt=0)
     required_gpu: float = Field(..., ge=0)
     priority: DeploymentPriorityEnum = DeploymentPriorityEnum.MEDIUM
+    expected_runtime: Optional[int] = Field(None, gt=0)  # in seconds
 
 
 class DeploymentCreate(DeploymentBase):
@@ -135,6 +148,7 @@ class DeploymentUpdate(BaseModel):
     required_cpu: Optional[float] = Field(None, gt=0)
     required_gpu: Optional[float] = Field(None, ge=0)
     priority: Optional[DeploymentPriorityEnum] = None
+    expected_runtime: Optional[int] = Field(None, gt=0)
     status: Optional[DeploymentStatusEnum] = None
     dependency_ids: Optional[List[int]] = None  # IDs of deployments this deployment depends on
 
@@ -144,8 +158,11 @@ class DeploymentInDB(DeploymentBase):
     status: DeploymentStatusEnum
     cluster_id: int
     user_id: int
+    group_id: Optional[int] = None
     created_at: datetime
     started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    version: int  # also sent as the ETag; see src.utils.etags
 
     class Config:
         orm_mode = True
@@ -174,6 +191,121 @@ class Deployment(DeploymentInDB):
 Deployment.update_forward_refs()
 
 
+# Deployment Group Schemas
+class DeploymentGroupMember(BaseModel):
+    name: str
+    docker_image: str
+    required_ram: float = Field(..., gt=0)
+    required_cpu: float = Field(..., gt=0)
+    required_gpu: float = Field(..., ge=0)
+    expected_runtime: Optional[int] = Field(None, gt=0)  # in seconds
+
+
+class DeploymentGroupCreate(BaseModel):
+    name: str
+    cluster_id: int
+    priority: DeploymentPriorityEnum = DeploymentPriorityEnum.MEDIUM
+    dependency_ids: List[int] = []  # IDs of deployments every member depends on
+    deployments: List[DeploymentGroupMember] = Field(..., min_length=1)
+
+
+class DeploymentGroup(BaseModel):
+    id: int
+    name: str
+    cluster_id: int
+    user_id: int
+    created_at: datetime
+    deployments: List[Deployment] = []
+
+    class Config:
+        orm_mode = True
+
+
+# Deployment Batch Schemas
+class DeploymentBatchItem(DeploymentCreate):
+    ref: Optional[str] = None  # Client-side name later items in the batch can depend on
+    dependency_refs: List[str] = []  # Refs of earlier items in the batch this deployment depends on
+
+
+class DeploymentBatchCreate(BaseModel):
+    deployments: List[DeploymentBatchItem] = Field(..., min_length=1, max_length=1000)
+
+
+class DeploymentBatchItemResult(BaseModel):
+    index: int  # Position of the item in the submitted batch
+    ref: Optional[str] = None
+    id: Optional[int] = None  # ID of the created deployment, if it was created
+    error: Optional[str] = None  # Why the item was rejected, if it was
+
+
+class DeploymentBatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[DeploymentBatchItemResult]
+
+
+# Deployment Bulk Action Schemas
+class DeploymentBulkAction(BaseModel):
+    deployment_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class DeploymentBulkItemResult(BaseModel):
+    id: int
+    status: Optional[DeploymentStatusEnum] = None  # Status after the action, if the deployment exists
+    error: Optional[str] = None  # Why the action was not applied, if it wasn't
+
+
+class DeploymentBulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[DeploymentBulkItemResult]
+
+
+class DeploymentHistoryEntry(BaseModel):
+    """A finished deployment moved to the history store."""
+    id: int
+    name: str
+    docker_image: str
+    status: DeploymentStatusEnum
+    priority: DeploymentPriorityEnum
+    required_ram: float
+    required_cpu: float
+    required_gpu: float
+    expected_runtime: Optional[int] = None
+    cluster_id: int
+    user_id: int
+    group_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: datetime
+    archived_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class DeploymentHistoryDetail(DeploymentHistoryEntry):
+    dependency_ids: List[int]  # Its dependencies when it was archived
+    dependent_ids: List[int]  # What depended on it when it was archived
+
+
+class DeploymentGraphNode(BaseModel):
+    id: int
+    name: str
+    status: DeploymentStatusEnum
+    priority: DeploymentPriorityEnum
+    depth: int  # Shortest distance from the deployment the graph is for
+    dependency_ids: List[int]  # Its dependencies within the graph
+
+
+class DeploymentGraph(BaseModel):
+    deployment_id: int
+    direction: DependencyDirectionEnum
+    max_depth: Optional[int] = None
+    nodes: List[DeploymentGraphNode]
+    critical_path: Optional[List[int]] = None  # Upstream only: the unfinished dependencies blocking it, deepest first
+
+
 # Token Schemas
 class Token(BaseModel):
     access_token: str
@@ -181,4 +313,34 @@ class Token(BaseModel):
 
 
 class TokenData(BaseModel):
-    username: Optional[str] = None 
\ No newline at end of file
+    username: Optional[str] = None 
+
+
+class DeploymentEvent(BaseModel):
+    """One state transition of a deployment."""
+    id: int
+    deployment_id: int
+    from_status: Optional[DeploymentStatusEnum] = None  # None when it was submitted
+    to_status: DeploymentStatusEnum
+    actor: TransitionActorEnum
+    reason: str
+    at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class WaitTimePercentiles(BaseModel):
+    """How long deployments of one priority waited between becoming pending and starting, in seconds."""
+    priority: DeploymentPriorityEnum
+    count: int
+    p50: float
+    p90: float
+    p99: float
+
+
+class WaitTimeStats(BaseModel):
+    since: datetime
+    until: datetime
+    cluster_id: Optional[int] = None
+    priorities: List[WaitTimePercentiles]  # Highest priority first
@@ -0,0 +1,169 @@
+"""
+Cluster leases for running several scheduler replicas side by side.
+
+Every scheduler loop is a replica. Replicas heartbeat into the
+scheduler_replicas table, and clusters are partitioned among the live
+replicas by rendezvous hashing, so every replica computes the same owner for
+a cluster without talking to the others. A replica only schedules the
+clusters it holds an unexpired lease on (a cluster_leases row). It takes a
+lease only if the lease is free or expired, and gives up clusters that hash
+to another replica. When replicas join or die, ownership moves to the new
+owner within one lease TTL.
+
+Leases stop two replicas from scheduling the same cluster in the same cycle.
+A replica whose cycle overruns its lease can still overlap with the next
+owner, but the cluster row lock and guarded updates in
+DeploymentScheduler._apply_plan keep that safe. Clock skew between replicas
+must stay well below the TTL.
+"""
+
+import hashlib
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from src.models.models import ClusterLease, SchedulerReplica
+from src.services import cluster as cluster_service
+
+logger = logging.getLogger(__name__)
+
+# Seconds a lease (and a replica heartbeat) stays valid without renewal
+SCHEDULER_LEASE_TTL = float(os.getenv("SCHEDULER_LEASE_TTL", "30"))
+
+# Identifies this replica; defaults to host name and process ID
+SCHEDULER_REPLICA_ID = os.getenv("SCHEDULER_REPLICA_ID")
+
+
+def rendezvous_owner(cluster_id: int, replicas: List[str]) -> Optional[str]:
+    """The replica with the highest hash for the cluster owns it."""
+    if not replicas:
+        return None
+    return max(replicas, key=lambda replica: hashlib.sha1(f"{replica}:{cluster_id}".encode()).digest())
+
+
+def _insert_if_absent(db: Session, model, **values) -> bool:
+    """Insert a row unless its primary key already exists. Returns True if inserted."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Cluster leases are not supported on {dialect}")
+
+    return db.execute(insert(model).values(**values).on_conflict_do_nothing()).rowcount == 1
+
+
+class LeaseManager:
+    """Keeps this replica's heartbeat and cluster leases up to date."""
+
+    def __init__(self, replica_id: Optional[str] = None, ttl: float = SCHEDULER_LEASE_TTL):
+        self.replica_id = replica_id or SCHEDULER_REPLICA_ID or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        # Clusters leased as of the last refresh, and those that were new then
+        self.owned: Set[int] = set()
+        self.newly_acquired: Set[int] = set()
+
+    @property
+    def renew_interval(self) -> float:
+        """How often refresh must run to keep the leases alive."""
+        return self.ttl / 3
+
+    def refresh(self, db: Session) -> Set[int]:
+        """
+        Heartbeat, then bring this replica's leases in line with the clusters
+        that hash to it: release the others, renew the ones it holds and take
+        over free or expired ones. Returns the IDs of the clusters it owns.
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+
+        self._heartbeat(db, now)
+        replicas = self.live_replicas(db, now)
+        desired = {
+            cluster_id for cluster_id in cluster_service.get_cluster_ids(db)
+            if rendezvous_owner(cluster_id, replicas) == self.replica_id
+        }
+
+        # Give up clusters that now hash to another replica (or no longer exist)
+        db.query(ClusterLease).filter(
+            ClusterLease.owner == self.replica_id,
+            ClusterLease.cluster_id.notin_(desired)
+        ).delete(synchronize_session=False)
+
+        # Renew the leases still held
+        db.query(ClusterLease).filter(
+            ClusterLease.owner == self.replica_id,
+            ClusterLease.cluster_id.in_(desired),
+            ClusterLease.expires_at >= now
+        ).update({ClusterLease.expires_at: expires_at}, synchronize_session=False)
+        held = {
+            row.cluster_id for row in db.query(ClusterLease.cluster_id).filter(
+                ClusterLease.owner == self.replica_id,
+                ClusterLease.expires_at > now
+            )
+        }
+
+        # Take over clusters whose lease is free or has expired
+        for cluster_id in sorted(desired - held):
+            if self._acquire(db, cluster_id, now, expires_at):
+                held.add(cluster_id)
+
+        db.commit()
+
+        self.newly_acquired = held - self.owned
+        if self.newly_acquired or self.owned - held:
+            logger.info(
+                f"Replica {self.replica_id} owns {len(held)} clusters "
+                f"(+{len(self.newly_acquired)}, -{len(self.owned - held)}) of {len(replicas)} live replicas"
+            )
+        self.owned = held
+        return held
+
+    def live_replicas(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """IDs of the replicas whose heartbeat has not expired."""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.ttl)
+        return sorted(
+            row.id for row in db.query(SchedulerReplica.id).filter(SchedulerReplica.heartbeat_at > cutoff)
+        )
+
+    def release_all(self, db: Session):
+        """Give up every lease and leave the replica set, so others take over immediately."""
+        db.query(ClusterLease).filter(ClusterLease.owner == self.replica_id).delete(synchronize_session=False)
+        db.query(SchedulerReplica).filter(SchedulerReplica.id == self.replica_id).delete(synchronize_session=False)
+        db.commit()
+        self.owned = set()
+        self.newly_acquired = set()
+
+    def _heartbeat(self, db: Session, now: datetime):
+        """Record that this replica is alive and forget replicas that stopped heartbeating."""
+        updated = db.query(SchedulerReplica).filter(
+            SchedulerReplica.id == self.replica_id
+        ).update({SchedulerReplica.heartbeat_at: now}, synchronize_session=False)
+        if not updated:
+            _insert_if_absent(db, SchedulerReplica, id=self.replica_id, heartbeat_at=now)
+
+        db.query(SchedulerReplica).filter(
+            SchedulerReplica.heartbeat_at <= now - timedelta(seconds=self.ttl)
+        ).delete(synchronize_session=False)
+
+    def _acquire(self, db: Session, cluster_id: int, now: datetime, expires_at: datetime) -> bool:
+        """Take the lease on a cluster if it is free, expired or already ours."""
+        updated = db.query(ClusterLease).filter(
+            ClusterLease.cluster_id == cluster_id,
+            (ClusterLease.owner == self.replica_id) | (ClusterLease.expires_at <= now)
+        ).update({
+            ClusterLease.owner: self.replica_id,
+            ClusterLease.expires_at: expires_at
+        }, synchronize_session=False)
+        if updated:
+            return True
+
+        return _insert_if_absent(
+            db, ClusterLease, cluster_id=cluster_id, owner=self.replica_id, expires_at=expires_at
+        )
@@ -0,0 +1,379 @@
+"""
+Pure-Python scheduling planner.
+
+The planner works on an in-memory snapshot of a single cluster (its free
+capacity plus its pending and running deployments) and computes the complete
+placement and preemption plan without touching the database. The scheduler is
+responsible for loading the snapshot and applying the resulting plan in a
+single transaction.
+
+Deployment groups (gangs) are planned as a single unit whose resources are
+the sum of its members, so a gang is either started, or preempted, as a
+whole. See group_units.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.models.models import DeploymentPriority
+from src.scheduler import preemption
+
+
+@dataclass
+class DeploymentSnapshot:
+    """
+    The scheduling-relevant fields of a deployment. Resources are integer
+    units (MiB, millicores, milli-GPUs; see src.utils.resources).
+    """
+    id: int
+    priority: int
+    ram: int
+    cpu: int
+    gpu: int
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    # Expected runtime in seconds, if the submitter provided one
+    expected_runtime: Optional[float] = None
+    group_id: Optional[int] = None
+    # Row version when the snapshot was taken; the plan only applies to rows still at it
+    version: Optional[int] = None
+    # For a gang unit, the member deployments it stands for
+    members: List["DeploymentSnapshot"] = field(default_factory=list)
+
+    @property
+    def deployments(self) -> List["DeploymentSnapshot"]:
+        """The deployments this unit stands for."""
+        return self.members or [self]
+
+    @property
+    def deployment_ids(self) -> List[int]:
+        """IDs of the deployments this unit stands for."""
+        return [d.id for d in self.deployments]
+
+    def expected_end(self, now: datetime) -> Optional[datetime]:
+        """When the deployment is expected to finish if started (or already started) by now."""
+        if self.expected_runtime is None:
+            return None
+        return (self.started_at or now) + timedelta(seconds=self.expected_runtime)
+
+
+@dataclass
+class ClusterSnapshot:
+    """Free capacity of a cluster, in integer units, plus the deployments competing for it."""
+    cluster_id: int
+    available_ram: int
+    available_cpu: int
+    available_gpu: int
+    total_ram: int = 0
+    total_cpu: int = 0
+    total_gpu: int = 0
+    # Time the snapshot was taken
+    now: Optional[datetime] = None
+    # Pending units (deployments or whole gangs) whose dependencies have all completed
+    pending: List[DeploymentSnapshot] = field(default_factory=list)
+    # Pending deployments still waiting on dependencies (or on a gang member that is)
+    blocked: int = 0
+    running: List[DeploymentSnapshot] = field(default_factory=list)
+
+
+@dataclass
+class SchedulingPlan:
+    """The actions the scheduler should apply to a cluster."""
+    cluster_id: int
+    to_start: List[DeploymentSnapshot] = field(default_factory=list)
+    to_preempt: List[DeploymentSnapshot] = field(default_factory=list)
+    unschedulable: int = 0
+    # Backfill mode: the blocked head-of-queue deployment holding a reservation,
+    # when it is expected to start, and how many deployments were backfilled
+    reserved_for: Optional[int] = None
+    reservation_start: Optional[datetime] = None
+    backfilled: int = 0
+
+    @property
+    def started_ids(self) -> List[int]:
+        """IDs of the deployments to start."""
+        return [i for d in self.to_start for i in d.deployment_ids]
+
+    @property
+    def preempted_ids(self) -> List[int]:
+        """IDs of the deployments to preempt."""
+        return [i for d in self.to_preempt for i in d.deployment_ids]
+
+    @property
+    def ram_delta(self) -> int:
+        """Net change in available RAM once the plan is applied."""
+        return sum(d.ram for d in self.to_preempt) - sum(d.ram for d in self.to_start)
+
+    @property
+    def cpu_delta(self) -> int:
+        """Net change in available CPU once the plan is applied."""
+        return sum(d.cpu for d in self.to_preempt) - sum(d.cpu for d in self.to_start)
+
+    @property
+    def gpu_delta(self) -> int:
+        """Net change in available GPU once the plan is applied."""
+        return sum(d.gpu for d in self.to_preempt) - sum(d.gpu for d in self.to_start)
+
+
+class _Capacity:
+    """Mutable free-capacity counter used while building a plan."""
+
+    def __init__(self, ram: int, cpu: int, gpu: int):
+        self.ram = ram
+        self.cpu = cpu
+        self.gpu = gpu
+
+    def fits(self, deployment: DeploymentSnapshot) -> bool:
+        return (self.ram >= deployment.ram and
+                self.cpu >= deployment.cpu and
+                self.gpu >= deployment.gpu)
+
+    def take(self, deployment: DeploymentSnapshot):
+        self.ram -= deployment.ram
+        self.cpu -= deployment.cpu
+        self.gpu -= deployment.gpu
+
+    def give(self, deployment: DeploymentSnapshot):
+        self.ram += deployment.ram
+        self.cpu += deployment.cpu
+        self.gpu += deployment.gpu
+
+    def copy(self) -> "_Capacity":
+        return _Capacity(self.ram, self.cpu, self.gpu)
+
+
+def group_units(
+    deployments: Iterable[DeploymentSnapshot],
+    excluded_groups: Optional[Set[int]] = None
+) -> List[DeploymentSnapshot]:
+    """
+    Collapse the members of each deployment group into a single unit.
+
+    A unit carries the summed resources of its members, the highest member
+    priority, the earliest creation and start times and the longest expected
+    runtime (unknown if any member's is). Its id is the lowest member id, so it
+    never clashes with another unit. Members of `excluded_groups` (gangs that
+    can't run as a whole yet) are dropped.
+    """
+    excluded_groups = excluded_groups or set()
+    units: List[DeploymentSnapshot] = []
+    gangs: Dict[int, List[DeploymentSnapshot]] = {}
+
+    for deployment in deployments:
+        if deployment.group_id is None:
+            units.append(deployment)
+        elif deployment.group_id not in excluded_groups:
+            gangs.setdefault(deployment.group_id, []).append(deployment)
+
+    for group_id, members in gangs.items():
+        runtimes = [m.expected_runtime for m in members]
+        started = [m.started_at for m in members if m.started_at is not None]
+        units.append(DeploymentSnapshot(
+            id=min(m.id for m in members),
+            priority=max(m.priority for m in members),
+            ram=sum(m.ram for m in members),
+            cpu=sum(m.cpu for m in members),
+            gpu=sum(m.gpu for m in members),
+            created_at=min((m.created_at for m in members), key=lambda c: c or datetime.min),
+            started_at=min(started) if started else None,
+            expected_runtime=None if None in runtimes else max(runtimes),
+            group_id=group_id,
+            members=members
+        ))
+
+    return units
+
+
+def _count(units: List[DeploymentSnapshot]) -> int:
+    """Number of deployments in a list of units."""
+    return sum(len(unit.deployment_ids) for unit in units)
+
+
+def scheduling_order(pending: List[DeploymentSnapshot]) -> List[DeploymentSnapshot]:
+    """Order pending deployments by priority (high to low), then by age."""
+    return sorted(pending, key=lambda d: (-d.priority, d.created_at or datetime.min, d.id))
+
+
+def plan_cluster(
+    snapshot: ClusterSnapshot,
+    preemption_cost: str = "fewest",
+    backfill: bool = False
+) -> SchedulingPlan:
+    """
+    Compute the placement and preemption plan for a cluster snapshot.
+
+    Phase 1 starts every dependency-ready pending deployment that fits in the
+    free capacity, in priority order. Phase 2 preempts lower priority running
+    deployments for any HIGH priority deployment that is still pending, picking
+    victims with the given preemption cost (see src.scheduler.preemption).
+    Deployments started in phase 1 are never chosen as victims in phase 2.
+    A gang unit only starts if all of its members fit at once.
+
+    With backfill enabled the queue is walked once, in priority order, and
+    the first deployment that can neither start nor preempt its way in gets a
+    capacity reservation (see _plan_with_backfill).
+    """
+    if backfill:
+        return _plan_with_backfill(snapshot, preemption_cost)
+
+    plan = SchedulingPlan(cluster_id=snapshot.cluster_id)
+    capacity = _Capacity(snapshot.available_ram, snapshot.available_cpu, snapshot.available_gpu)
+
+    # Phase 1: schedule without preemption
+    remaining = []
+    for deployment in scheduling_order(snapshot.pending):
+        if capacity.fits(deployment):
+            capacity.take(deployment)
+            plan.to_start.append(deployment)
+        else:
+            remaining.append(deployment)
+
+    # Phase 2: preempt lower priority deployments for HIGH priority ones
+    high_priority_pending = [d for d in remaining if d.priority == DeploymentPriority.HIGH.value]
+    if high_priority_pending and snapshot.running:
+        candidates = list(snapshot.running)
+
+        for deployment in high_priority_pending:
+            if not capacity.fits(deployment):
+                victims = _select_victims(snapshot, deployment, candidates, capacity, preemption_cost)
+                if not victims:
+                    continue
+                _preempt(plan, victims, candidates, capacity)
+
+            capacity.take(deployment)
+            plan.to_start.append(deployment)
+
+    plan.unschedulable = snapshot.blocked + _count(snapshot.pending) - _count(plan.to_start)
+    return plan
+
+
+def _select_victims(
+    snapshot: ClusterSnapshot,
+    deployment: DeploymentSnapshot,
+    candidates: List[DeploymentSnapshot],
+    capacity: _Capacity,
+    preemption_cost: str
+) -> List[DeploymentSnapshot]:
+    """Pick strictly lower priority candidates whose eviction lets the deployment fit."""
+    needed = (
+        max(0, deployment.ram - capacity.ram),
+        max(0, deployment.cpu - capacity.cpu),
+        max(0, deployment.gpu - capacity.gpu)
+    )
+    return preemption.select_victims(
+        needed,
+        [c for c in candidates if c.priority < deployment.priority],
+        cost=preemption_cost,
+        now=snapshot.now,
+        scale=(snapshot.total_ram, snapshot.total_cpu, snapshot.total_gpu)
+    )
+
+
+def _preempt(
+    plan: SchedulingPlan,
+    victims: List[DeploymentSnapshot],
+    candidates: List[DeploymentSnapshot],
+    capacity: _Capacity
+):
+    """Add victims to the plan, returning their resources and removing them from the candidates."""
+    victim_ids = {v.id for v in victims}
+    candidates[:] = [c for c in candidates if c.id not in victim_ids]
+    for victim in victims:
+        capacity.give(victim)
+    plan.to_preempt.extend(victims)
+
+
+def _plan_with_backfill(snapshot: ClusterSnapshot, preemption_cost: str) -> SchedulingPlan:
+    """
+    EASY backfill.
+
+    Deployments start in priority order until one can neither fit nor, if it
+    is HIGH priority, preempt its way in. That head-of-queue deployment gets a
+    reservation: the earliest time at which enough running deployments are
+    expected to have finished for it to fit (its shadow time), based on
+    started_at + expected_runtime. Deployments further down the queue may then
+    only start if they fit now and either are expected to finish before the
+    shadow time, or fit in the capacity that will still be spare once the head
+    has started. Deployments without an expected runtime never finish as far
+    as the reservation is concerned, so they only use spare capacity.
+    """
+    plan = SchedulingPlan(cluster_id=snapshot.cluster_id)
+    capacity = _Capacity(snapshot.available_ram, snapshot.available_cpu, snapshot.available_gpu)
+    now = snapshot.now or datetime.utcnow()
+    candidates = list(snapshot.running)
+
+    shadow_time = None
+    spare = None
+
+    for deployment in scheduling_order(snapshot.pending):
+        if plan.reserved_for is None:
+            if not capacity.fits(deployment) and deployment.priority == DeploymentPriority.HIGH.value:
+                victims = _select_victims(snapshot, deployment, candidates, capacity, preemption_cost)
+                if victims:
+                    _preempt(plan, victims, candidates, capacity)
+
+            if capacity.fits(deployment):
+                capacity.take(deployment)
+                plan.to_start.append(deployment)
+                continue
+
+            # Blocked head of the queue: reserve capacity for it
+            plan.reserved_for = deployment.id
+            running = candidates + plan.to_start
+            shadow_time, spare = _reservation(deployment, capacity, running, now)
+            plan.reservation_start = shadow_time
+            continue
+
+        if not capacity.fits(deployment):
+            continue
+
+        expected_end = deployment.expected_end(now)
+        if shadow_time is not None and expected_end is not None and expected_end <= shadow_time:
+            # Finishes before the head is due to start, so it can't delay it
+            pass
+        elif spare.fits(deployment):
+            # Uses capacity the head won't need even once it has started
+            spare.take(deployment)
+        else:
+            continue
+
+        capacity.take(deployment)
+        plan.to_start.append(deployment)
+        plan.backfilled += len(deployment.deployment_ids)
+
+    plan.unschedulable = snapshot.blocked + _count(snapshot.pending) - _count(plan.to_start)
+    return plan
+
+
+def _reservation(
+    head: DeploymentSnapshot,
+    capacity: _Capacity,
+    running: List[DeploymentSnapshot],
+    now: datetime
+):
+    """
+    Compute the shadow time of a blocked deployment and the capacity that
+    will be spare once it starts then. If it can never be placed based on
+    known runtimes, the shadow time is None and the spare capacity is what is
+    left after every deployment with a known runtime has finished.
+    """
+    free = capacity.copy()
+    shadow_time = None
+
+    ending = sorted(
+        (d for d in running if d.expected_end(now) is not None),
+        key=lambda d: d.expected_end(now)
+    )
+    for deployment in ending:
+        free.give(deployment)
+        if free.fits(head):
+            shadow_time = deployment.expected_end(now)
+            break
+
+    spare = _Capacity(
+        max(free.ram - head.ram, 0),
+        max(free.cpu - head.cpu, 0),
+        max(free.gpu - head.gpu, 0)
+    )
+    return shadow_time, spare
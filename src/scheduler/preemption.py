@@ -0,0 +1,216 @@
+"""
+Preemption victim selection.
+
+Given the resources a pending deployment is short of and the running
+deployments that may be evicted, pick the set of victims that covers the
+deficit on all three resource dimensions (RAM, CPU, GPU) at the lowest
+eviction cost.
+
+Selection is a small weighted set-cover problem. It is solved by a
+branch-and-bound search seeded with a greedy solution. The search only
+branches over the `max_candidates` most promising candidates and visits at
+most `max_nodes` nodes, so large running sets degrade to the best solution
+found within that budget instead of blowing up.
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from src.scheduler.planner import DeploymentSnapshot
+
+Resources = Tuple[float, float, float]
+
+# Per-victim eviction cost functions. Each receives the victim and the time of
+# the scheduling cycle and returns a non-negative cost.
+COST_FUNCTIONS: Dict[str, Callable[["DeploymentSnapshot", datetime], float]] = {
+    # Evict as few deployments as possible
+    "fewest": lambda d, now: 1.0,
+    # Lose as little runtime (time since started_at) as possible
+    "runtime": lambda d, now: max((now - d.started_at).total_seconds(), 0.0) if d.started_at else 0.0,
+    # Strongly prefer evicting lower priority deployments
+    "priority": lambda d, now: float(10 ** (d.priority - 1)),
+}
+
+# The pre-existing (priority, started_at) first-fit selection, kept for comparison
+GREEDY = "greedy"
+
+DEFAULT_MAX_NODES = 20000
+DEFAULT_MAX_CANDIDATES = 64
+
+
+def _resources(deployment: "DeploymentSnapshot") -> Resources:
+    return (deployment.ram, deployment.cpu, deployment.gpu)
+
+
+def _covers(freed: Resources, needed: Resources) -> bool:
+    return all(f >= n for f, n in zip(freed, needed))
+
+
+def _add(a: Resources, b: Resources) -> Resources:
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2])
+
+
+def wasted_resources(victims: Sequence["DeploymentSnapshot"], needed: Resources, scale: Resources) -> float:
+    """
+    Resources freed beyond the deficit, summed over the three dimensions after
+    normalising each dimension by `scale` (typically the cluster totals).
+    """
+    freed = (0.0, 0.0, 0.0)
+    for victim in victims:
+        freed = _add(freed, _resources(victim))
+    return sum(
+        max(f - n, 0.0) / s if s > 0 else 0.0
+        for f, n, s in zip(freed, needed, scale)
+    )
+
+
+def select_victims_greedy(
+    needed: Resources,
+    candidates: List["DeploymentSnapshot"]
+) -> List["DeploymentSnapshot"]:
+    """
+    Take candidates in (priority, started_at) order, lowest priority and
+    oldest first, until the freed resources cover the deficit.
+    Returns an empty list if the deficit cannot be covered.
+    """
+    victims = []
+    freed = (0.0, 0.0, 0.0)
+    for deployment in sorted(candidates, key=lambda d: (d.priority, d.started_at or datetime.min)):
+        victims.append(deployment)
+        freed = _add(freed, _resources(deployment))
+        if _covers(freed, needed):
+            return victims
+    return []
+
+
+def select_victims(
+    needed: Resources,
+    candidates: List["DeploymentSnapshot"],
+    cost: str = "fewest",
+    now: Optional[datetime] = None,
+    scale: Resources = (1.0, 1.0, 1.0),
+    max_nodes: int = DEFAULT_MAX_NODES,
+    max_candidates: int = DEFAULT_MAX_CANDIDATES
+) -> List["DeploymentSnapshot"]:
+    """
+    Pick the victims that cover `needed` at the lowest eviction cost.
+
+    Solutions are ranked by (total cost, number of victims, wasted resources),
+    so ties on the configured cost go to fewer evictions and then to freeing
+    less capacity on dimensions that were not short. Returns an empty list if
+    the deficit cannot be covered.
+    """
+    if cost == GREEDY:
+        return select_victims_greedy(needed, candidates)
+    if cost not in COST_FUNCTIONS:
+        raise ValueError(f"Unknown preemption cost '{cost}'")
+
+    if _covers((0.0, 0.0, 0.0), needed):
+        return []
+
+    now = now or datetime.utcnow()
+    cost_function = COST_FUNCTIONS[cost]
+
+    # A candidate is only useful if it frees something on a short dimension
+    useful = [
+        d for d in candidates
+        if any(r > 0 and n > 0 for r, n in zip(_resources(d), needed))
+    ]
+
+    total = (0.0, 0.0, 0.0)
+    for deployment in useful:
+        total = _add(total, _resources(deployment))
+    if not _covers(total, needed):
+        return []
+
+    costs = {d.id: cost_function(d, now) for d in useful}
+
+    def key(victims: Sequence["DeploymentSnapshot"]) -> Tuple[float, int, float]:
+        return (sum(costs[v.id] for v in victims), len(victims), wasted_resources(victims, needed, scale))
+
+    best = _greedy_cover(needed, useful, costs)
+    best_key = key(best)
+
+    # Cheapest and most useful candidates first so good solutions are found early
+    ordered = sorted(
+        useful,
+        key=lambda d: (costs[d.id], -_coverage(_resources(d), needed))
+    )[:max_candidates]
+
+    # suffix[i] = resources of ordered[i:], used to prune branches that can no longer cover
+    suffix: List[Resources] = [(0.0, 0.0, 0.0)] * (len(ordered) + 1)
+    for i in range(len(ordered) - 1, -1, -1):
+        suffix[i] = _add(suffix[i + 1], _resources(ordered[i]))
+
+    nodes = 0
+    chosen: List["DeploymentSnapshot"] = []
+
+    def search(index: int, freed: Resources, chosen_cost: float):
+        nonlocal best, best_key, nodes
+        nodes += 1
+        if nodes > max_nodes:
+            return
+
+        # Every component of the key only grows as victims are added
+        if (chosen_cost, len(chosen)) > best_key[:2]:
+            return
+
+        if _covers(freed, needed):
+            candidate_key = (chosen_cost, len(chosen), wasted_resources(chosen, needed, scale))
+            if candidate_key < best_key:
+                best, best_key = list(chosen), candidate_key
+            return
+
+        if index == len(ordered) or not _covers(_add(freed, suffix[index]), needed):
+            return
+
+        deployment = ordered[index]
+        chosen.append(deployment)
+        search(index + 1, _add(freed, _resources(deployment)), chosen_cost + costs[deployment.id])
+        chosen.pop()
+        search(index + 1, freed, chosen_cost)
+
+    search(0, (0.0, 0.0, 0.0), 0.0)
+    return best
+
+
+def _coverage(resources: Resources, needed: Resources) -> float:
+    """Fraction of the deficit a deployment covers, summed over short dimensions."""
+    return sum(min(r, n) / n for r, n in zip(resources, needed) if n > 0)
+
+
+def _greedy_cover(
+    needed: Resources,
+    candidates: List["DeploymentSnapshot"],
+    costs: Dict[int, float]
+) -> List["DeploymentSnapshot"]:
+    """
+    Weighted set-cover heuristic: repeatedly take the candidate covering the
+    most of the remaining deficit per unit of cost, then drop any victim that
+    turns out to be redundant. Callers must ensure the candidates can cover
+    the deficit.
+    """
+    remaining = list(needed)
+    pool = list(candidates)
+    victims = []
+
+    while not _covers((0.0, 0.0, 0.0), tuple(remaining)):
+        best_index = max(
+            range(len(pool)),
+            key=lambda i: _coverage(_resources(pool[i]), tuple(remaining)) / (costs[pool[i].id] + 1e-9)
+        )
+        deployment = pool.pop(best_index)
+        victims.append(deployment)
+        remaining = [max(n - r, 0.0) for n, r in zip(remaining, _resources(deployment))]
+
+    # Drop redundant victims, most expensive first
+    for deployment in sorted(victims, key=lambda d: -costs[d.id]):
+        others = [v for v in victims if v.id != deployment.id]
+        freed = (0.0, 0.0, 0.0)
+        for other in others:
+            freed = _add(freed, _resources(other))
+        if _covers(freed, needed):
+            victims = others
+
+    return victims
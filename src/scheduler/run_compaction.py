@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Main entry point for running the history compaction job as a service.
+
+Every HISTORY_COMPACTION_INTERVAL_SECONDS it moves the deployments that
+finished more than HISTORY_RETENTION_DAYS ago from `deployments` into the
+deployment_history store, HISTORY_COMPACTION_BATCH_SIZE rows per
+transaction (see src.services.history). Several copies can run at once:
+each batch skips rows another one has locked.
+"""
+
+import logging
+import time
+import os
+import sys
+from datetime import timedelta
+
+# Add parent directory to path to allow imports from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from src.models.base import SessionLocal
+from src.scheduler.run_scheduler import wait_for_db
+from src.services.history import compact_history
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Main function to run the compaction job continuously."""
+    logger.info("Starting history compaction service")
+
+    if not wait_for_db():
+        logger.error("Could not connect to the database. Exiting.")
+        return
+
+    interval = int(os.environ.get("HISTORY_COMPACTION_INTERVAL_SECONDS", "3600"))
+    retention = timedelta(days=float(os.environ.get("HISTORY_RETENTION_DAYS", "30")))
+    batch_size = int(os.environ.get("HISTORY_COMPACTION_BATCH_SIZE", "1000"))
+
+    logger.info(
+        f"Archiving deployments finished more than {retention.days} days ago every {interval} seconds, "
+        f"{batch_size} at a time"
+    )
+
+    while True:
+        start_time = time.time()
+        db = SessionLocal()
+        try:
+            archived = compact_history(db, retention, batch_size)
+            logger.info(f"Archived {archived} deployments in {time.time() - start_time:.1f}s")
+        except Exception as e:
+            logger.exception(f"Error in compaction run: {e}")
+        finally:
+            db.close()
+
+        time.sleep(max(0.0, start_time + interval - time.time()))
+
+if __name__ == "__main__":
+    main()
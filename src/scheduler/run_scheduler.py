@@ -16,7 +16,9 @@ from sqlalchemy import text
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from src.models.base import engine, SessionLocal
+from src.scheduler.leases import LeaseManager
 from src.scheduler.scheduler import DeploymentScheduler
+from src.utils.events import ClusterEventListener, pop_dirty_clusters
 
 # Set up logging
 logging.basicConfig(
@@ -62,19 +64,43 @@ def main():
         logger.error("Could not connect to the database. Exiting.")
         return
     
-    # Run scheduler in an infinite loop
+    # Run scheduler in an infinite loop. Clusters are re-evaluated when they change,
+    # and every cluster is swept at a much lower frequency as a safety net.
     scheduler_interval = int(os.environ.get("SCHEDULER_INTERVAL_SECONDS", "60"))
+    full_sweep_interval = int(os.environ.get("SCHEDULER_FULL_SWEEP_INTERVAL", "300"))
     
-    logger.info(f"Scheduler will run every {scheduler_interval} seconds")
+    logger.info(
+        f"Scheduler will check for changed clusters every {scheduler_interval} seconds "
+        f"and sweep all clusters every {full_sweep_interval} seconds"
+    )
+    
+    listener = ClusterEventListener()
+    leases = LeaseManager()
+    next_full_sweep = 0.0
+    logger.info(f"Running as scheduler replica {leases.replica_id}")
     
     while True:
+        start_time = time.time()
         try:
-            logger.info("Running scheduler cycle")
             db = get_db()
             
+            # Only schedule the clusters leased to this replica
+            owned = leases.refresh(db)
+            
             # Create scheduler and run it
-            scheduler = DeploymentScheduler(db)
-            results = scheduler.schedule_all_clusters()
+            scheduler = DeploymentScheduler(db, session_factory=SessionLocal)
+            results = None
+            # Clusters just taken over from another replica are swept right away
+            if start_time < next_full_sweep and not leases.newly_acquired:
+                results = scheduler.schedule_dirty_clusters(owned)
+                if results:
+                    logger.info(f"Running scheduler for changed clusters {sorted(results)}")
+            if results is None:
+                logger.info(f"Running scheduler sweep of {len(owned)} owned clusters")
+                next_full_sweep = start_time + full_sweep_interval
+                # The sweep covers every owned cluster marked dirty so far
+                pop_dirty_clusters(owned)
+                results = scheduler.schedule_clusters(sorted(owned))
             
             # Log results
             for cluster_id, stats in results.items():
@@ -84,9 +110,14 @@ def main():
             
         except Exception as e:
             logger.exception(f"Error in scheduler cycle: {e}")
+            # Changes may have been lost, so sweep everything on retry
+            next_full_sweep = 0.0
         
-        logger.info(f"Scheduler cycle completed. Sleeping for {scheduler_interval} seconds")
-        time.sleep(scheduler_interval)
+        # Wait until a cluster changes or the next check (or lease renewal) is due
+        next_check = min(start_time + scheduler_interval, next_full_sweep, start_time + leases.renew_interval)
+        changed = set()
+        while not changed and time.time() < next_check:
+            changed = listener.wait(next_check - time.time())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
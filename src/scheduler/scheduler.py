@@ -1,15 +1,42 @@
-from typing import List, Dict, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
 import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from sqlalchemy import event, func, text, tuple_
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from src.models.models import Deployment, DeploymentStatus, DeploymentPriority
-from src.services import deployment as deployment_service
+from src.models.models import Cluster, Deployment, DeploymentPriority, DeploymentStatus, ResourceAllocation, TransitionActor
+from src.scheduler.planner import ClusterSnapshot, DeploymentSnapshot, SchedulingPlan, group_units, plan_cluster
 from src.services import cluster as cluster_service
+from src.services import event_log
+from src.services.concurrency import backoff_delays
+from src.utils import events
+from src.utils.resources import to_units
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# How victims are chosen when preempting: fewest, runtime, priority or greedy
+PREEMPTION_COST = os.getenv("PREEMPTION_COST", "fewest")
+
+# Reserve capacity for the blocked head of the queue and only backfill around it
+SCHEDULER_BACKFILL = os.getenv("SCHEDULER_BACKFILL", "false").lower() == "true"
+
+# Number of clusters scheduled concurrently (1 schedules clusters serially)
+SCHEDULER_MAX_WORKERS = int(os.getenv("SCHEDULER_MAX_WORKERS", "1"))
+
+# Seconds a single cluster may take before the cycle stops waiting for it
+SCHEDULER_CLUSTER_TIMEOUT = float(os.getenv("SCHEDULER_CLUSTER_TIMEOUT", "30"))
+
+# Clusters whose scheduling outlived the timeout, by the future still running
+# it. Kept for the whole process, since the worker builds a scheduler per
+# cycle, so no later cycle plans a cluster until its overrun has finished.
+_overrunning: Dict[int, Future] = {}
+_overrunning_lock = threading.Lock()
+
 
 class DeploymentScheduler:
     """
@@ -19,183 +46,395 @@ class DeploymentScheduler:
     1. Priority - Higher priority deployments are scheduled first
     2. Resource utilization - Efficiently use available resources
     3. Maximize successful deployments - Schedule as many deployments as possible
-    """
     
-    def __init__(self, db: Session):
-        self.db = db
+    Each cluster is scheduled in three steps: load an in-memory snapshot of the
+    cluster, compute the whole plan in pure Python (see src.scheduler.planner),
+    then apply the plan in a single transaction. Members of a deployment group
+    are planned as one unit, so a group is never partially started.
+    """
     
-    def schedule_cluster_deployments(self, cluster_id: int) -> Dict[str, int]:
+    def __init__(
+        self,
+        db: Session,
+        preemption_cost: str = PREEMPTION_COST,
+        backfill: bool = SCHEDULER_BACKFILL,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_workers: int = SCHEDULER_MAX_WORKERS,
+        cluster_timeout: float = SCHEDULER_CLUSTER_TIMEOUT
+    ):
         """
-        Schedule deployments for a specific cluster.
-        Returns statistics about scheduling actions.
+        Clusters are independent scheduling domains, so when a session factory
+        is given and max_workers > 1, clusters are scheduled concurrently with
+        one session per cluster.
         """
-        result = {
+        self.db = db
+        self.preemption_cost = preemption_cost
+        self.backfill = backfill
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self.cluster_timeout = cluster_timeout
+    
+    @staticmethod
+    def _empty_result() -> Dict[str, Any]:
+        return {
             "scheduled": 0,
             "preempted": 0,
-            "unschedulable": 0
+            "unschedulable": 0,
+            "backfilled": 0,
+            "reserved_for": None,
+            "snapshot_ms": 0.0,
+            "plan_ms": 0.0,
+            "commit_ms": 0.0,
+            "retries": 0
         }
+    
+    def schedule_cluster_deployments(self, cluster_id: int) -> Dict[str, Any]:
+        """
+        Schedule deployments for a specific cluster.
+        Returns statistics about scheduling actions and timings in milliseconds.
         
-        # Get the cluster
-        cluster = cluster_service.get_cluster(self.db, cluster_id)
-        if not cluster:
-            logger.error(f"Cluster with ID {cluster_id} not found")
-            return result
-        
-        # Get all pending deployments for this cluster, ordered by priority (high to low)
-        pending_deployments = deployment_service.get_pending_deployments(self.db, cluster_id)
-        
-        # If no pending deployments, nothing to do
-        if not pending_deployments:
-            return result
-        
-        # First try to schedule deployments without preemption
-        for deployment in pending_deployments:
-            # Check if resources are available
-            if cluster_service.check_cluster_resources(
-                self.db, 
-                cluster_id, 
-                deployment.required_ram, 
-                deployment.required_cpu, 
-                deployment.required_gpu
-            ):
-                # Start the deployment
-                if deployment_service.start_deployment(self.db, deployment.id):
-                    result["scheduled"] += 1
-        
-        # If there are still pending deployments, try preemption for high priority ones
-        remaining_pending = [d for d in pending_deployments if d.status == DeploymentStatus.PENDING]
-        if not remaining_pending:
-            return result
-        
-        # Get all running deployments with lower priority than our highest pending
-        highest_pending_priority_value = max([d.priority.value for d in remaining_pending])
-        running_deployments = self.db.query(Deployment).filter(
-            Deployment.cluster_id == cluster_id,
-            Deployment.status == DeploymentStatus.RUNNING,
-        ).all()
-        
-        # Filter running deployments with lower priority manually
-        running_deployments = [d for d in running_deployments if d.priority.value < highest_pending_priority_value]
-        
-        # Sort by priority value
-        running_deployments.sort(key=lambda d: d.priority.value)
+        A plan that is discarded because something changed since its snapshot
+        is replaced by a fresh one after a short backoff, a few times at most.
+        """
+        result = self._empty_result()
+        delays = backoff_delays()
         
-        # Try preemption
-        if running_deployments and any(d.priority == DeploymentPriority.HIGH for d in remaining_pending):
-            # Sort pending deployments by priority (high to low)
-            high_priority_pending = [d for d in remaining_pending if d.priority == DeploymentPriority.HIGH]
+        while True:
+            start_time = time.perf_counter()
+            snapshot = self._load_snapshot(cluster_id)
+            result["snapshot_ms"] += (time.perf_counter() - start_time) * 1000
             
-            for pending_deployment in high_priority_pending:
-                # If we can schedule directly, do it
-                if deployment_service.start_deployment(self.db, pending_deployment.id):
-                    result["scheduled"] += 1
-                    continue
-                
-                # Try preemption
-                preempted = self._try_preemption(
-                    pending_deployment, 
-                    running_deployments
-                )
-                
-                if preempted:
-                    # After preemption, try to start the deployment
-                    if deployment_service.start_deployment(self.db, pending_deployment.id):
-                        result["scheduled"] += 1
-                        result["preempted"] += len(preempted)
-                    else:
-                        # This shouldn't happen if preemption was successful
-                        logger.error(f"Failed to start deployment {pending_deployment.id} after preemption")
-                        result["unschedulable"] += 1
-                else:
-                    result["unschedulable"] += 1
+            if snapshot is None:
+                logger.error(f"Cluster with ID {cluster_id} not found")
+                self.db.rollback()
+                return result
+            
+            # If no pending deployments, nothing to do
+            if not snapshot.pending:
+                result["unschedulable"] = snapshot.blocked
+                self.db.rollback()
+                return result
+            
+            start_time = time.perf_counter()
+            plan = plan_cluster(snapshot, self.preemption_cost, self.backfill)
+            result["plan_ms"] += (time.perf_counter() - start_time) * 1000
+            
+            start_time = time.perf_counter()
+            applied = self._apply_plan(plan)
+            result["commit_ms"] += (time.perf_counter() - start_time) * 1000
+            
+            delay = None if applied else next(delays, None)
+            if delay is None:
+                break
+            result["retries"] += 1
+            time.sleep(delay)
         
-        # Count remaining unschedulable deployments
-        result["unschedulable"] += len([
-            d for d in pending_deployments 
-            if d.status == DeploymentStatus.PENDING
-        ])
+        if applied:
+            result["scheduled"] = len(plan.started_ids)
+            result["preempted"] = len(plan.preempted_ids)
+            result["unschedulable"] = plan.unschedulable
+            result["backfilled"] = plan.backfilled
+            result["reserved_for"] = plan.reserved_for
+        else:
+            result["unschedulable"] = snapshot.blocked + sum(len(d.deployment_ids) for d in snapshot.pending)
         
         return result
     
-    def _try_preemption(
-        self, 
-        pending_deployment: Deployment, 
-        running_deployments: List[Deployment]
-    ) -> List[int]:
+    def _load_snapshot(self, cluster_id: int) -> Optional[ClusterSnapshot]:
         """
-        Try to preempt running deployments to make room for a high-priority deployment.
-        Returns a list of preempted deployment IDs.
+        Load the capacity, pending and running sets of a cluster.
+        The cluster row stays locked until the plan is applied or rolled back.
         """
-        # Sort running deployments by priority (low to high)
-        sorted_running = sorted(running_deployments, key=lambda d: (d.priority.value, d.started_at or datetime.min))
+        cluster = self.db.query(Cluster).filter(Cluster.id == cluster_id).with_for_update().first()
+        if not cluster:
+            return None
         
-        # Resources needed
-        required_ram = pending_deployment.required_ram
-        required_cpu = pending_deployment.required_cpu
-        required_gpu = pending_deployment.required_gpu
+        # Plan on the exact integer counters rather than the derived floats
+        snapshot = ClusterSnapshot(
+            cluster_id=cluster.id,
+            available_ram=cluster.total_ram_mib - cluster.allocated_ram_mib,
+            available_cpu=cluster.total_cpu_millicores - cluster.allocated_cpu_millicores,
+            available_gpu=cluster.total_gpu_milli - cluster.allocated_gpu_milli,
+            total_ram=cluster.total_ram_mib,
+            total_cpu=cluster.total_cpu_millicores,
+            total_gpu=cluster.total_gpu_milli,
+            now=datetime.utcnow()
+        )
         
-        # Get the cluster's available resources
-        cluster = cluster_service.get_cluster(self.db, pending_deployment.cluster_id)
-        available_ram = cluster.available_ram
-        available_cpu = cluster.available_cpu
-        available_gpu = cluster.available_gpu
+        # Blocked deployments per group: a gang with any blocked member can't start yet
+        blocked_by_group = self.db.query(Deployment.group_id, func.count(Deployment.id)).filter(
+            Deployment.cluster_id == cluster_id,
+            Deployment.status == DeploymentStatus.PENDING,
+            Deployment.unmet_dependencies > 0
+        ).group_by(Deployment.group_id).all()
+        blocked_groups = {group_id for group_id, _ in blocked_by_group if group_id is not None}
         
-        # Calculate how much more resources we need
-        needed_ram = max(0, required_ram - available_ram)
-        needed_cpu = max(0, required_cpu - available_cpu)
-        needed_gpu = max(0, required_gpu - available_gpu)
+        # The ready queue: pending deployments whose dependencies have all completed
+        ready = self._query_deployments(
+            cluster_id,
+            DeploymentStatus.PENDING,
+            Deployment.unmet_dependencies == 0
+        )
+        snapshot.pending = group_units(ready, excluded_groups=blocked_groups)
+        snapshot.blocked = (
+            sum(count for _, count in blocked_by_group) +
+            sum(1 for d in ready if d.group_id in blocked_groups)
+        )
+        if not snapshot.pending:
+            return snapshot
         
-        # If no additional resources needed, no preemption needed
-        if needed_ram <= 0 and needed_cpu <= 0 and needed_gpu <= 0:
-            return []
+        snapshot.running = group_units(self._query_deployments(cluster_id, DeploymentStatus.RUNNING))
+        return snapshot
+    
+    def _query_deployments(self, cluster_id: int, status: DeploymentStatus, *criteria) -> List[DeploymentSnapshot]:
+        """
+        Load the scheduling-relevant columns of a cluster's deployments in one query.
+        Resources are in integer units; a deployment with a ledger row is
+        sized by what it actually holds rather than by what it requested.
+        """
+        rows = self.db.query(
+            Deployment.id,
+            Deployment.priority,
+            Deployment.required_ram,
+            Deployment.required_cpu,
+            Deployment.required_gpu,
+            Deployment.created_at,
+            Deployment.started_at,
+            Deployment.expected_runtime,
+            Deployment.group_id,
+            Deployment.version,
+            ResourceAllocation.ram_mib,
+            ResourceAllocation.cpu_millicores,
+            ResourceAllocation.gpu_milli
+        ).outerjoin(
+            ResourceAllocation, ResourceAllocation.deployment_id == Deployment.id
+        ).filter(
+            Deployment.cluster_id == cluster_id,
+            Deployment.status == status,
+            *criteria
+        ).order_by(Deployment.priority.desc(), Deployment.created_at).all()
         
-        # Deployments to preempt
-        to_preempt = []
-        preempted_ram = 0
-        preempted_cpu = 0
-        preempted_gpu = 0
+        snapshots = []
+        for row in rows:
+            if row.ram_mib is not None:
+                ram, cpu, gpu = row.ram_mib, row.cpu_millicores, row.gpu_milli
+            else:
+                ram, cpu, gpu = to_units(row.required_ram, row.required_cpu, row.required_gpu)
+            snapshots.append(DeploymentSnapshot(
+                id=row.id,
+                priority=row.priority.value,
+                ram=ram,
+                cpu=cpu,
+                gpu=gpu,
+                created_at=row.created_at,
+                started_at=row.started_at,
+                expected_runtime=row.expected_runtime,
+                group_id=row.group_id,
+                version=row.version
+            ))
+        return snapshots
+    
+    def _apply_plan(self, plan: SchedulingPlan) -> bool:
+        """
+        Apply a plan in a single transaction.
+        Returns False, leaving the database untouched, if any deployment changed
+        since the snapshot was taken: each update only matches the rows still
+        at the version the plan was made from.
+        """
+        if not plan.to_start and not plan.to_preempt:
+            self.db.rollback()
+            return True
         
-        # Try to preempt deployments until we have enough resources
-        for deployment in sorted_running:
-            # Skip if this deployment has higher or equal priority
-            if deployment.priority.value >= pending_deployment.priority.value:
-                continue
-                
-            to_preempt.append(deployment.id)
-            preempted_ram += deployment.required_ram
-            preempted_cpu += deployment.required_cpu
-            preempted_gpu += deployment.required_gpu
+        now = datetime.utcnow()
+        try:
+            if plan.to_preempt:
+                preempted_ids = plan.preempted_ids
+                preempted = self.db.query(Deployment).filter(
+                    self._unchanged(plan.to_preempt),
+                    Deployment.status == DeploymentStatus.RUNNING
+                ).update({
+                    Deployment.status: DeploymentStatus.FAILED,
+                    Deployment.finished_at: now,
+                    Deployment.version: Deployment.version + 1
+                }, synchronize_session=False)
+                if preempted != len(preempted_ids):
+                    raise RuntimeError("running set changed since snapshot")
+                self.db.query(ResourceAllocation).filter(
+                    ResourceAllocation.deployment_id.in_(preempted_ids)
+                ).delete(synchronize_session=False)
+                event_log.record_transitions(
+                    self.db, self._transitioned(plan, plan.to_preempt),
+                    DeploymentStatus.RUNNING, DeploymentStatus.FAILED, TransitionActor.PREEMPTION, "preempted", now
+                )
             
-            # Check if we have enough resources now
-            if (preempted_ram >= needed_ram and 
-                preempted_cpu >= needed_cpu and 
-                preempted_gpu >= needed_gpu):
-                break
-        
-        # If we can't get enough resources through preemption, don't preempt anything
-        if (preempted_ram < needed_ram or 
-            preempted_cpu < needed_cpu or 
-            preempted_gpu < needed_gpu):
-            return []
-        
-        # Stop the deployments to preempt
-        for deployment_id in to_preempt:
-            deployment_service.stop_deployment(self.db, deployment_id, DeploymentStatus.FAILED)
+            if plan.to_start:
+                started_ids = plan.started_ids
+                started = self.db.query(Deployment).filter(
+                    self._unchanged(plan.to_start),
+                    Deployment.status == DeploymentStatus.PENDING,
+                    Deployment.unmet_dependencies == 0
+                ).update({
+                    Deployment.status: DeploymentStatus.RUNNING,
+                    Deployment.started_at: now,
+                    Deployment.version: Deployment.version + 1
+                }, synchronize_session=False)
+                if started != len(started_ids):
+                    raise RuntimeError("pending set changed since snapshot")
+                self.db.execute(ResourceAllocation.__table__.insert(), [
+                    {
+                        "deployment_id": d.id,
+                        "cluster_id": plan.cluster_id,
+                        "ram_mib": d.ram,
+                        "cpu_millicores": d.cpu,
+                        "gpu_milli": d.gpu,
+                        "allocated_at": now
+                    }
+                    for unit in plan.to_start for d in unit.deployments
+                ])
+                event_log.record_transitions(
+                    self.db, self._transitioned(plan, plan.to_start),
+                    DeploymentStatus.PENDING, DeploymentStatus.RUNNING, TransitionActor.SCHEDULER, "scheduled", now
+                )
             
-        return to_preempt
+            # Apply the net change relative to the current counters, guarded so
+            # that capacity taken by a concurrent allocation since the snapshot
+            # is never overcommitted
+            allocated = (-plan.ram_delta, -plan.cpu_delta, -plan.gpu_delta)
+            if not cluster_service.adjust_allocated(self.db, plan.cluster_id, allocated):
+                raise RuntimeError("cluster capacity changed since snapshot")
+            
+            self.db.commit()
+            return True
+        except RuntimeError as e:
+            self.db.rollback()
+            logger.warning(f"Discarding plan for cluster {plan.cluster_id}: {e}")
+            return False
+    
+    @staticmethod
+    def _unchanged(units: List[DeploymentSnapshot]):
+        """Criterion matching the deployments in `units` that are still at their snapshot version."""
+        return tuple_(Deployment.id, Deployment.version).in_([
+            (d.id, d.version) for unit in units for d in unit.deployments
+        ])
+    
+    @staticmethod
+    def _transitioned(plan: SchedulingPlan, units: List[DeploymentSnapshot]):
+        """The (ID, cluster, priority) of each deployment in `units`, for the event log."""
+        return [
+            (d.id, plan.cluster_id, DeploymentPriority(d.priority))
+            for unit in units for d in unit.deployments
+        ]
     
-    def schedule_all_clusters(self) -> Dict[int, Dict[str, int]]:
+    def schedule_all_clusters(self) -> Dict[int, Dict[str, Any]]:
         """
         Schedule deployments for all clusters.
         Returns statistics about scheduling actions per cluster.
         """
+        return self.schedule_clusters(cluster_service.get_cluster_ids(self.db))
+    
+    def schedule_dirty_clusters(self, owned: Optional[Set[int]] = None) -> Optional[Dict[int, Dict[str, Any]]]:
+        """
+        Schedule only the clusters that changed since they were last evaluated,
+        limited to the `owned` clusters if given (see src.scheduler.leases).
+        Returns None if dirty tracking is unavailable and a full sweep is needed.
+        """
+        cluster_ids = events.pop_dirty_clusters(owned)
+        if cluster_ids is None:
+            return None
+        return self.schedule_clusters(sorted(cluster_ids))
+    
+    def schedule_clusters(self, cluster_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Schedule deployments for the given clusters.
+        Returns statistics about scheduling actions per cluster. Clusters a
+        timed-out run is still scheduling are skipped, with "still_running".
+        """
+        result = {}
+        with _overrunning_lock:
+            overrunning = set(_overrunning)
+        for cluster_id in overrunning.intersection(cluster_ids):
+            # Its overrun may still apply a plan; it is marked changed once it finishes
+            result[cluster_id] = self._empty_result()
+            result[cluster_id]["still_running"] = True
+        cluster_ids = [cluster_id for cluster_id in cluster_ids if cluster_id not in overrunning]
+        
+        if self.session_factory is None or self.max_workers <= 1 or len(cluster_ids) <= 1:
+            result.update(
+                (cluster_id, self.schedule_cluster_deployments(cluster_id))
+                for cluster_id in cluster_ids
+            )
+        else:
+            result.update(self._schedule_clusters_parallel(cluster_ids))
+        return result
+    
+    def _schedule_clusters_parallel(self, cluster_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fan clusters out across a bounded worker pool, one session per cluster.
+        A cluster that runs longer than the cluster timeout is reported with
+        "timed_out" and the cycle carries on without it. Later cycles skip the
+        cluster until that run finishes.
+        """
         result = {}
+        started_at: Dict[int, float] = {}
         
-        # Get all clusters
-        clusters = cluster_service.get_clusters(self.db)
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(cluster_ids)),
+            thread_name_prefix="scheduler"
+        )
+        futures = {
+            executor.submit(self._schedule_cluster_in_new_session, cluster_id, started_at): cluster_id
+            for cluster_id in cluster_ids
+        }
         
-        # Schedule deployments for each cluster
-        for cluster in clusters:
-            result[cluster.id] = self.schedule_cluster_deployments(cluster.id)
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                cluster_id = futures[future]
+                try:
+                    result[cluster_id] = future.result()
+                except Exception as e:
+                    logger.error(f"Error scheduling cluster {cluster_id}: {str(e)}", exc_info=True)
+                    result[cluster_id] = self._empty_result()
+                    result[cluster_id]["error"] = str(e)
             
-        return result 
\ No newline at end of file
+            now = time.monotonic()
+            for future in list(pending):
+                cluster_id = futures[future]
+                if cluster_id in started_at and now - started_at[cluster_id] > self.cluster_timeout:
+                    logger.warning(f"Scheduling cluster {cluster_id} timed out after {self.cluster_timeout}s")
+                    result[cluster_id] = self._empty_result()
+                    result[cluster_id]["timed_out"] = True
+                    pending.discard(future)
+                    with _overrunning_lock:
+                        _overrunning[cluster_id] = future
+                    future.add_done_callback(lambda _, cluster_id=cluster_id: self._overrun_finished(cluster_id))
+        
+        # Don't block the cycle on clusters that timed out
+        executor.shutdown(wait=False)
+        return result
+    
+    @staticmethod
+    def _overrun_finished(cluster_id: int):
+        """Let a timed-out cluster be scheduled again, and have it reevaluated soon."""
+        with _overrunning_lock:
+            _overrunning.pop(cluster_id, None)
+        # Changes seen while it was skipped were already taken off the dirty set
+        events.publish_cluster_event(cluster_id, "scheduling_overrun_finished")
+    
+    def _schedule_cluster_in_new_session(self, cluster_id: int, started_at: Dict[int, float]) -> Dict[str, Any]:
+        """Schedule one cluster on a dedicated session (runs on a worker thread)."""
+        started_at[cluster_id] = time.monotonic()
+        db = self.session_factory()
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                # Abort the cluster's statements server-side once they overrun. SET LOCAL
+                # only lasts until the next commit or rollback, so it is set on every
+                # transaction the session begins, and never leaks into the pooled connection.
+                timeout = text(f"SET LOCAL statement_timeout = {int(self.cluster_timeout * 1000)}")
+                event.listen(db, "after_begin", lambda session, transaction, connection: connection.execute(timeout))
+            scheduler = DeploymentScheduler(db, preemption_cost=self.preemption_cost, backfill=self.backfill)
+            return scheduler.schedule_cluster_deployments(cluster_id)
+        finally:
+            db.close()
@@ -9,7 +9,9 @@ from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 
 from src.models.base import SessionLocal
+from src.scheduler.leases import LeaseManager
 from src.scheduler.scheduler import DeploymentScheduler
+from src.utils.events import ClusterEventListener, pop_dirty_clusters
 
 # Load environment variables
 load_dotenv()
@@ -23,11 +25,12 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 redis_client = redis.from_url(REDIS_URL)
 
 # Scheduler configuration
-SCHEDULER_INTERVAL = int(os.getenv("SCHEDULER_INTERVAL", "30"))  # seconds
+SCHEDULER_INTERVAL = int(os.getenv("SCHEDULER_INTERVAL", "30"))  # seconds between checks for changed clusters
+SCHEDULER_FULL_SWEEP_INTERVAL = int(os.getenv("SCHEDULER_FULL_SWEEP_INTERVAL", "300"))  # seconds between full sweeps
 
 
 class SchedulerWorker:
-    """Worker that runs the deployment scheduler at regular intervals."""
+    """Worker that runs the deployment scheduler for changed clusters and sweeps all clusters at regular intervals."""
     
     def __init__(self):
         self.running = False
@@ -57,52 +60,102 @@ class SchedulerWorker:
         logger.info("Scheduler worker stopped")
     
     def _run_scheduler_loop(self):
-        """Run the scheduler in a loop at regular intervals."""
+        """
+        Run the scheduler for the clusters that changed since their last
+        evaluation, as soon as they change and at regular intervals, with an
+        infrequent full sweep of all clusters as a safety net. Only clusters
+        leased to this replica are scheduled (see src.scheduler.leases).
+        """
+        listener = ClusterEventListener()
+        leases = LeaseManager()
+        next_full_sweep = 0.0
+        
         while self.running:
             try:
                 # Create a new database session for this iteration
                 db = SessionLocal()
                 
-                # Run the scheduler
-                scheduler = DeploymentScheduler(db)
+                # Renew this replica's leases before scheduling its clusters
                 start_time = time.time()
-                results = scheduler.schedule_all_clusters()
+                owned = leases.refresh(db)
+                
+                # Run the scheduler
+                scheduler = DeploymentScheduler(db, session_factory=SessionLocal)
+                results = None
+                # Clusters just taken over from another replica are swept right away
+                full_sweep = start_time >= next_full_sweep or bool(leases.newly_acquired)
+                if not full_sweep:
+                    results = scheduler.schedule_dirty_clusters(owned)
+                    full_sweep = results is None
+                if full_sweep:
+                    next_full_sweep = start_time + SCHEDULER_FULL_SWEEP_INTERVAL
+                    # The sweep covers every owned cluster marked dirty so far
+                    pop_dirty_clusters(owned)
+                    results = scheduler.schedule_clusters(sorted(owned))
                 
                 # Log results
                 total_scheduled = sum(r["scheduled"] for r in results.values())
                 total_preempted = sum(r["preempted"] for r in results.values())
                 total_unschedulable = sum(r["unschedulable"] for r in results.values())
+                total_plan_ms = sum(r["plan_ms"] for r in results.values())
+                total_commit_ms = sum(r["commit_ms"] for r in results.values())
                 
-                logger.info(
-                    f"Scheduler run completed in {time.time() - start_time:.2f}s. "
+                logger.log(
+                    logging.INFO if results or full_sweep else logging.DEBUG,
+                    f"Scheduler run ({'full sweep' if full_sweep else f'{len(results)} changed clusters'}) "
+                    f"completed in {time.time() - start_time:.2f}s. "
                     f"Scheduled: {total_scheduled}, "
                     f"Preempted: {total_preempted}, "
-                    f"Unschedulable: {total_unschedulable}"
+                    f"Unschedulable: {total_unschedulable}, "
+                    f"Plan: {total_plan_ms:.1f}ms, "
+                    f"Commit: {total_commit_ms:.1f}ms"
                 )
                 
-                # Store results in Redis for monitoring
-                redis_client.set(
-                    "scheduler:last_run", 
-                    json.dumps({
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "results": results,
-                        "totals": {
-                            "scheduled": total_scheduled,
-                            "preempted": total_preempted,
-                            "unschedulable": total_unschedulable
-                        }
-                    })
-                )
+                # Store results in Redis for monitoring: the latest run of any replica, and each replica's own
+                last_run = json.dumps({
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "replica": leases.replica_id,
+                    "owned_clusters": len(owned),
+                    "full_sweep": full_sweep,
+                    "results": results,
+                    "totals": {
+                        "scheduled": total_scheduled,
+                        "preempted": total_preempted,
+                        "unschedulable": total_unschedulable,
+                        "plan_ms": total_plan_ms,
+                        "commit_ms": total_commit_ms
+                    }
+                })
+                pipe = redis_client.pipeline()
+                pipe.set("scheduler:last_run", last_run)
+                pipe.set(f"scheduler:last_run:{leases.replica_id}", last_run)
+                pipe.execute()
                 
                 # Close the database session
                 db.close()
                 
-                # Sleep until next interval
-                time.sleep(SCHEDULER_INTERVAL)
+                # Wait until a cluster changes or the next check (or lease renewal) is due
+                next_check = min(start_time + SCHEDULER_INTERVAL, next_full_sweep, start_time + leases.renew_interval)
+                changed = set()
+                while self.running and not changed and time.time() < next_check:
+                    changed = listener.wait(min(next_check - time.time(), 1.0))
                 
             except Exception as e:
                 logger.error(f"Error in scheduler loop: {str(e)}", exc_info=True)
+                # Changes may have been lost, so sweep everything on retry
+                next_full_sweep = 0.0
                 time.sleep(5)  # Sleep a bit before retrying
+        
+        listener.close()
+        
+        # Hand this replica's clusters over to the others straight away
+        db = SessionLocal()
+        try:
+            leases.release_all(db)
+        except Exception as e:
+            logger.warning(f"Could not release cluster leases, they will expire: {str(e)}")
+        finally:
+            db.close()
 
 
 # Singleton instance
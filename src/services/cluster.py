@@ -1,8 +1,14 @@
+from sqlalchemy import Integer, case, cast, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
 
-from src.models.models import Cluster, Organization, User
+from src.models.models import Cluster, Deployment, DeploymentStatus, Organization, ResourceAllocation, User
 from src.models.schemas import ClusterCreate, ClusterUpdate
+from src.services import transaction
+from src.services.concurrency import check_version, retry_on_conflict
+from src.utils.resources import MIB_PER_GB, MILLI_PER_GPU, MILLICORES_PER_CPU, Units, to_units
 
 
 def get_cluster(db: Session, cluster_id: int):
@@ -15,11 +21,36 @@ def get_clusters(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Cluster).offset(skip).limit(limit).all()
 
 
+def get_cluster_ids(db: Session) -> List[int]:
+    """Get the IDs of all clusters."""
+    return [row.id for row in db.query(Cluster.id).order_by(Cluster.id)]
+
+
 def get_organization_clusters(db: Session, org_id: int):
     """Get clusters for a specific organization."""
     return db.query(Cluster).filter(Cluster.organization_id == org_id).all()
 
 
+async def get_cluster_async(db: AsyncSession, cluster_id: int):
+    """Get a cluster by ID."""
+    return await db.get(Cluster, cluster_id)
+
+
+async def get_organizations_clusters_async(
+    db: AsyncSession,
+    org_ids: List[int],
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None
+):
+    """Get a page of the clusters of several organizations, in id order after the cluster `after_id`."""
+    statement = select(Cluster).where(Cluster.organization_id.in_(org_ids))
+    if after_id is not None:
+        statement = statement.where(Cluster.id > after_id)
+    result = await db.execute(statement.order_by(Cluster.id).offset(skip).limit(limit))
+    return list(result.scalars())
+
+
 def create_cluster(db: Session, cluster: ClusterCreate, creator_id: int):
     """Create a new cluster."""
     # Check if organization exists
@@ -28,6 +59,7 @@ def create_cluster(db: Session, cluster: ClusterCreate, creator_id: int):
         return None
     
     # Create new cluster with initial available resources matching total resources
+    total_ram_mib, total_cpu_millicores, total_gpu_milli = to_units(cluster.total_ram, cluster.total_cpu, cluster.total_gpu)
     db_cluster = Cluster(
         name=cluster.name,
         total_ram=cluster.total_ram,
@@ -36,44 +68,55 @@ def create_cluster(db: Session, cluster: ClusterCreate, creator_id: int):
         available_ram=cluster.total_ram,
         available_cpu=cluster.total_cpu,
         available_gpu=cluster.total_gpu,
+        total_ram_mib=total_ram_mib,
+        total_cpu_millicores=total_cpu_millicores,
+        total_gpu_milli=total_gpu_milli,
         organization_id=cluster.organization_id,
         creator_id=creator_id
     )
     db.add(db_cluster)
-    db.commit()
-    db.refresh(db_cluster)
+    transaction.commit(db)
+    transaction.refresh(db, db_cluster)
     return db_cluster
 
 
-def update_cluster(db: Session, cluster_id: int, cluster: ClusterUpdate):
-    """Update a cluster."""
+@retry_on_conflict
+def update_cluster(db: Session, cluster_id: int, cluster: ClusterUpdate, expected_version: Optional[int] = None):
+    """
+    Update a cluster, if it is still at `expected_version` (when given).
+    The write only succeeds against the version read, so a concurrent
+    update makes this one start over instead of overwriting it.
+    """
     db_cluster = get_cluster(db, cluster_id)
     if not db_cluster:
         return None
+    check_version(db_cluster, expected_version)
     
     update_data = cluster.dict(exclude_unset=True)
     
-    # If resources are being updated, update available resources accordingly
-    if "total_ram" in update_data and update_data["total_ram"] > db_cluster.total_ram:
-        diff = update_data["total_ram"] - db_cluster.total_ram
-        db_cluster.available_ram += diff
+    for key, value in update_data.items():
+        setattr(db_cluster, key, value)
     
-    if "total_cpu" in update_data and update_data["total_cpu"] > db_cluster.total_cpu:
-        diff = update_data["total_cpu"] - db_cluster.total_cpu
-        db_cluster.available_cpu += diff
+    # If resources are being updated, derive available resources from what is allocated.
+    # Allocating bumps the version too, so the counters read are still current if the write succeeds.
+    if {"total_ram", "total_cpu", "total_gpu"} & update_data.keys():
+        db_cluster.total_ram_mib, db_cluster.total_cpu_millicores, db_cluster.total_gpu_milli = to_units(
+            db_cluster.total_ram, db_cluster.total_cpu, db_cluster.total_gpu
+        )
+        for allocated, total, available, per_unit in _DIMENSIONS:
+            remaining = getattr(db_cluster, total.key) - getattr(db_cluster, allocated.key)
+            setattr(db_cluster, available.key, remaining / float(per_unit))
     
-    if "total_gpu" in update_data and update_data["total_gpu"] > db_cluster.total_gpu:
-        diff = update_data["total_gpu"] - db_cluster.total_gpu
-        db_cluster.available_gpu += diff
+    transaction.commit(db)
+    transaction.refresh(db, db_cluster)
     
-    for key, value in update_data.items():
-        setattr(db_cluster, key, value)
+    if {"total_ram", "total_cpu", "total_gpu"} & update_data.keys():
+        transaction.publish_cluster_event(db, db_cluster.id, "cluster_resized")
     
-    db.commit()
-    db.refresh(db_cluster)
     return db_cluster
 
 
+@retry_on_conflict
 def delete_cluster(db: Session, cluster_id: int):
     """Delete a cluster."""
     db_cluster = get_cluster(db, cluster_id)
@@ -81,59 +124,250 @@ def delete_cluster(db: Session, cluster_id: int):
         return False
     
     db.delete(db_cluster)
-    db.commit()
+    transaction.commit(db)
     return True
 
 
-def allocate_cluster_resources(db: Session, cluster_id: int, ram: float, cpu: float, gpu: float):
-    """Allocate resources from a cluster for a deployment."""
-    db_cluster = get_cluster(db, cluster_id)
-    if not db_cluster:
-        return False
+# (allocated counter, total counter, derived available column, units per API unit) per resource
+_DIMENSIONS = (
+    (Cluster.allocated_ram_mib, Cluster.total_ram_mib, Cluster.available_ram, MIB_PER_GB),
+    (Cluster.allocated_cpu_millicores, Cluster.total_cpu_millicores, Cluster.available_cpu, MILLICORES_PER_CPU),
+    (Cluster.allocated_gpu_milli, Cluster.total_gpu_milli, Cluster.available_gpu, MILLI_PER_GPU),
+)
+
+
+def adjust_allocated(db: Session, cluster_id: int, units: Units) -> bool:
+    """
+    Add signed integer units to a cluster's allocated counters and re-derive
+    its available resources, in one conditional UPDATE that fails if an
+    increase would exceed the cluster's totals. Counters never go below zero.
+    Bumps the cluster's version, as any other write does.
+    Does not commit. Returns False if the cluster is missing or too full.
+    """
+    criteria = [Cluster.id == cluster_id]
+    values = {Cluster.version: Cluster.version + 1}
+    for (allocated, total, available, per_unit), amount in zip(_DIMENSIONS, units):
+        if amount > 0:
+            criteria.append(allocated + amount <= total)
+        new_allocated = case((allocated + amount < 0, 0), else_=allocated + amount)
+        values[allocated] = new_allocated
+        values[available] = (total - new_allocated) / float(per_unit)
+    
+    return db.query(Cluster).filter(*criteria).update(values, synchronize_session=False) == 1
+
+
+def _derive_available(db: Session, cluster_id: Optional[int] = None):
+    """Recompute available resources from the integer counters, bumping the version."""
+    query = db.query(Cluster)
+    if cluster_id is not None:
+        query = query.filter(Cluster.id == cluster_id)
+    values = {
+        available: (total - allocated) / float(per_unit)
+        for allocated, total, available, per_unit in _DIMENSIONS
+    }
+    values[Cluster.version] = Cluster.version + 1
+    query.update(values, synchronize_session=False)
+
+
+def allocate_cluster_resources(
+    db: Session,
+    cluster_id: int,
+    ram: float,
+    cpu: float,
+    gpu: float,
+    deployment_id: Optional[int] = None
+):
+    """
+    Allocate resources from a cluster for a deployment.
+    The capacity check and the increment are a single conditional UPDATE on
+    exact integer counters, so concurrent callers can never overcommit the
+    cluster. With deployment_id the allocation is recorded in the ledger.
+    Commits on success, together with any other pending changes in the
+    session (inside a unit of work, only flushes).
+    """
+    units = to_units(ram, cpu, gpu)
     
-    # Check if enough resources are available
-    if (db_cluster.available_ram < ram or 
-        db_cluster.available_cpu < cpu or 
-        db_cluster.available_gpu < gpu):
+    # Cluster missing or not enough resources available
+    if not adjust_allocated(db, cluster_id, units):
         return False
     
-    # Allocate resources
-    db_cluster.available_ram -= ram
-    db_cluster.available_cpu -= cpu
-    db_cluster.available_gpu -= gpu
+    if deployment_id is not None:
+        db.add(_ledger_row(deployment_id, cluster_id, units))
     
-    db.commit()
-    db.refresh(db_cluster)
+    # Committing expires any loaded copy of the cluster, so it is reloaded on next access
+    transaction.commit(db)
     return True
 
 
-def release_cluster_resources(db: Session, cluster_id: int, ram: float, cpu: float, gpu: float):
-    """Release resources back to a cluster from a completed/failed deployment."""
-    db_cluster = get_cluster(db, cluster_id)
-    if not db_cluster:
+def reserve_deployment_resources(db: Session, cluster_id: int, deployments: List[Deployment]) -> bool:
+    """
+    Allocate resources for several deployments at once, all or nothing,
+    with one ledger row per deployment. Does not commit.
+    """
+    units = {d.id: to_units(d.required_ram, d.required_cpu, d.required_gpu) for d in deployments}
+    total = tuple(sum(u[i] for u in units.values()) for i in range(3))
+    
+    if not adjust_allocated(db, cluster_id, total):
+        return False
+    
+    db.add_all(_ledger_row(deployment_id, cluster_id, u) for deployment_id, u in units.items())
+    return True
+
+
+def allocate_deployment_resources(db: Session, cluster_id: int, deployments: List[Deployment]):
+    """
+    Allocate resources for several deployments at once, all or nothing,
+    with one ledger row per deployment. Commits on success (inside a unit
+    of work, only flushes).
+    """
+    if not reserve_deployment_resources(db, cluster_id, deployments):
         return False
     
-    # Release resources
-    db_cluster.available_ram += ram
-    db_cluster.available_cpu += cpu
-    db_cluster.available_gpu += gpu
+    transaction.commit(db)
+    return True
+
+
+def release_cluster_resources(
+    db: Session,
+    cluster_id: int,
+    ram: float,
+    cpu: float,
+    gpu: float,
+    deployment_id: Optional[int] = None
+):
+    """
+    Release resources back to a cluster from a completed/failed deployment.
+    With deployment_id, exactly what the ledger recorded for the deployment is
+    released and its ledger row removed; the given amounts are only used if
+    it has no ledger row.
+    """
+    units = to_units(ram, cpu, gpu)
+    if deployment_id is not None:
+        allocation = db.get(ResourceAllocation, deployment_id)
+        if allocation is not None:
+            units = (allocation.ram_mib, allocation.cpu_millicores, allocation.gpu_milli)
+            db.delete(allocation)
     
-    # Ensure we don't exceed total resources
-    db_cluster.available_ram = min(db_cluster.available_ram, db_cluster.total_ram)
-    db_cluster.available_cpu = min(db_cluster.available_cpu, db_cluster.total_cpu)
-    db_cluster.available_gpu = min(db_cluster.available_gpu, db_cluster.total_gpu)
+    if not adjust_allocated(db, cluster_id, tuple(-u for u in units)):
+        return False
     
-    db.commit()
-    db.refresh(db_cluster)
+    transaction.commit(db)
     return True
 
 
+def release_deployment_resources(db: Session, deployments: List[Deployment]):
+    """
+    Release the resources of several deployments, as the ledger recorded
+    them, with one update per cluster and their ledger rows removed in one
+    delete. A deployment without a ledger row releases its required amounts
+    on its own cluster. Does not commit.
+    """
+    deployment_ids = [d.id for d in deployments]
+    allocations = {
+        allocation.deployment_id: allocation
+        for allocation in db.query(ResourceAllocation).filter(ResourceAllocation.deployment_id.in_(deployment_ids))
+    }
+    
+    released = defaultdict(lambda: [0, 0, 0])
+    for d in deployments:
+        allocation = allocations.get(d.id)
+        if allocation is not None:
+            cluster_id, units = allocation.cluster_id, (allocation.ram_mib, allocation.cpu_millicores, allocation.gpu_milli)
+        else:
+            cluster_id, units = d.cluster_id, to_units(d.required_ram, d.required_cpu, d.required_gpu)
+        for i, amount in enumerate(units):
+            released[cluster_id][i] += amount
+    
+    db.query(ResourceAllocation).filter(
+        ResourceAllocation.deployment_id.in_(deployment_ids)
+    ).delete(synchronize_session=False)
+    for cluster_id, units in released.items():
+        adjust_allocated(db, cluster_id, tuple(-u for u in units))
+
+
+def lock_clusters(db: Session, cluster_ids: Iterable[int]) -> Dict[int, Cluster]:
+    """
+    Lock clusters for the rest of the transaction (SELECT ... FOR UPDATE,
+    where the database supports it), in ID order so that concurrent bulk
+    operations can't deadlock. Returns the clusters, freshly loaded, by ID.
+    """
+    clusters = db.query(Cluster).filter(
+        Cluster.id.in_(set(cluster_ids))
+    ).order_by(Cluster.id).with_for_update().populate_existing().all()
+    return {cluster.id: cluster for cluster in clusters}
+
+
+def _ledger_row(deployment_id: int, cluster_id: int, units: Units) -> ResourceAllocation:
+    ram_mib, cpu_millicores, gpu_milli = units
+    return ResourceAllocation(
+        deployment_id=deployment_id,
+        cluster_id=cluster_id,
+        ram_mib=ram_mib,
+        cpu_millicores=cpu_millicores,
+        gpu_milli=gpu_milli
+    )
+
+
+def reconcile_cluster_resources(db: Session, cluster_id: Optional[int] = None):
+    """
+    Rebuild capacity accounting from the source of truth, in a few set-based
+    statements: drop ledger rows of deployments that are no longer running,
+    add rows for running deployments that have none, then recompute each
+    cluster's integer totals from its configured totals and its allocated
+    counters from the ledger, bumping its version.
+    """
+    running = select(Deployment.id).where(Deployment.status == DeploymentStatus.RUNNING)
+    
+    stale = db.query(ResourceAllocation).filter(ResourceAllocation.deployment_id.notin_(running))
+    if cluster_id is not None:
+        stale = stale.filter(ResourceAllocation.cluster_id == cluster_id)
+    stale.delete(synchronize_session=False)
+    
+    missing = select(
+        Deployment.id,
+        Deployment.cluster_id,
+        cast(func.round(Deployment.required_ram * MIB_PER_GB), Integer),
+        cast(func.round(Deployment.required_cpu * MILLICORES_PER_CPU), Integer),
+        cast(func.round(Deployment.required_gpu * MILLI_PER_GPU), Integer)
+    ).where(
+        Deployment.status == DeploymentStatus.RUNNING,
+        Deployment.id.notin_(select(ResourceAllocation.deployment_id))
+    )
+    if cluster_id is not None:
+        missing = missing.where(Deployment.cluster_id == cluster_id)
+    db.execute(insert(ResourceAllocation).from_select(
+        ["deployment_id", "cluster_id", "ram_mib", "cpu_millicores", "gpu_milli"],
+        missing
+    ))
+    
+    def ledger_sum(column):
+        return select(func.coalesce(func.sum(column), 0)).where(
+            ResourceAllocation.cluster_id == Cluster.id
+        ).scalar_subquery()
+    
+    clusters = db.query(Cluster)
+    if cluster_id is not None:
+        clusters = clusters.filter(Cluster.id == cluster_id)
+    clusters.update({
+        Cluster.total_ram_mib: cast(func.round(Cluster.total_ram * MIB_PER_GB), Integer),
+        Cluster.total_cpu_millicores: cast(func.round(Cluster.total_cpu * MILLICORES_PER_CPU), Integer),
+        Cluster.total_gpu_milli: cast(func.round(Cluster.total_gpu * MILLI_PER_GPU), Integer),
+        Cluster.allocated_ram_mib: ledger_sum(ResourceAllocation.ram_mib),
+        Cluster.allocated_cpu_millicores: ledger_sum(ResourceAllocation.cpu_millicores),
+        Cluster.allocated_gpu_milli: ledger_sum(ResourceAllocation.gpu_milli)
+    }, synchronize_session=False)
+    _derive_available(db, cluster_id)
+    
+    transaction.commit(db)
+
+
 def check_cluster_resources(db: Session, cluster_id: int, required_ram: float, required_cpu: float, required_gpu: float):
     """Check if a cluster has enough resources for a deployment."""
     db_cluster = get_cluster(db, cluster_id)
     if not db_cluster:
         return False
     
-    return (db_cluster.available_ram >= required_ram and 
-            db_cluster.available_cpu >= required_cpu and 
-            db_cluster.available_gpu >= required_gpu) 
\ No newline at end of file
+    ram_mib, cpu_millicores, gpu_milli = to_units(required_ram, required_cpu, required_gpu)
+    return (db_cluster.total_ram_mib - db_cluster.allocated_ram_mib >= ram_mib and 
+            db_cluster.total_cpu_millicores - db_cluster.allocated_cpu_millicores >= cpu_millicores and 
+            db_cluster.total_gpu_milli - db_cluster.allocated_gpu_milli >= gpu_milli)
@@ -0,0 +1,73 @@
+import functools
+import os
+import random
+import time
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Iterator, Optional
+
+from src.services.transaction import in_unit_of_work
+
+# How many times a write that lost a race is retried, and the backoff before
+# the first retry in seconds; each later retry waits up to twice as long
+OCC_MAX_RETRIES = int(os.getenv("OCC_MAX_RETRIES", "3"))
+OCC_BACKOFF_SECONDS = float(os.getenv("OCC_BACKOFF_SECONDS", "0.01"))
+
+
+class ConflictError(HTTPException):
+    """A write kept losing races with other writers to the same rows."""
+
+    def __init__(self, detail: str = "The resource was modified concurrently, try again"):
+        super().__init__(status_code=409, detail=detail)
+
+
+class VersionMismatchError(HTTPException):
+    """The row is no longer at the version the client read (a failed If-Match)."""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=412, detail=detail)
+
+
+def check_version(row, expected_version: Optional[int]):
+    """Raise VersionMismatchError unless `row` is at `expected_version` (if given)."""
+    if expected_version is not None and row.version != expected_version:
+        raise VersionMismatchError(
+            f"{type(row).__name__} {row.id} is at version {row.version}, not {expected_version}"
+        )
+
+
+def backoff_delays(retries: int = OCC_MAX_RETRIES, base: float = OCC_BACKOFF_SECONDS) -> Iterator[float]:
+    """
+    The delays before each of `retries` retries: exponential backoff with
+    full jitter, so writers that collided don't collide again in lockstep.
+    """
+    for attempt in range(retries):
+        yield random.uniform(0, base * 2 ** attempt)
+
+
+def retry_on_conflict(func):
+    """
+    Retry a service function (taking the session first) whose flush found
+    a row at another version than it read. The transaction is rolled back,
+    so the retry reads everything afresh; once the retries run out the
+    function raises ConflictError. Nothing is locked while waiting. Inside
+    a unit of work the conflict is left to its caller, since only the
+    whole unit can be retried.
+    """
+    @functools.wraps(func)
+    def wrapper(db: Session, *args, **kwargs):
+        if in_unit_of_work(db):
+            return func(db, *args, **kwargs)
+        delays = backoff_delays()
+        while True:
+            try:
+                return func(db, *args, **kwargs)
+            except StaleDataError:
+                db.rollback()
+                delay = next(delays, None)
+                if delay is None:
+                    raise ConflictError()
+                time.sleep(delay)
+    
+    return wrapper
@@ -1,11 +1,24 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from collections import defaultdict
+from sqlalchemy import Integer, func, insert, literal, null, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 from fastapi import HTTPException
 
-from src.models.models import Deployment, DeploymentStatus, DeploymentPriority, Cluster, User
-from src.models.schemas import DeploymentCreate, DeploymentUpdate, DeploymentPriorityEnum
+from src.models.models import (
+    Deployment, DeploymentGroup, DeploymentStatus, DeploymentPriority, Cluster, User, TERMINAL_STATUSES,
+    TransitionActor, deployment_dependencies
+)
+from src.models.schemas import (
+    DeploymentBatchCreate, DeploymentBatchItem, DeploymentCreate, DeploymentGroupCreate, DeploymentUpdate,
+    DependencyDirectionEnum, DeploymentPriorityEnum, DeploymentStatusEnum
+)
 from src.services import cluster as cluster_service
+from src.services import event_log
+from src.services import transaction
+from src.services.concurrency import check_version, retry_on_conflict
+from src.utils.resources import to_units
 
 
 # Helper function to map between schema enum and model enum
@@ -20,34 +33,319 @@ def map_priority_enum(priority_enum: DeploymentPriorityEnum) -> DeploymentPriori
     return DeploymentPriority.MEDIUM  # Default
 
 
+def _with_dependency_links(query):
+    """
+    Load dependencies and dependents up front, with one query each for all
+    the rows, instead of lazily per row when a response serialises them
+    (async sessions can't lazy-load at all).
+    """
+    return query.options(selectinload(Deployment.dependencies), selectinload(Deployment.dependents))
+
+
 def get_deployment(db: Session, deployment_id: int):
     """Get a deployment by ID."""
     return db.query(Deployment).filter(Deployment.id == deployment_id).first()
 
 
+def get_deployments_by_ids(db: Session, deployment_ids: List[int]) -> List[Deployment]:
+    """Get several deployments by ID with one query, in the order of `deployment_ids`; missing ones are left out."""
+    if not deployment_ids:
+        return []
+    found = {d.id: d for d in db.query(Deployment).filter(Deployment.id.in_(deployment_ids))}
+    return [found[deployment_id] for deployment_id in dict.fromkeys(deployment_ids) if deployment_id in found]
+
+
+def find_dependency_cycles(db: Session, deployment_id: int, dependency_ids: List[int]) -> Set[int]:
+    """
+    Find the dependency_ids that would close a cycle if the deployment
+    depended on them: itself, and every deployment that already depends on
+    it directly or transitively. All of them are checked with one recursive
+    query over the deployment's dependents.
+    """
+    requested = set(dependency_ids)
+    cycles = requested & {deployment_id}
+    
+    edges = deployment_dependencies.c
+    dependents = select(edges.dependent_id.label("id")).where(
+        edges.dependency_id == deployment_id
+    ).cte("dependents", recursive=True)
+    # UNION rather than UNION ALL, so the walk ends even if the graph already has a cycle
+    dependents = dependents.union(
+        select(edges.dependent_id).join(dependents, edges.dependency_id == dependents.c.id)
+    )
+    cycles.update(db.scalars(select(dependents.c.id).where(dependents.c.id.in_(requested))))
+    return cycles
+
+
 def get_deployments(db: Session, skip: int = 0, limit: int = 100):
     """Get a list of deployments."""
-    return db.query(Deployment).offset(skip).limit(limit).all()
+    return _with_dependency_links(db.query(Deployment)).order_by(Deployment.id).offset(skip).limit(limit).all()
 
 
 def get_cluster_deployments(db: Session, cluster_id: int):
     """Get deployments for a specific cluster."""
-    return db.query(Deployment).filter(Deployment.cluster_id == cluster_id).all()
+    return _with_dependency_links(db.query(Deployment)).filter(Deployment.cluster_id == cluster_id).all()
 
 
 def get_user_deployments(db: Session, user_id: int):
     """Get deployments for a specific user."""
-    return db.query(Deployment).filter(Deployment.user_id == user_id).all()
+    return _with_dependency_links(db.query(Deployment)).filter(Deployment.user_id == user_id).all()
+
+
+def get_deployment_dependencies(db: Session, deployment_id: int):
+    """Get the deployments a deployment depends on."""
+    return _with_dependency_links(db.query(Deployment)).join(
+        deployment_dependencies, deployment_dependencies.c.dependency_id == Deployment.id
+    ).filter(deployment_dependencies.c.dependent_id == deployment_id).order_by(Deployment.id).all()
+
+
+def get_deployment_dependents(db: Session, deployment_id: int):
+    """Get the deployments that depend on a deployment."""
+    return _with_dependency_links(db.query(Deployment)).join(
+        deployment_dependencies, deployment_dependencies.c.dependent_id == Deployment.id
+    ).filter(deployment_dependencies.c.dependency_id == deployment_id).order_by(Deployment.id).all()
 
 
-def get_pending_deployments(db: Session, cluster_id: Optional[int] = None):
-    """Get all pending deployments for a cluster, ordered by priority (high to low)."""
+def get_deployment_graph(
+    db: Session,
+    deployment_id: int,
+    direction: DependencyDirectionEnum = DependencyDirectionEnum.UPSTREAM,
+    max_depth: Optional[int] = None
+) -> Optional[Dict]:
+    """
+    Get the transitive dependencies (upstream) or dependents (downstream) of
+    a deployment, up to `max_depth` levels away, with one recursive query.
+    
+    Every node, the deployment itself included at depth 0, has its shortest
+    distance from the deployment and its dependencies within the graph.
+    Upstream graphs also carry the critical path: the longest chain of
+    unfinished dependencies blocking the deployment, in the order they
+    have to complete.
+    """
+    edges = deployment_dependencies.c
+    if direction == DependencyDirectionEnum.UPSTREAM:
+        near, far = edges.dependent_id, edges.dependency_id
+    else:
+        near, far = edges.dependency_id, edges.dependent_id
+    
+    # Each row is a node and the node it was reached from. UNION keeps the
+    # rows distinct, so the walk ends once every edge has been seen; the
+    # depth column is only carried when it bounds the walk, since otherwise
+    # a node reached along paths of different lengths would repeat.
+    columns = [literal(deployment_id, Integer).label("id"), null().label("via_id")]
+    if max_depth is not None:
+        columns.append(literal(0, Integer).label("depth"))
+    graph = select(*columns).cte("graph", recursive=True)
+    step = select(far, near).join(graph, near == graph.c.id)
+    if max_depth is not None:
+        step = step.add_columns(graph.c.depth + 1).where(graph.c.depth < max_depth)
+    graph = graph.union(step)
+    
+    rows = db.execute(
+        select(graph.c.id, graph.c.via_id, Deployment.name, Deployment.status, Deployment.priority)
+        .join(Deployment, Deployment.id == graph.c.id)
+    ).all()
+    if not rows:
+        return None
+    
+    nodes = {}
+    links = defaultdict(set)
+    for row in rows:
+        nodes[row.id] = row
+        if row.via_id is not None:
+            links[row.via_id].add(row.id)
+    
+    # Breadth-first over the edges gives each node its shortest distance
+    depths = {deployment_id: 0}
+    level = [deployment_id]
+    while level:
+        next_level = []
+        for node_id in level:
+            for linked_id in links[node_id]:
+                if linked_id not in depths:
+                    depths[linked_id] = depths[node_id] + 1
+                    next_level.append(linked_id)
+        level = next_level
+    
+    if direction == DependencyDirectionEnum.UPSTREAM:
+        dependencies = links
+    else:
+        dependencies = defaultdict(set)
+        for dependency_id, dependent_ids in links.items():
+            for dependent_id in dependent_ids:
+                dependencies[dependent_id].add(dependency_id)
+    
+    critical_path = None
+    if direction == DependencyDirectionEnum.UPSTREAM:
+        critical_path = _critical_path(deployment_id, links, {
+            node_id for node_id, row in nodes.items() if row.status != DeploymentStatus.COMPLETED
+        })
+    
+    return {
+        "deployment_id": deployment_id,
+        "direction": direction.value,
+        "max_depth": max_depth,
+        "nodes": [
+            {
+                "id": node_id,
+                "name": nodes[node_id].name,
+                "status": nodes[node_id].status.value,
+                "priority": nodes[node_id].priority.value,
+                "depth": depths[node_id],
+                "dependency_ids": sorted(dependencies[node_id]),
+            }
+            for node_id in sorted(depths, key=lambda node_id: (depths[node_id], node_id))
+        ],
+        "critical_path": critical_path,
+    }
+
+
+def _critical_path(deployment_id: int, dependencies: Dict[int, Set[int]], unfinished: Set[int]) -> List[int]:
+    """
+    The longest chain of unfinished dependencies below `deployment_id`,
+    deepest first. Ties go to the lower ID. Iterative, so deep chains don't
+    exhaust the stack, and any cycle already in the data is cut where found.
+    """
+    def blocking(node_id):
+        return sorted(dependencies[node_id] & unfinished)
+    
+    length: Dict[int, int] = {}
+    best: Dict[int, int] = {}
+    stack = [(deployment_id, iter(blocking(deployment_id)))]
+    on_stack = {deployment_id}
+    while stack:
+        node_id, children = stack[-1]
+        child_id = next(children, None)
+        if child_id is None:
+            stack.pop()
+            on_stack.discard(node_id)
+            length[node_id] = 1
+            for candidate in blocking(node_id):
+                if candidate in length and length[candidate] + 1 > length[node_id]:
+                    length[node_id] = length[candidate] + 1
+                    best[node_id] = candidate
+        elif child_id not in length and child_id not in on_stack:
+            on_stack.add(child_id)
+            stack.append((child_id, iter(blocking(child_id))))
+    
+    path = []
+    node_id = best.get(deployment_id)
+    while node_id is not None:
+        path.append(node_id)
+        node_id = best.get(node_id)
+    return path[::-1]
+
+
+async def get_deployment_async(db: AsyncSession, deployment_id: int):
+    """Get a deployment by ID, with its dependencies and dependents."""
+    result = await db.execute(_with_dependency_links(select(Deployment).where(Deployment.id == deployment_id)))
+    return result.scalar_one_or_none()
+
+
+def _user_deployments_select(
+    user_id: int,
+    after_id: Optional[int] = None,
+    status: Optional[DeploymentStatusEnum] = None,
+    priority: Optional[DeploymentPriorityEnum] = None,
+    cluster_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+):
+    """A user's deployments matching the filters in id order, starting after the deployment `after_id`."""
+    statement = select(Deployment).where(Deployment.user_id == user_id)
+    if after_id is not None:
+        statement = statement.where(Deployment.id > after_id)
+    if status is not None:
+        statement = statement.where(Deployment.status == DeploymentStatus(status.value))
+    if priority is not None:
+        statement = statement.where(Deployment.priority == map_priority_enum(priority))
+    if cluster_id is not None:
+        statement = statement.where(Deployment.cluster_id == cluster_id)
+    if created_after is not None:
+        statement = statement.where(Deployment.created_at >= created_after)
+    if created_before is not None:
+        statement = statement.where(Deployment.created_at < created_before)
+    return statement.order_by(Deployment.id)
+
+
+async def get_user_deployments_async(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    **filters
+):
+    """
+    Get a page of a user's deployments, with their dependencies and dependents.
+    Pages are read in id order after the deployment `after_id`; `filters` are
+    those of _user_deployments_select.
+    """
+    result = await db.execute(_with_dependency_links(
+        _user_deployments_select(user_id, after_id, **filters).offset(skip).limit(limit)
+    ))
+    return list(result.scalars())
+
+
+def get_pending_deployments(db: Session, cluster_id: Optional[int] = None, ready_only: bool = False):
+    """
+    Get all pending deployments for a cluster, ordered by priority (high to low).
+    With ready_only, only deployments whose dependencies have all completed are returned.
+    """
     query = db.query(Deployment).filter(Deployment.status == DeploymentStatus.PENDING)
     if cluster_id:
         query = query.filter(Deployment.cluster_id == cluster_id)
+    if ready_only:
+        query = query.filter(Deployment.unmet_dependencies == 0)
     return query.order_by(Deployment.priority.desc(), Deployment.created_at).all()
 
 
+def count_unmet_dependencies(dependencies: List[Deployment]) -> int:
+    """Count the dependencies that have not completed yet."""
+    return sum(1 for dependency in dependencies if dependency.status != DeploymentStatus.COMPLETED)
+
+
+def adjust_dependent_counters(db: Session, deployment_id: int, delta: int):
+    """
+    Add delta to the unmet-dependency counter of every deployment that depends
+    on the given one. Called with -1 when a deployment reaches COMPLETED and
+    with +1 when it leaves COMPLETED.
+    """
+    dependent_ids = select(deployment_dependencies.c.dependent_id).where(
+        deployment_dependencies.c.dependency_id == deployment_id
+    )
+    db.query(Deployment).filter(Deployment.id.in_(dependent_ids)).update(
+        {Deployment.unmet_dependencies: Deployment.unmet_dependencies + delta, Deployment.version: Deployment.version + 1},
+        synchronize_session="fetch"
+    )
+
+
+def adjust_dependent_counters_for_many(db: Session, deployment_ids: List[int], delta: int):
+    """
+    Like adjust_dependent_counters for several deployments at once: each
+    dependent's counter moves by delta for every one of them it depends on.
+    """
+    dependent_ids = select(deployment_dependencies.c.dependent_id).where(
+        deployment_dependencies.c.dependency_id.in_(deployment_ids)
+    )
+    matching = (
+        select(func.count())
+        .select_from(deployment_dependencies)
+        .where(
+            deployment_dependencies.c.dependent_id == Deployment.id,
+            deployment_dependencies.c.dependency_id.in_(deployment_ids)
+        )
+        .scalar_subquery()
+    )
+    db.query(Deployment).filter(Deployment.id.in_(dependent_ids)).update(
+        {
+            Deployment.unmet_dependencies: Deployment.unmet_dependencies + delta * matching,
+            Deployment.version: Deployment.version + 1
+        },
+        synchronize_session=False
+    )
+
+
 # Helper function to validate dependencies
 def validate_deployment_dependencies(db: Session, deployment: DeploymentCreate, dependencies: List[Deployment]) -> List[str]:
     """
@@ -82,12 +380,7 @@ def create_deployment(db: Session, deployment: DeploymentCreate, user_id: int):
         return None
     
     # Get dependencies for validation
-    dependencies = []
-    if deployment.dependency_ids:
-        for dep_id in deployment.dependency_ids:
-            dependency = db.query(Deployment).filter(Deployment.id == dep_id).first()
-            if dependency:
-                dependencies.append(dependency)
+    dependencies = get_deployments_by_ids(db, deployment.dependency_ids)
     
     # Validate dependencies
     validation_errors = validate_deployment_dependencies(db, deployment, dependencies)
@@ -102,33 +395,184 @@ def create_deployment(db: Session, deployment: DeploymentCreate, user_id: int):
         required_ram=deployment.required_ram,
         required_cpu=deployment.required_cpu,
         required_gpu=deployment.required_gpu,
+        expected_runtime=deployment.expected_runtime,
         priority=map_priority_enum(deployment.priority),  # Convert the enum
         status=DeploymentStatus.PENDING,
         cluster_id=deployment.cluster_id,
-        user_id=user_id
+        user_id=user_id,
+        unmet_dependencies=count_unmet_dependencies(dependencies)
     )
     db.add(db_deployment)
     db.flush()  # Flush to get the deployment ID
     
     # Add dependencies
-    if deployment.dependency_ids:
-        for dep_id in deployment.dependency_ids:
-            # Check if the dependency exists
-            dependency = db.query(Deployment).filter(Deployment.id == dep_id).first()
-            if dependency:
-                db_deployment.dependencies.append(dependency)
+    for dependency in dependencies:
+        db_deployment.dependencies.append(dependency)
+    
+    event_log.record_transition(
+        db, db_deployment, None, DeploymentStatus.PENDING, TransitionActor.API, "submitted", db_deployment.created_at
+    )
+    transaction.commit(db)
+    transaction.refresh(db, db_deployment)
     
-    db.commit()
-    db.refresh(db_deployment)
+    transaction.publish_cluster_event(db, db_deployment.cluster_id, "deployment_created")
     
     return db_deployment
 
 
-def update_deployment(db: Session, deployment_id: int, deployment: DeploymentUpdate):
-    """Update a deployment."""
+def _batch_item_error(
+    db: Session,
+    item: DeploymentBatchItem,
+    org_ids: Set[int],
+    cluster_orgs: Dict[int, int],
+    dependencies: Dict[int, Deployment],
+    refs: Dict[str, Optional[DeploymentBatchItem]]
+) -> Optional[str]:
+    """
+    Check one item of a batch like a single submission. `refs` maps the refs
+    of the earlier items to the item, or to None if that item was rejected.
+    Returns why the item is rejected, or None if it is valid.
+    """
+    if item.cluster_id not in cluster_orgs:
+        return "Cluster not found"
+    if cluster_orgs[item.cluster_id] not in org_ids:
+        return "Not authorized to create a deployment for this cluster"
+    if item.ref is not None and item.ref in refs:
+        return f"Duplicate reference '{item.ref}'"
+    
+    for dep_id in item.dependency_ids:
+        if dep_id not in dependencies:
+            return f"Dependency deployment with ID {dep_id} not found"
+        if dependencies[dep_id].cluster_id != item.cluster_id:
+            return f"Dependency deployment with ID {dep_id} is not in the same cluster"
+    validation_errors = validate_deployment_dependencies(
+        db, item, [dependencies[dep_id] for dep_id in item.dependency_ids]
+    )
+    if validation_errors:
+        return validation_errors[0]
+    
+    for ref in item.dependency_refs:
+        if ref not in refs:
+            return f"Unknown reference '{ref}'; an item can only depend on items before it in the batch"
+        dependency = refs[ref]
+        if dependency is None:
+            return f"Dependency '{ref}' was rejected"
+        if dependency.cluster_id != item.cluster_id:
+            return f"Dependency '{ref}' is not in the same cluster"
+        # Batch items are always pending
+        if item.priority == DeploymentPriorityEnum.HIGH and dependency.priority != DeploymentPriorityEnum.HIGH:
+            return (
+                f"High priority deployments cannot depend on lower priority pending deployments. "
+                f"Dependency '{ref}' is {dependency.priority.name} priority and has status pending."
+            )
+    
+    return None
+
+
+def create_deployment_batch(db: Session, batch: DeploymentBatchCreate, user_id: int, org_ids: Set[int]) -> List[Dict]:
+    """
+    Create a batch of deployments in one transaction.
+    
+    Each item is validated like a single submission, but the clusters and
+    dependencies of the whole batch are fetched with one query each. Items
+    can depend on earlier items through their refs. Invalid items, and the
+    items depending on them, are rejected; the rest are created together.
+    Returns one result per item, in order.
+    """
+    items = batch.deployments
+    cluster_orgs = dict(
+        db.query(Cluster.id, Cluster.organization_id).filter(Cluster.id.in_({item.cluster_id for item in items}))
+    )
+    dependency_ids = {dep_id for item in items for dep_id in item.dependency_ids}
+    dependencies = {
+        row.id: row
+        for row in db.query(
+            Deployment.id, Deployment.name, Deployment.cluster_id, Deployment.status, Deployment.priority
+        ).filter(Deployment.id.in_(dependency_ids))
+    } if dependency_ids else {}
+    
+    results = []
+    refs = {}
+    accepted = []
+    for index, item in enumerate(items):
+        error = _batch_item_error(db, item, org_ids, cluster_orgs, dependencies, refs)
+        if item.ref is not None and item.ref not in refs:
+            refs[item.ref] = None if error else item
+        results.append({"index": index, "ref": item.ref, "id": None, "error": error})
+        if error is None:
+            accepted.append(index)
+    
+    if not accepted:
+        return results
+    
+    # Insert the accepted items in one statement, getting their IDs back in order
+    created_at = datetime.utcnow()
+    rows = []
+    for index in accepted:
+        item = items[index]
+        external = [dependencies[dep_id] for dep_id in set(item.dependency_ids)]
+        rows.append({
+            "name": item.name,
+            "docker_image": item.docker_image,
+            "required_ram": item.required_ram,
+            "required_cpu": item.required_cpu,
+            "required_gpu": item.required_gpu,
+            "expected_runtime": item.expected_runtime,
+            "priority": map_priority_enum(item.priority),
+            "status": DeploymentStatus.PENDING,
+            "cluster_id": item.cluster_id,
+            "user_id": user_id,
+            "created_at": created_at,
+            # Dependencies within the batch are pending, so none of them is met yet
+            "unmet_dependencies": count_unmet_dependencies(external) + len(set(item.dependency_refs))
+        })
+    ids = db.scalars(insert(Deployment).returning(Deployment.id, sort_by_parameter_order=True), rows).all()
+    for index, deployment_id in zip(accepted, ids):
+        results[index]["id"] = deployment_id
+    
+    # Then every dependency edge in one more
+    ref_ids = {item.ref: results[index]["id"] for index, item in enumerate(items) if refs.get(item.ref) is item}
+    edges = [
+        {"dependent_id": results[index]["id"], "dependency_id": dependency_id}
+        for index in accepted
+        for dependency_id in (
+            set(items[index].dependency_ids) | {ref_ids[ref] for ref in items[index].dependency_refs}
+        )
+    ]
+    if edges:
+        db.execute(insert(deployment_dependencies), edges)
+    
+    event_log.record_transitions(
+        db,
+        [(deployment_id, row["cluster_id"], row["priority"]) for deployment_id, row in zip(ids, rows)],
+        None, DeploymentStatus.PENDING, TransitionActor.API, "submitted", created_at
+    )
+    transaction.commit(db)
+    
+    for cluster_id in {items[index].cluster_id for index in accepted}:
+        transaction.publish_cluster_event(db, cluster_id, "deployment_created")
+    
+    return results
+
+
+@retry_on_conflict
+@transaction.transactional
+def update_deployment(
+    db: Session,
+    deployment_id: int,
+    deployment: DeploymentUpdate,
+    expected_version: Optional[int] = None
+):
+    """
+    Update a deployment, if it is still at `expected_version` (when given).
+    The write only succeeds against the version read, so a concurrent
+    update or scheduler cycle makes this one start over instead of being
+    overwritten by it. Resource changes commit together with the update.
+    """
     db_deployment = get_deployment(db, deployment_id)
     if not db_deployment:
         return None
+    check_version(db_deployment, expected_version)
     
     # Store the original status and resource requirements
     original_status = db_deployment.status
@@ -143,14 +587,14 @@ def update_deployment(db: Session, deployment_id: int, deployment: DeploymentUpd
     if 'priority' in update_data and update_data['priority'] is not None:
         update_data['priority'] = map_priority_enum(update_data['priority'])
     
+    # Handle status enum conversion
+    if 'status' in update_data and update_data['status'] is not None:
+        update_data['status'] = DeploymentStatus(update_data['status'].value)
+
     # Handle dependencies if provided
     if 'dependency_ids' in update_data and update_data['dependency_ids'] is not None:
         # Get dependencies for validation
-        dependencies = []
-        for dep_id in update_data['dependency_ids']:
-            dependency = db.query(Deployment).filter(Deployment.id == dep_id).first()
-            if dependency:
-                dependencies.append(dependency)
+        dependencies = get_deployments_by_ids(db, update_data['dependency_ids'])
         
         # Create a temporary DeploymentCreate object for validation
         temp_deployment = DeploymentCreate(
@@ -176,6 +620,7 @@ def update_deployment(db: Session, deployment_id: int, deployment: DeploymentUpd
         # Add new dependencies
         for dependency in dependencies:
             db_deployment.dependencies.append(dependency)
+        db_deployment.unmet_dependencies = count_unmet_dependencies(dependencies)
         
         # Remove from update_data to avoid setAttribute error
         del update_data['dependency_ids']
@@ -183,29 +628,40 @@ def update_deployment(db: Session, deployment_id: int, deployment: DeploymentUpd
     for key, value in update_data.items():
         setattr(db_deployment, key, value)
     
-    # Handle resource allocation/release if status changed
+    if original_status != DeploymentStatus.RUNNING and db_deployment.status == DeploymentStatus.RUNNING:
+        # Allocate resources when a deployment is started. Group members
+        # only ever start together, through start_deployment_group. The
+        # allocation commits below, with the status change and its event.
+        if db_deployment.group_id is not None or not cluster_service.reserve_deployment_resources(
+            db, db_deployment.cluster_id, [db_deployment]
+        ):
+            # If resources can't be allocated, revert status to original
+            db_deployment.status = original_status
+    
+    # Handle the rest of a status change once it is settled, so a start that
+    # was refused leaves the dependents' counters and finished_at alone
     if original_status != db_deployment.status:
+        db_deployment.finished_at = datetime.utcnow() if db_deployment.status in TERMINAL_STATUSES else None
+        
+        if db_deployment.status == DeploymentStatus.COMPLETED:
+            adjust_dependent_counters(db, db_deployment.id, -1)
+        elif original_status == DeploymentStatus.COMPLETED:
+            adjust_dependent_counters(db, db_deployment.id, 1)
+        
+        event_log.record_transition(
+            db, db_deployment, original_status, db_deployment.status, TransitionActor.API, "updated"
+        )
+        
         if original_status == DeploymentStatus.RUNNING and db_deployment.status != DeploymentStatus.RUNNING:
-            # Release resources when a deployment is stopped
+            # Release resources when a deployment is stopped; this commits the status change and its event
             cluster_service.release_cluster_resources(
                 db, 
                 db_deployment.cluster_id, 
                 original_ram, 
                 original_cpu, 
-                original_gpu
+                original_gpu,
+                deployment_id=db_deployment.id
             )
-        
-        elif original_status != DeploymentStatus.RUNNING and db_deployment.status == DeploymentStatus.RUNNING:
-            # Allocate resources when a deployment is started
-            if not cluster_service.allocate_cluster_resources(
-                db, 
-                db_deployment.cluster_id, 
-                db_deployment.required_ram, 
-                db_deployment.required_cpu, 
-                db_deployment.required_gpu
-            ):
-                # If resources can't be allocated, revert status to original
-                db_deployment.status = original_status
     
     # If just the resource requirements changed and deployment is running, 
     # we would need to release old resources and allocate new ones
@@ -220,7 +676,8 @@ def update_deployment(db: Session, deployment_id: int, deployment: DeploymentUpd
             db_deployment.cluster_id,
             original_ram,
             original_cpu,
-            original_gpu
+            original_gpu,
+            deployment_id=db_deployment.id
         )
         
         # Try to allocate new resources
@@ -229,7 +686,8 @@ def update_deployment(db: Session, deployment_id: int, deployment: DeploymentUpd
             db_deployment.cluster_id,
             db_deployment.required_ram,
             db_deployment.required_cpu,
-            db_deployment.required_gpu
+            db_deployment.required_gpu,
+            deployment_id=db_deployment.id
         ):
             # If resources can't be allocated, revert to original resources
             db_deployment.required_ram = original_ram
@@ -242,92 +700,137 @@ def update_deployment(db: Session, deployment_id: int, deployment: DeploymentUpd
                 db_deployment.cluster_id,
                 original_ram,
                 original_cpu,
-                original_gpu
+                original_gpu,
+                deployment_id=db_deployment.id
             )
     
     # Update started_at if deployment is now running
     if original_status != DeploymentStatus.RUNNING and db_deployment.status == DeploymentStatus.RUNNING:
         db_deployment.started_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(db_deployment)
+    transaction.commit(db)
+    transaction.refresh(db, db_deployment)
+    
+    transaction.publish_cluster_event(db, db_deployment.cluster_id, "deployment_updated")
+    
     return db_deployment
 
 
+@retry_on_conflict
 def delete_deployment(db: Session, deployment_id: int):
-    """Delete a deployment."""
+    """
+    Delete a deployment. Its resources are released in the same
+    transaction as the delete, which only succeeds against the version
+    read, so a deployment the scheduler meanwhile stopped or started is
+    released according to its current state.
+    """
     db_deployment = get_deployment(db, deployment_id)
     if not db_deployment:
         return False
     
     # Release resources if the deployment was running
     if db_deployment.status == DeploymentStatus.RUNNING:
-        cluster_service.release_cluster_resources(
-            db,
-            db_deployment.cluster_id,
-            db_deployment.required_ram,
-            db_deployment.required_cpu,
-            db_deployment.required_gpu
-        )
+        cluster_service.release_deployment_resources(db, [db_deployment])
+    
+    # Dependents lose this dependency, so it no longer counts as unmet
+    if db_deployment.status != DeploymentStatus.COMPLETED:
+        adjust_dependent_counters(db, db_deployment.id, -1)
     
+    cluster_id = db_deployment.cluster_id
     db.delete(db_deployment)
-    db.commit()
+    transaction.commit(db)
+    
+    transaction.publish_cluster_event(db, cluster_id, "deployment_deleted")
+    
     return True
 
 
-def start_deployment(db: Session, deployment_id: int):
-    """Start a deployment (allocate resources and change status)."""
+def start_deployment(
+    db: Session,
+    deployment_id: int,
+    actor: TransitionActor = TransitionActor.API,
+    reason: str = "started"
+):
+    """
+    Start a deployment (allocate resources and change status). `actor` and
+    `reason` are recorded in its event log.
+    """
     db_deployment = get_deployment(db, deployment_id)
     if not db_deployment or db_deployment.status != DeploymentStatus.PENDING:
         return None
     
-    # Check dependencies
-    for dependency in db_deployment.dependencies:
-        # If any dependency is not in COMPLETED status, can't start this deployment
-        if dependency.status != DeploymentStatus.COMPLETED:
-            return None
+    # If any dependency is not in COMPLETED status, can't start this deployment
+    if db_deployment.unmet_dependencies > 0:
+        return None
     
-    # Try to allocate resources
-    if cluster_service.allocate_cluster_resources(
-        db,
-        db_deployment.cluster_id,
-        db_deployment.required_ram,
-        db_deployment.required_cpu,
-        db_deployment.required_gpu
-    ):
-        # If successful, update status and started_at time
-        db_deployment.status = DeploymentStatus.RUNNING
-        db_deployment.started_at = datetime.utcnow()
-        db.commit()
-        db.refresh(db_deployment)
+    # A group member can only start together with the rest of its group
+    if db_deployment.group_id is not None:
+        if start_deployment_group(db, db_deployment.group_id, actor, reason) is None:
+            return None
+        transaction.refresh(db, db_deployment)
         return db_deployment
     
-    # If resources can't be allocated, leave in pending state
-    return None
+    # Allocate resources first; if they can't be allocated, nothing has been
+    # written and the deployment stays pending
+    if not cluster_service.reserve_deployment_resources(db, db_deployment.cluster_id, [db_deployment]):
+        transaction.abort(db)
+        return None
+    
+    # Then claim the deployment, so concurrent starts can't both run it
+    claimed = db.query(Deployment).filter(
+        Deployment.id == deployment_id,
+        Deployment.status == DeploymentStatus.PENDING,
+        Deployment.unmet_dependencies == 0
+    ).update({
+        Deployment.status: DeploymentStatus.RUNNING,
+        Deployment.started_at: datetime.utcnow(),
+        Deployment.version: Deployment.version + 1
+    }, synchronize_session=False)
+    if not claimed:
+        def undo():
+            db.flush()
+            cluster_service.release_deployment_resources(db, [db_deployment])
+        transaction.abort(db, undo)
+        return None
+    event_log.record_transition(db, db_deployment, DeploymentStatus.PENDING, DeploymentStatus.RUNNING, actor, reason)
+    
+    transaction.commit(db)
+    transaction.refresh(db, db_deployment)
+    return db_deployment
 
 
+@retry_on_conflict
+@transaction.transactional
 def stop_deployment(db: Session, deployment_id: int, status: DeploymentStatus = DeploymentStatus.COMPLETED):
-    """Stop a deployment (release resources and change status)."""
+    """
+    Stop a deployment (release resources and change status) and start the
+    dependents that made ready, in one transaction. The stop only succeeds
+    against the version read: if the scheduler preempted the deployment
+    meanwhile, its resources aren't released twice.
+    """
     db_deployment = get_deployment(db, deployment_id)
     if not db_deployment or db_deployment.status != DeploymentStatus.RUNNING:
         return None
     
     # Release resources
-    cluster_service.release_cluster_resources(
-        db,
-        db_deployment.cluster_id,
-        db_deployment.required_ram,
-        db_deployment.required_cpu,
-        db_deployment.required_gpu
-    )
+    cluster_service.release_deployment_resources(db, [db_deployment])
     
     # Update status
+    event_log.record_transition(db, db_deployment, DeploymentStatus.RUNNING, status, TransitionActor.API, "stopped")
     db_deployment.status = status
-    db.commit()
-    db.refresh(db_deployment)
+    db_deployment.finished_at = datetime.utcnow()
+    if status == DeploymentStatus.COMPLETED:
+        adjust_dependent_counters(db, db_deployment.id, -1)
+    cluster_id = db_deployment.cluster_id
+    transaction.commit(db)
+    transaction.refresh(db, db_deployment)
     
     # Check if any dependent deployments can now start
-    check_dependent_deployments(db, db_deployment.id)
+    if status == DeploymentStatus.COMPLETED:
+        check_dependent_deployments(db, deployment_id)
+    
+    # Let the scheduler use the released capacity
+    transaction.publish_cluster_event(db, cluster_id, "deployment_stopped")
     
     return db_deployment
 
@@ -338,28 +841,424 @@ def check_dependent_deployments(db: Session, completed_deployment_id: int):
     if not db_deployment or db_deployment.status != DeploymentStatus.COMPLETED:
         return
     
-    # Get all deployments that depend on this one
-    for dependent in db_deployment.dependents:
-        if dependent.status == DeploymentStatus.PENDING:
-            # Check if all dependencies are completed
-            all_dependencies_completed = True
-            for dependency in dependent.dependencies:
-                if dependency.status != DeploymentStatus.COMPLETED:
-                    all_dependencies_completed = False
-                    break
-            
-            # If all dependencies are completed, try to start this deployment
-            if all_dependencies_completed:
-                start_deployment(db, dependent.id)
+    # Dependents whose last unmet dependency was this one
+    ready_dependents = db.query(Deployment).filter(
+        Deployment.id.in_(select(deployment_dependencies.c.dependent_id).where(
+            deployment_dependencies.c.dependency_id == completed_deployment_id
+        )),
+        Deployment.status == DeploymentStatus.PENDING,
+        Deployment.unmet_dependencies == 0
+    ).all()
+    
+    # Try to start them, highest priority first
+    ready_dependents.sort(key=lambda d: (-d.priority.value, d.created_at or datetime.min))
+    for dependent in ready_dependents:
+        start_deployment(db, dependent.id, TransitionActor.SCHEDULER, "dependencies_met")
 
 
+@retry_on_conflict
 def cancel_deployment(db: Session, deployment_id: int):
     """Cancel a pending deployment."""
     db_deployment = get_deployment(db, deployment_id)
     if not db_deployment or db_deployment.status != DeploymentStatus.PENDING:
         return None
     
+    # The rest of a group can't run without this member, so cancel it too
+    if db_deployment.group_id is not None:
+        cancel_deployment_group(db, db_deployment.group_id)
+        transaction.refresh(db, db_deployment)
+        return db_deployment
+    
+    event_log.record_transition(
+        db, db_deployment, DeploymentStatus.PENDING, DeploymentStatus.CANCELLED, TransitionActor.API, "cancelled"
+    )
     db_deployment.status = DeploymentStatus.CANCELLED
-    db.commit()
-    db.refresh(db_deployment)
-    return db_deployment 
\ No newline at end of file
+    db_deployment.finished_at = datetime.utcnow()
+    transaction.commit(db)
+    transaction.refresh(db, db_deployment)
+    
+    transaction.publish_cluster_event(db, db_deployment.cluster_id, "deployment_cancelled")
+    
+    return db_deployment
+
+
+def get_deployment_access(db: Session, deployment_ids: List[int]):
+    """Get the ID, owner and cluster organization of each of several deployments."""
+    return db.query(Deployment.id, Deployment.user_id, Cluster.organization_id).outerjoin(
+        Cluster, Cluster.id == Deployment.cluster_id
+    ).filter(Deployment.id.in_(deployment_ids)).all()
+
+
+def get_deployment_statuses(db: Session, deployment_ids: List[int]) -> Dict[int, DeploymentStatus]:
+    """Get the status of each of several deployments."""
+    return dict(db.query(Deployment.id, Deployment.status).filter(Deployment.id.in_(deployment_ids)))
+
+
+def _transition(db: Session, deployment_ids: List[int], criteria: List, values: Dict) -> Set[int]:
+    """Apply `values` to the deployments among `deployment_ids` that match `criteria`, returning their IDs."""
+    statement = (
+        update(Deployment)
+        .where(Deployment.id.in_(deployment_ids), *criteria)
+        .values({**values, Deployment.version: Deployment.version + 1})
+        .returning(Deployment.id)
+        .execution_options(synchronize_session=False)
+    )
+    return set(db.scalars(statement))
+
+
+@transaction.transactional
+def start_deployments(
+    db: Session,
+    deployment_ids: List[int],
+    actor: TransitionActor = TransitionActor.API,
+    reason: str = "started"
+) -> Dict[int, Optional[str]]:
+    """
+    Start many deployments at once.
+    
+    The affected clusters are locked once, the deployments that fit are
+    chosen per cluster in priority order, claimed with one update and
+    allocated with one update per cluster. Group members start together
+    with their groups, as with start_deployment, and all of it is committed
+    together. Returns, for each deployment, why it could not be started, or
+    None if it was.
+    """
+    errors = {deployment_id: "Deployment not found" for deployment_id in deployment_ids}
+    candidates = db.query(Deployment).filter(Deployment.id.in_(deployment_ids)).all()
+    clusters = cluster_service.lock_clusters(db, {d.cluster_id for d in candidates})
+    
+    ready = []
+    group_members = {}
+    for d in candidates:
+        if d.status != DeploymentStatus.PENDING:
+            errors[d.id] = "Deployment is not pending"
+        elif d.unmet_dependencies > 0:
+            errors[d.id] = "Deployment has unmet dependencies"
+        elif d.group_id is not None:
+            group_members.setdefault(d.group_id, []).append(d.id)
+        else:
+            ready.append(d)
+    
+    # Pick what fits in each cluster's free capacity, highest priority first
+    free = {
+        cluster.id: [
+            cluster.total_ram_mib - cluster.allocated_ram_mib,
+            cluster.total_cpu_millicores - cluster.allocated_cpu_millicores,
+            cluster.total_gpu_milli - cluster.allocated_gpu_milli
+        ]
+        for cluster in clusters.values()
+    }
+    chosen = {}
+    ready.sort(key=lambda d: (-d.priority.value, d.created_at or datetime.min))
+    for d in ready:
+        units = to_units(d.required_ram, d.required_cpu, d.required_gpu)
+        room = free.get(d.cluster_id)
+        if room is None or any(amount > left for amount, left in zip(units, room)):
+            errors[d.id] = "Insufficient resources"
+            continue
+        for i, amount in enumerate(units):
+            room[i] -= amount
+        chosen.setdefault(d.cluster_id, []).append(d)
+    
+    # Claim them all, so concurrent starts can't allocate for any of them
+    claimed = _transition(
+        db,
+        [d.id for members in chosen.values() for d in members],
+        [Deployment.status == DeploymentStatus.PENDING, Deployment.unmet_dependencies == 0],
+        {Deployment.status: DeploymentStatus.RUNNING, Deployment.started_at: datetime.utcnow()}
+    )
+    
+    started_clusters = set()
+    for cluster_id, members in chosen.items():
+        for d in members:
+            errors[d.id] = None if d.id in claimed else "Deployment is not pending"
+        members = [d for d in members if d.id in claimed]
+        if not members:
+            continue
+        if cluster_service.reserve_deployment_resources(db, cluster_id, members):
+            started_clusters.add(cluster_id)
+            event_log.record_transitions(
+                db, [(d.id, d.cluster_id, d.priority) for d in members],
+                DeploymentStatus.PENDING, DeploymentStatus.RUNNING, actor, reason
+            )
+            continue
+        
+        # Something else took the capacity meanwhile; put this cluster's claims back
+        db.query(Deployment).filter(Deployment.id.in_([d.id for d in members])).update({
+            Deployment.status: DeploymentStatus.PENDING,
+            Deployment.started_at: None,
+            Deployment.version: Deployment.version + 1
+        }, synchronize_session=False)
+        for d in members:
+            errors[d.id] = "Insufficient resources"
+    
+    transaction.commit(db)
+    
+    for group_id, member_ids in group_members.items():
+        started_group = start_deployment_group(db, group_id, actor, reason)
+        for deployment_id in member_ids:
+            errors[deployment_id] = None if started_group else "Deployment group could not be started"
+    
+    for cluster_id in started_clusters:
+        transaction.publish_cluster_event(db, cluster_id, "deployment_started")
+    
+    return errors
+
+
+@transaction.transactional
+def stop_deployments(
+    db: Session,
+    deployment_ids: List[int],
+    status: DeploymentStatus = DeploymentStatus.COMPLETED
+) -> Dict[int, Optional[str]]:
+    """
+    Stop many running deployments at once.
+    
+    The affected clusters are locked once, the deployments change status in
+    one update, their resources are released with one update per cluster,
+    and the dependents of the whole set that became ready are started in
+    one pass. All of it is committed together. Returns, for each
+    deployment, why it could not be stopped, or None if it was.
+    """
+    errors = {deployment_id: "Deployment not found" for deployment_id in deployment_ids}
+    candidates = db.query(Deployment).filter(Deployment.id.in_(deployment_ids)).all()
+    cluster_service.lock_clusters(db, {d.cluster_id for d in candidates if d.status == DeploymentStatus.RUNNING})
+    
+    stopped_ids = _transition(db, deployment_ids, [Deployment.status == DeploymentStatus.RUNNING], {
+        Deployment.status: status, Deployment.finished_at: datetime.utcnow()
+    })
+    for d in candidates:
+        errors[d.id] = None if d.id in stopped_ids else "Deployment is not running"
+    if not stopped_ids:
+        transaction.abort(db)
+        return errors
+    
+    stopped = [d for d in candidates if d.id in stopped_ids]
+    stopped_clusters = {d.cluster_id for d in stopped}
+    cluster_service.release_deployment_resources(db, stopped)
+    event_log.record_transitions(
+        db, [(d.id, d.cluster_id, d.priority) for d in stopped],
+        DeploymentStatus.RUNNING, status, TransitionActor.API, "stopped"
+    )
+    if status == DeploymentStatus.COMPLETED:
+        adjust_dependent_counters_for_many(db, list(stopped_ids), -1)
+    transaction.commit(db)
+    
+    # Start the dependents this made ready, all in one go
+    if status == DeploymentStatus.COMPLETED:
+        ready_ids = db.scalars(
+            select(Deployment.id).where(
+                Deployment.id.in_(select(deployment_dependencies.c.dependent_id).where(
+                    deployment_dependencies.c.dependency_id.in_(stopped_ids)
+                )),
+                Deployment.status == DeploymentStatus.PENDING,
+                Deployment.unmet_dependencies == 0
+            )
+        ).all()
+        if ready_ids:
+            start_deployments(db, ready_ids, TransitionActor.SCHEDULER, "dependencies_met")
+    
+    for cluster_id in stopped_clusters:
+        transaction.publish_cluster_event(db, cluster_id, "deployment_stopped")
+    
+    return errors
+
+
+@transaction.transactional
+def cancel_deployments(db: Session, deployment_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Cancel many pending deployments at once, with one update. Group members
+    cancel their whole group, as with cancel_deployment, in the same
+    transaction. Returns, for each deployment, why it could not be
+    cancelled, or None if it was.
+    """
+    errors = {deployment_id: "Deployment not found" for deployment_id in deployment_ids}
+    candidates = db.query(Deployment).filter(Deployment.id.in_(deployment_ids)).all()
+    
+    cancelled_ids = _transition(
+        db,
+        deployment_ids,
+        [Deployment.status == DeploymentStatus.PENDING, Deployment.group_id.is_(None)],
+        {Deployment.status: DeploymentStatus.CANCELLED, Deployment.finished_at: datetime.utcnow()}
+    )
+    
+    group_ids = set()
+    cancelled_clusters = set()
+    for d in candidates:
+        if d.id in cancelled_ids:
+            errors[d.id] = None
+            cancelled_clusters.add(d.cluster_id)
+        elif d.group_id is not None and d.status == DeploymentStatus.PENDING:
+            group_ids.add(d.group_id)
+            errors[d.id] = None
+        else:
+            errors[d.id] = "Deployment is not pending"
+    event_log.record_transitions(
+        db, [(d.id, d.cluster_id, d.priority) for d in candidates if d.id in cancelled_ids],
+        DeploymentStatus.PENDING, DeploymentStatus.CANCELLED, TransitionActor.API, "cancelled"
+    )
+    transaction.commit(db)
+    
+    for group_id in group_ids:
+        cancel_deployment_group(db, group_id)
+    
+    for cluster_id in cancelled_clusters:
+        transaction.publish_cluster_event(db, cluster_id, "deployment_cancelled")
+    
+    return errors
+
+
+def get_deployment_group(db: Session, group_id: int):
+    """Get a deployment group by ID, with its members and their dependency links."""
+    members = selectinload(DeploymentGroup.deployments)
+    return db.query(DeploymentGroup).options(
+        members.selectinload(Deployment.dependencies),
+        members.selectinload(Deployment.dependents)
+    ).filter(DeploymentGroup.id == group_id).first()
+
+
+def create_deployment_group(db: Session, group: DeploymentGroupCreate, user_id: int):
+    """
+    Create a deployment group (gang) and all of its member deployments in one
+    transaction. Members share the group's priority and dependencies, and the
+    scheduler only ever starts or preempts them all together.
+    """
+    # Check if the cluster exists
+    db_cluster = db.query(Cluster).filter(Cluster.id == group.cluster_id).first()
+    if not db_cluster:
+        return None
+    
+    # A group that can never fit would stay pending forever
+    if (sum(d.required_ram for d in group.deployments) > db_cluster.total_ram or
+        sum(d.required_cpu for d in group.deployments) > db_cluster.total_cpu or
+        sum(d.required_gpu for d in group.deployments) > db_cluster.total_gpu):
+        raise HTTPException(status_code=400, detail="Deployment group requires more resources than the cluster has")
+    
+    # Get dependencies for validation
+    dependencies = []
+    for dep_id in group.dependency_ids:
+        dependency = db.query(Deployment).filter(Deployment.id == dep_id).first()
+        if dependency:
+            dependencies.append(dependency)
+    
+    # Validate dependencies
+    validation_errors = validate_deployment_dependencies(db, group, dependencies)
+    if validation_errors:
+        raise HTTPException(status_code=400, detail=validation_errors[0])
+    
+    created_at = datetime.utcnow()
+    db_group = DeploymentGroup(
+        name=group.name,
+        cluster_id=group.cluster_id,
+        user_id=user_id,
+        created_at=created_at
+    )
+    db.add(db_group)
+    
+    unmet_dependencies = count_unmet_dependencies(dependencies)
+    for member in group.deployments:
+        db_deployment = Deployment(
+            name=member.name,
+            docker_image=member.docker_image,
+            required_ram=member.required_ram,
+            required_cpu=member.required_cpu,
+            required_gpu=member.required_gpu,
+            expected_runtime=member.expected_runtime,
+            priority=map_priority_enum(group.priority),
+            status=DeploymentStatus.PENDING,
+            cluster_id=group.cluster_id,
+            user_id=user_id,
+            created_at=created_at,
+            unmet_dependencies=unmet_dependencies
+        )
+        db_deployment.group = db_group
+        db_deployment.dependencies.extend(dependencies)
+        db.add(db_deployment)
+    
+    db.flush()
+    event_log.record_transitions(
+        db, [(d.id, d.cluster_id, d.priority) for d in db_group.deployments],
+        None, DeploymentStatus.PENDING, TransitionActor.API, "submitted", created_at
+    )
+    transaction.commit(db)
+    db_group = get_deployment_group(db, db_group.id)
+    
+    transaction.publish_cluster_event(db, db_group.cluster_id, "deployment_created")
+    
+    return db_group
+
+
+def start_deployment_group(
+    db: Session,
+    group_id: int,
+    actor: TransitionActor = TransitionActor.API,
+    reason: str = "started"
+):
+    """
+    Start every pending member of a deployment group, or none of them.
+    Fails if any pending member still has unmet dependencies or if the
+    cluster can't fit the whole group at once.
+    """
+    db_group = get_deployment_group(db, group_id)
+    if not db_group:
+        return None
+    
+    members = [d for d in db_group.deployments if d.status == DeploymentStatus.PENDING]
+    if not members or any(d.unmet_dependencies > 0 for d in members):
+        return None
+    
+    # Allocate for the whole group at once; if it doesn't fit, nothing has been written
+    if not cluster_service.reserve_deployment_resources(db, db_group.cluster_id, members):
+        transaction.abort(db)
+        return None
+    
+    # Then claim every member, so a concurrent start can't run any of them
+    claimed = _transition(
+        db,
+        [d.id for d in members],
+        [Deployment.status == DeploymentStatus.PENDING, Deployment.unmet_dependencies == 0],
+        {Deployment.status: DeploymentStatus.RUNNING, Deployment.started_at: datetime.utcnow()}
+    )
+    if len(claimed) != len(members):
+        def undo():
+            _transition(db, list(claimed), [], {Deployment.status: DeploymentStatus.PENDING, Deployment.started_at: None})
+            db.flush()
+            cluster_service.release_deployment_resources(db, members)
+        transaction.abort(db, undo)
+        return None
+    event_log.record_transitions(
+        db, [(d.id, d.cluster_id, d.priority) for d in members],
+        DeploymentStatus.PENDING, DeploymentStatus.RUNNING, actor, reason
+    )
+    
+    transaction.commit(db)
+    # Inside a unit of work the caller reloads the group if it needs it
+    return db_group if transaction.in_unit_of_work(db) else get_deployment_group(db, group_id)
+
+
+@retry_on_conflict
+def cancel_deployment_group(db: Session, group_id: int):
+    """Cancel every pending member of a deployment group."""
+    db_group = get_deployment_group(db, group_id)
+    if not db_group:
+        return None
+    
+    members = [d for d in db_group.deployments if d.status == DeploymentStatus.PENDING]
+    if not members:
+        return None
+    
+    finished_at = datetime.utcnow()
+    event_log.record_transitions(
+        db, [(d.id, d.cluster_id, d.priority) for d in members],
+        DeploymentStatus.PENDING, DeploymentStatus.CANCELLED, TransitionActor.API, "cancelled", finished_at
+    )
+    for member in members:
+        member.status = DeploymentStatus.CANCELLED
+        member.finished_at = finished_at
+    cluster_id = db_group.cluster_id
+    transaction.commit(db)
+    
+    transaction.publish_cluster_event(db, cluster_id, "deployment_cancelled")
+    
+    # Inside a unit of work the caller reloads the group if it needs it
+    return db_group if transaction.in_unit_of_work(db) else get_deployment_group(db, group_id)
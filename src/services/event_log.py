@@ -0,0 +1,114 @@
+from collections import defaultdict
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session, aliased
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+
+from src.models.models import Cluster, Deployment, DeploymentEvent, DeploymentPriority, DeploymentStatus, TransitionActor
+
+# Percentiles reported by get_wait_time_percentiles
+WAIT_TIME_PERCENTILES = (50, 90, 99)
+
+
+def record_transitions(
+    db: Session,
+    deployments: Iterable[Tuple[int, Optional[int], Optional[DeploymentPriority]]],
+    from_status: Optional[DeploymentStatus],
+    to_status: DeploymentStatus,
+    actor: TransitionActor,
+    reason: str,
+    at: Optional[datetime] = None
+):
+    """
+    Append one event per (deployment ID, cluster ID, priority) for its move
+    from `from_status` to `to_status`, with a single INSERT. Nothing is
+    committed: the events go in with the caller's transaction, so they are
+    written if and only if the state change is.
+    """
+    at = at or datetime.utcnow()
+    rows = [
+        {
+            "deployment_id": deployment_id,
+            "cluster_id": cluster_id,
+            "priority": priority,
+            "from_status": from_status,
+            "to_status": to_status,
+            "actor": actor,
+            "reason": reason,
+            "at": at
+        }
+        for deployment_id, cluster_id, priority in deployments
+    ]
+    if rows:
+        db.execute(insert(DeploymentEvent), rows)
+
+
+def record_transition(
+    db: Session,
+    deployment: Deployment,
+    from_status: Optional[DeploymentStatus],
+    to_status: DeploymentStatus,
+    actor: TransitionActor,
+    reason: str,
+    at: Optional[datetime] = None
+):
+    """Append the event for one deployment's transition, in the caller's transaction."""
+    record_transitions(
+        db, [(deployment.id, deployment.cluster_id, deployment.priority)], from_status, to_status, actor, reason, at
+    )
+
+
+def get_deployment_events(db: Session, deployment_id: int) -> List[DeploymentEvent]:
+    """Get a deployment's events, oldest first."""
+    statement = select(DeploymentEvent).where(DeploymentEvent.deployment_id == deployment_id)
+    return db.scalars(statement.order_by(DeploymentEvent.id)).all()
+
+
+def _percentile(values: List[float], percentile: int) -> float:
+    """Nearest-rank percentile of sorted `values`."""
+    return values[max(0, -(-percentile * len(values) // 100) - 1)]
+
+
+def get_wait_time_percentiles(
+    db: Session,
+    organization_ids: Set[int],
+    since: datetime,
+    until: datetime,
+    cluster_id: Optional[int] = None
+) -> List[Dict]:
+    """
+    Queue-wait percentiles per priority, in seconds, for the deployments
+    that started between `since` and `until` on the clusters of
+    `organization_ids` (or on `cluster_id`). A deployment's wait is the time
+    from when it last became pending until it started.
+    """
+    queued = aliased(DeploymentEvent)
+    queued_at = select(func.max(queued.at)).where(
+        queued.deployment_id == DeploymentEvent.deployment_id,
+        queued.to_status == DeploymentStatus.PENDING,
+        queued.id < DeploymentEvent.id
+    ).scalar_subquery()
+    statement = select(DeploymentEvent.priority, DeploymentEvent.at, queued_at.label("queued_at")).where(
+        DeploymentEvent.to_status == DeploymentStatus.RUNNING,
+        DeploymentEvent.at >= since,
+        DeploymentEvent.at < until,
+        DeploymentEvent.cluster_id.in_(select(Cluster.id).where(Cluster.organization_id.in_(organization_ids)))
+    )
+    if cluster_id is not None:
+        statement = statement.where(DeploymentEvent.cluster_id == cluster_id)
+    
+    waits = defaultdict(list)
+    for row in db.execute(statement):
+        # Deployments submitted before the log existed have no pending event
+        if row.queued_at is not None and row.priority is not None:
+            waits[row.priority].append((row.at - row.queued_at).total_seconds())
+    
+    stats = []
+    for priority in sorted(waits, key=lambda p: p.value, reverse=True):
+        values = sorted(waits[priority])
+        stats.append({
+            "priority": priority.value,
+            "count": len(values),
+            **{f"p{percentile}": _percentile(values, percentile) for percentile in WAIT_TIME_PERCENTILES}
+        })
+    return stats
@@ -0,0 +1,171 @@
+from sqlalchemy import delete, exists, func, insert, literal, or_, select, text
+from sqlalchemy.orm import Session, aliased
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+
+from src.models.models import (
+    Deployment, DeploymentHistory, DeploymentStatus, TERMINAL_ONLY, TERMINAL_STATUSES, deployment_dependencies,
+    deployment_history_dependencies
+)
+from src.models.schemas import DeploymentStatusEnum
+
+# The columns a deployment keeps when it is archived
+ARCHIVED_COLUMNS = (
+    "id", "name", "docker_image", "status", "priority", "required_ram", "required_cpu", "required_gpu",
+    "expected_runtime", "cluster_id", "user_id", "group_id", "created_at", "started_at"
+)
+
+
+def _archivable_ids(db: Session, finished_before: datetime, limit: int) -> List[int]:
+    """
+    Pick up to `limit` deployments that finished before `finished_before`
+    and that nothing unfinished depends on, locking them. Rows other
+    compaction jobs have locked are skipped.
+    """
+    dependent = aliased(Deployment)
+    live_dependents = exists().where(
+        deployment_dependencies.c.dependency_id == Deployment.id,
+        dependent.id == deployment_dependencies.c.dependent_id,
+        dependent.status.notin_(TERMINAL_STATUSES)
+    )
+    return db.scalars(
+        select(Deployment.id)
+        .where(TERMINAL_ONLY, Deployment.finished_at < finished_before, ~live_dependents)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=Deployment)
+    ).all()
+
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def ensure_history_partitions(db: Session, first: datetime, last: datetime):
+    """
+    Create the monthly partitions of deployment_history covering `first`
+    to `last`, if they don't exist yet. Only PostgreSQL partitions the table.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    month = _month_start(first)
+    while month <= last:
+        next_month = _next_month(month)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS deployment_history_{month:%Y_%m} PARTITION OF deployment_history "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        ))
+        month = next_month
+
+
+def archive_finished_deployments(db: Session, finished_before: datetime, batch_size: int = 1000) -> int:
+    """
+    Move one batch of deployments that finished before `finished_before`
+    into deployment_history, in one transaction.
+    
+    The rows are copied and deleted with one statement each, and every
+    dependency edge touching them moves to deployment_history_dependencies.
+    A finished deployment that something unfinished still depends on stays
+    put, so the live dependency graph is never cut. Returns the number of
+    deployments archived.
+    """
+    deployment_ids = _archivable_ids(db, finished_before, batch_size)
+    if not deployment_ids:
+        db.rollback()
+        return 0
+    
+    first, last = db.execute(
+        select(func.min(Deployment.finished_at), func.max(Deployment.finished_at))
+        .where(Deployment.id.in_(deployment_ids))
+    ).one()
+    ensure_history_partitions(db, first, last)
+    
+    db.execute(
+        insert(DeploymentHistory).from_select(
+            [*ARCHIVED_COLUMNS, "finished_at", "archived_at"],
+            select(
+                *(getattr(Deployment, column) for column in (*ARCHIVED_COLUMNS, "finished_at")),
+                literal(datetime.utcnow())
+            ).where(Deployment.id.in_(deployment_ids))
+        )
+    )
+    
+    edges = deployment_dependencies.c
+    touching = or_(edges.dependent_id.in_(deployment_ids), edges.dependency_id.in_(deployment_ids))
+    db.execute(
+        insert(deployment_history_dependencies).from_select(
+            ["dependent_id", "dependency_id"],
+            select(edges.dependent_id, edges.dependency_id).where(touching)
+        )
+    )
+    db.execute(delete(deployment_dependencies).where(touching))
+    db.execute(delete(Deployment).where(Deployment.id.in_(deployment_ids)).execution_options(synchronize_session=False))
+    db.commit()
+    return len(deployment_ids)
+
+
+def compact_history(db: Session, retention: timedelta, batch_size: int = 1000) -> int:
+    """
+    Archive every deployment that finished more than `retention` ago, a
+    batch per transaction so no lock is held for long. Returns the number
+    of deployments archived.
+    """
+    finished_before = datetime.utcnow() - retention
+    archived = 0
+    while True:
+        moved = archive_finished_deployments(db, finished_before, batch_size)
+        archived += moved
+        if moved < batch_size:
+            return archived
+
+
+def get_user_history(
+    db: Session,
+    user_id: int,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    status: Optional[DeploymentStatusEnum] = None,
+    cluster_id: Optional[int] = None,
+    finished_after: Optional[datetime] = None,
+    finished_before: Optional[datetime] = None
+) -> List[DeploymentHistory]:
+    """
+    A user's archived deployments matching the filters in id order,
+    starting after the deployment `after_id`. Bounding finished_at lets
+    PostgreSQL skip the partitions outside the range.
+    """
+    statement = select(DeploymentHistory).where(DeploymentHistory.user_id == user_id)
+    if after_id is not None:
+        statement = statement.where(DeploymentHistory.id > after_id)
+    if status is not None:
+        statement = statement.where(DeploymentHistory.status == DeploymentStatus(status.value))
+    if cluster_id is not None:
+        statement = statement.where(DeploymentHistory.cluster_id == cluster_id)
+    if finished_after is not None:
+        statement = statement.where(DeploymentHistory.finished_at >= finished_after)
+    if finished_before is not None:
+        statement = statement.where(DeploymentHistory.finished_at < finished_before)
+    return db.scalars(statement.order_by(DeploymentHistory.id).limit(limit)).all()
+
+
+def get_history_entry(db: Session, deployment_id: int) -> Optional[Dict]:
+    """
+    Get an archived deployment, with the IDs of its dependencies and
+    dependents when it was archived.
+    """
+    entry = db.scalars(select(DeploymentHistory).where(DeploymentHistory.id == deployment_id)).first()
+    if entry is None:
+        return None
+    edges = deployment_history_dependencies.c
+    rows = db.execute(
+        select(edges.dependent_id, edges.dependency_id)
+        .where(or_(edges.dependent_id == deployment_id, edges.dependency_id == deployment_id))
+    ).all()
+    return {
+        **{column: getattr(entry, column) for column in (*ARCHIVED_COLUMNS, "finished_at", "archived_at")},
+        "dependency_ids": sorted(row.dependency_id for row in rows if row.dependent_id == deployment_id),
+        "dependent_ids": sorted(row.dependent_id for row in rows if row.dependency_id == deployment_id),
+    }
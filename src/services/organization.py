@@ -1,11 +1,14 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 import uuid
 import string
 import random
-from typing import List
+from typing import List, Set
 
-from src.models.models import Organization, User
+from src.models.models import Organization, User, user_organization
 from src.models.schemas import OrganizationCreate, OrganizationUpdate
+from src.utils import memberships
 
 
 def generate_invite_code(length: int = 8):
@@ -30,11 +33,45 @@ def get_organizations(db: Session, skip: int = 0, limit: int = 100):
 
 
 def get_user_organizations(db: Session, user_id: int):
-    """Get organizations for a specific user."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        return []
-    return user.organizations
+    """Get organizations for a specific user, with their members."""
+    return db.query(Organization).options(selectinload(Organization.users)).join(
+        user_organization, user_organization.c.organization_id == Organization.id
+    ).filter(user_organization.c.user_id == user_id).order_by(Organization.id).all()
+
+
+def get_user_organization_ids(db: Session, user_id: int) -> Set[int]:
+    """Get the IDs of the organizations a user is a member of."""
+    return {
+        row.organization_id
+        for row in db.execute(
+            select(user_organization.c.organization_id).where(user_organization.c.user_id == user_id)
+        )
+    }
+
+
+async def get_user_organization_ids_async(db: AsyncSession, user_id: int) -> List[int]:
+    """Get the IDs of the organizations a user is a member of."""
+    result = await db.execute(
+        select(user_organization.c.organization_id).where(user_organization.c.user_id == user_id)
+    )
+    return list(result.scalars())
+
+
+def _membership_exists(user_id: int, org_id: int):
+    return select(exists().where(
+        user_organization.c.user_id == user_id,
+        user_organization.c.organization_id == org_id
+    ))
+
+
+def is_member(db: Session, user_id: int, org_id: int) -> bool:
+    """Whether a user is a member of an organization, answered from the membership index."""
+    return db.scalar(_membership_exists(user_id, org_id))
+
+
+async def is_member_async(db: AsyncSession, user_id: int, org_id: int) -> bool:
+    """Whether a user is a member of an organization, answered from the membership index."""
+    return await db.scalar(_membership_exists(user_id, org_id))
 
 
 def create_organization(db: Session, organization: OrganizationCreate, creator_id: int):
@@ -57,6 +94,7 @@ def create_organization(db: Session, organization: OrganizationCreate, creator_i
     if creator:
         creator.organizations.append(db_org)
         db.commit()
+        memberships.invalidate([creator_id])
     
     return db_org
 
@@ -82,8 +120,10 @@ def delete_organization(db: Session, org_id: int):
     if not db_org:
         return False
     
+    member_ids = [user.id for user in db_org.users]
     db.delete(db_org)
     db.commit()
+    memberships.invalidate(member_ids)
     return True
 
 
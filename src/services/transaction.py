@@ -0,0 +1,99 @@
+"""
+Caller-managed transactions (units of work).
+
+By default every service function is its own transaction: it commits its
+changes, refreshes the objects it returns and then publishes its cluster
+events. A composite operation (a stop that starts the dependents it made
+ready, a bulk action) runs as one unit of work instead: wrapped in
+`unit_of_work(db)`, or decorated with `transactional`. Inside it,
+services only flush, and expire the session as a commit would so later
+steps read fresh rows. They skip their refreshes, since an expired object
+reloads itself only if the caller reads it. The cluster events wait for
+the single commit at the end of the block.
+"""
+
+import functools
+from contextlib import contextmanager
+from sqlalchemy.orm import Session
+from typing import Callable, Optional
+
+from src.utils import events
+
+# Session.info key holding the events a unit of work publishes once it commits
+_UNIT_OF_WORK = "unit_of_work_events"
+
+
+def in_unit_of_work(db: Session) -> bool:
+    """Whether the caller owns the session's transaction."""
+    return _UNIT_OF_WORK in db.info
+
+
+@contextmanager
+def unit_of_work(db: Session):
+    """
+    Run the block as one transaction: committed once at the end, rolled
+    back (and the exception re-raised) if it fails. A unit of work opened
+    inside another one just joins it.
+    """
+    if in_unit_of_work(db):
+        yield db
+        return
+
+    pending = db.info[_UNIT_OF_WORK] = {}
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        del db.info[_UNIT_OF_WORK]
+
+    for cluster_id, reason in pending.items():
+        events.publish_cluster_event(cluster_id, reason)
+
+
+def transactional(func):
+    """Run a service function (taking the session first) and everything it calls as one unit of work."""
+    @functools.wraps(func)
+    def wrapper(db: Session, *args, **kwargs):
+        with unit_of_work(db):
+            return func(db, *args, **kwargs)
+    
+    return wrapper
+
+
+def commit(db: Session):
+    """Commit a service's changes, or inside a unit of work flush them and expire the session."""
+    if in_unit_of_work(db):
+        db.flush()
+        db.expire_all()
+    else:
+        db.commit()
+
+
+def abort(db: Session, undo: Optional[Callable[[], None]] = None):
+    """
+    Give up on a service's changes: roll them back, or inside a unit of
+    work, where the rest of the caller's transaction has to survive, run
+    `undo` to take back what the service wrote.
+    """
+    if not in_unit_of_work(db):
+        db.rollback()
+    elif undo is not None:
+        undo()
+
+
+def refresh(db: Session, instance):
+    """Reload an object after commit; inside a unit of work it reloads when read instead."""
+    if not in_unit_of_work(db):
+        db.refresh(instance)
+
+
+def publish_cluster_event(db: Session, cluster_id: int, reason: str):
+    """Publish a cluster event now, or inside a unit of work once it has committed."""
+    if in_unit_of_work(db):
+        if cluster_id is not None:
+            db.info[_UNIT_OF_WORK].setdefault(cluster_id, reason)
+    else:
+        events.publish_cluster_event(cluster_id, reason)
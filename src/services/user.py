@@ -4,6 +4,7 @@ from typing import Optional
 
 from src.models.models import User, Organization
 from src.models.schemas import UserCreate, UserUpdate
+from src.utils import memberships
 from src.utils.auth import get_password_hash, verify_password
 
 
@@ -96,5 +97,6 @@ def join_organization(db: Session, user_id: int, invite_code: str):
     
     db_user.organizations.append(db_org)
     db.commit()
+    memberships.invalidate([user_id])
     db.refresh(db_user)
     return db_org 
\ No newline at end of file
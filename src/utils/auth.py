@@ -1,16 +1,20 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, FrozenSet, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 
-from src.models.base import get_db
+from src.models.base import get_async_db, get_db
 from src.models.models import User
 from src.models.schemas import TokenData
+from src.services import organization as org_service
+from src.utils import memberships
 
 load_dotenv()
 
@@ -48,25 +52,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    """Get the current authenticated user from the token."""
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def get_token_username(token: str) -> str:
+    """Get the username from a JWT access token, or raise 401 if it is invalid."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return token_data.username
+
+
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+    """Get the current authenticated user from the token."""
+    username = get_token_username(token)
     
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = db.query(User).filter(User.username == username).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 
@@ -74,4 +87,94 @@ def get_current_active_user(current_user: User = Depends(get_current_user)):
     """Check if the current user is active."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
+
+
+async def get_current_user_async(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
+    """Get the current authenticated user from the token, on the async session."""
+    username = get_token_username(token)
+    
+    user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+async def get_current_active_user_async(current_user: User = Depends(get_current_user_async)):
+    """Check if the current user is active."""
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
+class Memberships:
+    """
+    The current user's organization memberships, resolved at most once per
+    request. Checks are set lookups once the user's organization IDs are
+    known, from this request or the shared cache (src.utils.memberships);
+    otherwise each organization asked about costs one indexed existence query.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._org_ids: Optional[FrozenSet[int]] = None
+        self._cache_checked = False
+        self._answers: Dict[int, bool] = {}
+
+    def _cached_org_ids(self) -> Optional[FrozenSet[int]]:
+        if self._org_ids is None and not self._cache_checked:
+            self._org_ids = memberships.get_org_ids(self.user_id)
+            self._cache_checked = True
+        return self._org_ids
+
+    async def _cached_org_ids_async(self) -> Optional[FrozenSet[int]]:
+        if self._org_ids is None and not self._cache_checked:
+            self._org_ids = await memberships.get_org_ids_async(self.user_id)
+            self._cache_checked = True
+        return self._org_ids
+
+    def includes(self, db: Session, org_id: Optional[int]) -> bool:
+        """Whether the user is a member of the organization."""
+        org_ids = self._cached_org_ids()
+        if org_ids is not None:
+            return org_id in org_ids
+        if org_id is None:
+            return False
+        if org_id not in self._answers:
+            self._answers[org_id] = org_service.is_member(db, self.user_id, org_id)
+        return self._answers[org_id]
+
+    async def includes_async(self, db: AsyncSession, org_id: Optional[int]) -> bool:
+        """Whether the user is a member of the organization, on the async session."""
+        org_ids = await self._cached_org_ids_async()
+        if org_ids is not None:
+            return org_id in org_ids
+        if org_id is None:
+            return False
+        if org_id not in self._answers:
+            self._answers[org_id] = await org_service.is_member_async(db, self.user_id, org_id)
+        return self._answers[org_id]
+
+    def org_ids(self, db: Session) -> FrozenSet[int]:
+        """The IDs of all the user's organizations."""
+        if self._cached_org_ids() is None:
+            self._org_ids = frozenset(org_service.get_user_organization_ids(db, self.user_id))
+            memberships.set_org_ids(self.user_id, self._org_ids)
+        return self._org_ids
+
+    async def org_ids_async(self, db: AsyncSession) -> FrozenSet[int]:
+        """The IDs of all the user's organizations, on the async session."""
+        if await self._cached_org_ids_async() is None:
+            self._org_ids = frozenset(await org_service.get_user_organization_ids_async(db, self.user_id))
+            await memberships.set_org_ids_async(self.user_id, self._org_ids)
+        return self._org_ids
+
+
+def get_memberships(current_user: User = Depends(get_current_active_user)) -> Memberships:
+    """The current user's memberships, shared by everything the request depends on."""
+    return Memberships(current_user.id)
+
+
+async def get_memberships_async(current_user: User = Depends(get_current_active_user_async)) -> Memberships:
+    """The current user's memberships, for routes on the async session."""
+    return Memberships(current_user.id)
@@ -0,0 +1,37 @@
+"""
+ETags and If-Match for the versioned resources (deployments and clusters).
+
+A deployment's or cluster's ETag is its row version, which every update
+bumps (see src.services.concurrency). A client that sends the ETag it read
+back in If-Match on a PUT gets 412 Precondition Failed instead of
+overwriting a change made since. Without If-Match, an update still never
+silently overwrites a concurrent one; it is just retried on the fresh row.
+"""
+
+import re
+from typing import Optional
+
+from fastapi import HTTPException, Response
+
+_ETAG = re.compile(r'^"(\d+)"$')
+
+
+def set_etag(response: Response, version: int):
+    """Send `version` as the ETag of the response."""
+    response.headers["ETag"] = f'"{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    The version an If-Match header requires, or None if there is no header
+    or it is "*" (any version will do). A weak ETag never matches.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        raise HTTPException(status_code=412, detail="If-Match requires a strong ETag")
+    match = _ETAG.match(value)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+    return int(match.group(1))
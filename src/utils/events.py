@@ -0,0 +1,127 @@
+"""
+Cluster change events.
+
+Services publish an event whenever something happens that may let the
+scheduler place more work on a cluster (new pending deployments, released
+capacity, resized clusters). Each event also marks the cluster dirty in a
+Redis set, so scheduler loops only re-evaluate clusters that changed since
+their last evaluation. Scheduler loops subscribe to the events so they can
+schedule the affected clusters immediately instead of waiting for the next
+cycle. Events are best effort: if Redis is unavailable they are dropped and
+the periodic full sweep picks the change up.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Optional, Set
+
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CLUSTER_EVENTS_CHANNEL = "scheduler:cluster_events"
+DIRTY_CLUSTERS_KEY = "scheduler:dirty_clusters"
+
+# Seconds to stop trying to publish after Redis has failed
+PUBLISH_BACKOFF = 5.0
+
+# Publishing happens on the request path, so never wait long on Redis
+redis_client = redis.from_url(REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+
+_publish_disabled_until = 0.0
+
+
+def publish_cluster_event(cluster_id: int, reason: str):
+    """
+    Notify schedulers that a cluster changed.
+    Call this after the change has been committed.
+    """
+    global _publish_disabled_until
+    if cluster_id is None or time.monotonic() < _publish_disabled_until:
+        return
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.sadd(DIRTY_CLUSTERS_KEY, cluster_id)
+        pipe.publish(
+            CLUSTER_EVENTS_CHANNEL,
+            json.dumps({"cluster_id": cluster_id, "reason": reason})
+        )
+        pipe.execute()
+    except redis.RedisError as e:
+        _publish_disabled_until = time.monotonic() + PUBLISH_BACKOFF
+        logger.warning(f"Could not publish cluster event, relying on periodic sweep: {e}")
+
+
+def pop_dirty_clusters(cluster_ids: Optional[Set[int]] = None) -> Optional[Set[int]]:
+    """
+    Atomically take the set of clusters that changed since they were last evaluated.
+    With cluster_ids, only those clusters are taken and the rest stay marked
+    for the replicas that own them.
+    Returns None if Redis is unavailable, in which case callers should sweep every cluster.
+    """
+    try:
+        if cluster_ids is None:
+            pipe = redis_client.pipeline()
+            pipe.smembers(DIRTY_CLUSTERS_KEY)
+            pipe.delete(DIRTY_CLUSTERS_KEY)
+            members, _ = pipe.execute()
+            return {int(member) for member in members}
+        
+        # A cluster marked again after SMEMBERS is still scheduled afterwards,
+        # so removing it here doesn't lose the change
+        dirty = {int(member) for member in redis_client.smembers(DIRTY_CLUSTERS_KEY)} & set(cluster_ids)
+        if dirty:
+            redis_client.srem(DIRTY_CLUSTERS_KEY, *dirty)
+        return dirty
+    except redis.RedisError as e:
+        logger.warning(f"Could not read dirty clusters, falling back to a full sweep: {e}")
+        return None
+
+
+class ClusterEventListener:
+    """Subscribes to cluster events and collects the IDs of changed clusters."""
+
+    def __init__(self):
+        self.pubsub: Optional[redis.client.PubSub] = None
+
+    def wait(self, timeout: float) -> Set[int]:
+        """
+        Block for up to `timeout` seconds until at least one event arrives.
+        Returns the IDs of all clusters with queued events, or an empty set on timeout.
+        """
+        try:
+            if self.pubsub is None:
+                self.pubsub = redis.from_url(REDIS_URL).pubsub(ignore_subscribe_messages=True)
+                self.pubsub.subscribe(CLUSTER_EVENTS_CHANNEL)
+
+            cluster_ids = set()
+            message = self.pubsub.get_message(timeout=timeout)
+            while message is not None:
+                try:
+                    cluster_ids.add(int(json.loads(message["data"])["cluster_id"]))
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Ignoring malformed cluster event: {message['data']!r}")
+                # Coalesce everything that is already queued
+                message = self.pubsub.get_message(timeout=0)
+            return cluster_ids
+        except redis.RedisError as e:
+            logger.warning(f"Cluster event subscription failed, falling back to polling: {e}")
+            self.close()
+            time.sleep(timeout)
+            return set()
+
+    def close(self):
+        """Close the subscription."""
+        if self.pubsub is not None:
+            try:
+                self.pubsub.close()
+            except redis.RedisError:
+                pass
+            self.pubsub = None
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Database initialization script.
-This script initializes the database schema using SQLAlchemy models.
+This script brings the database schema up to date by running the Alembic migrations.
 """
 import logging
 import os
@@ -10,9 +10,9 @@ import sys
 # Add parent directory to path to allow imports from src
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from src.models.base import Base, engine
-from src.models.models import User, Organization, Cluster, Deployment
-from src.models.models import user_organization, deployment_dependencies
+from src.models.base import SessionLocal
+from src.services.cluster import reconcile_cluster_resources
+from src.utils.migrations import run_migrations
 
 # Set up logging
 logging.basicConfig(
@@ -23,15 +23,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def init_db():
-    """Initialize the database by creating all tables."""
-    logger.info("Creating database tables...")
+    """Initialize the database by migrating it to the latest schema."""
+    logger.info("Migrating database schema...")
     try:
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully!")
+        run_migrations()
+        logger.info("Database schema is up to date!")
+        
+        # Rebuild the resource counters from the allocation ledger
+        db = SessionLocal()
+        try:
+            reconcile_cluster_resources(db)
+        finally:
+            db.close()
+        logger.info("Cluster resources reconciled")
         return True
     except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
+        logger.error(f"Error migrating database: {e}")
         return False
 
 if __name__ == "__main__":
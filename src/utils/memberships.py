@@ -0,0 +1,119 @@
+"""
+Shared cache of organization memberships.
+
+Every authorized request needs the organizations of the current user. The
+IDs are cached in Redis for MEMBERSHIP_CACHE_TTL_SECONDS, shared by every
+API worker. Services that change memberships (joining, creating or
+deleting an organization) invalidate the members' entries after they
+commit. An entry can still be stale for at most the TTL: when the
+invalidation couldn't reach Redis, or when a request that read the
+memberships just before the change stores them just after. The cache is
+best effort: if Redis is unavailable, callers query the database instead.
+Async routes use the *_async variants, which never block the event loop.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import FrozenSet, Iterable, Optional
+
+import redis
+import redis.asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# 0 disables the cache
+MEMBERSHIP_CACHE_TTL_SECONDS = int(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "30"))
+KEY_PREFIX = "auth:org_ids:"
+
+# Seconds to stop using the cache after Redis has failed
+CACHE_BACKOFF = 5.0
+
+# The cache sits on every request's path, so never wait long on Redis
+redis_client = redis.from_url(REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+async_redis_client = redis.asyncio.from_url(REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+
+_cache_disabled_until = 0.0
+
+
+def _available() -> bool:
+    return MEMBERSHIP_CACHE_TTL_SECONDS > 0 and time.monotonic() >= _cache_disabled_until
+
+
+def _failed(e: redis.RedisError):
+    global _cache_disabled_until
+    _cache_disabled_until = time.monotonic() + CACHE_BACKOFF
+    logger.warning(f"Membership cache unavailable, querying the database: {e}")
+
+
+def _key(user_id: int) -> str:
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def _decode(cached: Optional[bytes]) -> Optional[FrozenSet[int]]:
+    return frozenset(json.loads(cached)) if cached is not None else None
+
+
+def _encode(org_ids: Iterable[int]) -> str:
+    return json.dumps(sorted(org_ids))
+
+
+def get_org_ids(user_id: int) -> Optional[FrozenSet[int]]:
+    """The cached IDs of the user's organizations, or None on a miss."""
+    if not _available():
+        return None
+    try:
+        return _decode(redis_client.get(_key(user_id)))
+    except redis.RedisError as e:
+        _failed(e)
+        return None
+
+
+async def get_org_ids_async(user_id: int) -> Optional[FrozenSet[int]]:
+    """get_org_ids, for async routes."""
+    if not _available():
+        return None
+    try:
+        return _decode(await async_redis_client.get(_key(user_id)))
+    except redis.RedisError as e:
+        _failed(e)
+        return None
+
+
+def set_org_ids(user_id: int, org_ids: Iterable[int]):
+    """Cache the IDs of the user's organizations."""
+    if not _available():
+        return
+    try:
+        redis_client.setex(_key(user_id), MEMBERSHIP_CACHE_TTL_SECONDS, _encode(org_ids))
+    except redis.RedisError as e:
+        _failed(e)
+
+
+async def set_org_ids_async(user_id: int, org_ids: Iterable[int]):
+    """set_org_ids, for async routes."""
+    if not _available():
+        return
+    try:
+        await async_redis_client.setex(_key(user_id), MEMBERSHIP_CACHE_TTL_SECONDS, _encode(org_ids))
+    except redis.RedisError as e:
+        _failed(e)
+
+
+def invalidate(user_ids: Iterable[int]):
+    """
+    Drop the cached memberships of users whose organizations changed.
+    Call this after the change has been committed.
+    """
+    keys = [_key(user_id) for user_id in user_ids]
+    if not keys or not _available():
+        return
+    try:
+        redis_client.delete(*keys)
+    except redis.RedisError as e:
+        _failed(e)
@@ -0,0 +1,51 @@
+"""
+Schema migrations.
+
+The schema is managed by Alembic (see alembic.ini and migrations/). This
+module runs the migrations programmatically, so the application, the
+init_db script and the tests all bring a database to the same revision.
+"""
+
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from src.models.base import engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../alembic.ini"))
+
+# The revision matching databases created by Base.metadata.create_all before
+# migrations were introduced
+BASELINE_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    # Keep the application's logging configuration
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def run_migrations(bind: Engine = engine, revision: str = "head"):
+    """
+    Upgrade the database to `revision`. A database that already has tables
+    but no migration history is stamped at the baseline revision first.
+    """
+    config = alembic_config()
+    with bind.connect() as connection:
+        tables = inspect(connection).get_table_names()
+        # Let Alembic manage its own transactions (some migrations need autocommit)
+        connection.commit()
+        config.attributes["connection"] = connection
+
+        if "alembic_version" not in tables and "deployments" in tables:
+            logger.warning(f"Database has no migration history, stamping it at revision {BASELINE_REVISION}")
+            command.stamp(config, BASELINE_REVISION)
+
+        command.upgrade(config, revision)
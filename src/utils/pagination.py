@@ -0,0 +1,50 @@
+"""
+Keyset pagination for the list endpoints.
+
+List endpoints return rows in id order. When there are more rows after a
+page, its response carries an opaque cursor in the X-Next-Cursor header;
+passing it back as ?cursor= returns the next page, which the database
+reads by seeking past the last id rather than counting off an offset, so
+every page costs the same however deep it is.
+"""
+
+import base64
+import binascii
+import json
+from typing import List, Optional
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# The largest page a client may ask for
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_id: int) -> str:
+    """The cursor of the page after the row with id `last_id`."""
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """The last id of the previous page, or None for the first page."""
+    if cursor is None:
+        return None
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+
+def paginate(response: Response, rows: List, limit: int) -> List:
+    """
+    Trim `rows`, fetched with limit + 1, to one page and set the next-page
+    cursor on `response` if the extra row shows there is another page.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    return rows
@@ -0,0 +1,33 @@
+"""
+Integer resource units.
+
+Capacity accounting uses exact integers so that counters never drift:
+RAM in MiB, CPU in millicores and GPUs in thousandths of a GPU. The API
+keeps speaking GB, cores and GPUs, which are converted at the boundary.
+"""
+
+from typing import Tuple
+
+MIB_PER_GB = 1024
+MILLICORES_PER_CPU = 1000
+MILLI_PER_GPU = 1000
+
+Units = Tuple[int, int, int]
+
+
+def to_units(ram: float, cpu: float, gpu: float) -> Units:
+    """Convert (GB, cores, GPUs) to (MiB, millicores, milli-GPUs)."""
+    return (
+        int(round(ram * MIB_PER_GB)),
+        int(round(cpu * MILLICORES_PER_CPU)),
+        int(round(gpu * MILLI_PER_GPU))
+    )
+
+
+def from_units(ram_mib: int, cpu_millicores: int, gpu_milli: int) -> Tuple[float, float, float]:
+    """Convert (MiB, millicores, milli-GPUs) back to (GB, cores, GPUs)."""
+    return (
+        ram_mib / MIB_PER_GB,
+        cpu_millicores / MILLICORES_PER_CPU,
+        gpu_milli / MILLI_PER_GPU
+    )
@@ -0,0 +1,120 @@
+"""
+Shared scaffolding for the in-process tests.
+
+Unlike the API tests, which need the server running on localhost:8000, these
+drive the services, the scheduler and the API router in-process, on a SQLite
+database built by the Alembic migrations in a temporary directory. Modules
+override `seeded` (or `cluster_size`) when they need other data.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.api.router import api_router
+from src.models.base import get_async_db, get_db
+from src.models.models import Cluster, Organization, User
+from src.models.schemas import DeploymentCreate
+from src.services import deployment as deployment_service
+from src.utils.auth import create_access_token
+from src.utils.migrations import run_migrations
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return tmp_path / "test.db"
+
+
+@pytest.fixture
+def engine(database_path):
+    engine = create_engine(f"sqlite:///{database_path}")
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def username():
+    """The user the seeded data belongs to and the client is signed in as."""
+    return "tester"
+
+
+@pytest.fixture
+def cluster_size():
+    """GB of RAM and CPUs of the seeded cluster."""
+    return 4.0
+
+
+@pytest.fixture
+def seeded(session_factory, username, cluster_size):
+    """A user in an organization with one cluster, by ID."""
+    db = session_factory()
+    org = Organization(name=f"{username}-org", invite_code=username)
+    user = User(username=username, email=f"{username}@example.com", hashed_password="", is_active=True)
+    user.organizations.append(org)
+    db.add_all([org, user])
+    db.flush()
+    cluster = Cluster(
+        name=username,
+        total_ram=cluster_size, total_cpu=cluster_size, total_gpu=0.0,
+        available_ram=cluster_size, available_cpu=cluster_size, available_gpu=0.0,
+        total_ram_mib=int(cluster_size * 1024), total_cpu_millicores=int(cluster_size * 1000), total_gpu_milli=0,
+        organization_id=org.id, creator_id=user.id
+    )
+    db.add(cluster)
+    db.commit()
+    ids = {"user": user.id, "org": org.id, "cluster": cluster.id}
+    db.close()
+    return ids
+
+
+@pytest.fixture
+def create(seeded):
+    """Submit a deployment to the seeded cluster through the service, returning its ID."""
+    def create(db, name, size=1.0, dependency_ids=(), priority=2):
+        return deployment_service.create_deployment(db, DeploymentCreate(
+            name=name, docker_image="test/image:latest",
+            required_ram=size, required_cpu=size, required_gpu=0.0,
+            priority=priority, cluster_id=seeded["cluster"], dependency_ids=list(dependency_ids)
+        ), seeded["user"]).id
+    return create
+
+
+@pytest.fixture(scope="session")
+def make_client():
+    """Build a TestClient for the API router, with both request paths (the sync and the async session) on the given engines."""
+    def make_client(engine, async_engine, username=None):
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        async def override_get_async_db():
+            async with async_session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(api_router)
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': username})}"} if username else {}
+        return TestClient(app, headers=headers)
+    return make_client
+
+
+@pytest.fixture
+def client(engine, database_path, username, make_client):
+    """A TestClient signed in as `username`."""
+    return make_client(engine, create_async_engine(f"sqlite+aiosqlite:///{database_path}"), username)
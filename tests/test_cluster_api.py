@@ -122,4 +122,31 @@ def test_delete_cluster(auth_token, test_org):
     cluster = response.json()
     # Now delete
     del_resp = requests.delete(f"{API_URL}/clusters/{cluster['id']}", headers=headers)
-    assert del_resp.status_code == 200 
\ No newline at end of file
+    assert del_resp.status_code == 200 
+def test_list_clusters_concurrently(auth_token, test_cluster):
+    from concurrent.futures import ThreadPoolExecutor
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    # Reads share a bounded async connection pool, so a burst of them must queue rather than fail
+    with ThreadPoolExecutor(max_workers=50) as executor:
+        responses = list(executor.map(
+            lambda _: requests.get(f"{API_URL}/clusters/", headers=headers),
+            range(200)
+        ))
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200]
+    assert all(any(c["id"] == test_cluster["id"] for c in r.json()) for r in responses)
+
+def test_update_cluster_if_match(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    url = f"{API_URL}/clusters/{test_cluster['id']}"
+    etag = requests.get(url, headers=headers).headers["ETag"]
+    
+    response = requests.put(url, json={"name": unique_cluster_name()}, headers={**headers, "If-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.headers["ETag"] != etag
+    assert response.headers["ETag"] == f'"{response.json()["version"]}"'
+    
+    # The ETag read before that update is stale now
+    response = requests.put(url, json={"name": unique_cluster_name()}, headers={**headers, "If-Match": etag})
+    assert response.status_code == 412, response.text
+    assert requests.put(url, json={"total_ram": 17.0}, headers={**headers, "If-Match": "*"}).status_code == 200
+    assert requests.put(url, json={"total_ram": 18.0}, headers={**headers, "If-Match": "bogus"}).status_code == 400
@@ -0,0 +1,160 @@
+"""
+Optimistic concurrency: row versions, compare-and-swap writes and retries.
+
+Two sessions stand in for two API workers (or a worker and the scheduler),
+so the interleavings can be set up deterministically.
+"""
+import threading
+import time
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
+
+from src.models.models import Cluster, Deployment, DeploymentStatus, ResourceAllocation
+from src.models.schemas import ClusterUpdate, DeploymentStatusEnum, DeploymentUpdate
+from src.scheduler import scheduler as scheduler_module
+from src.scheduler.scheduler import DeploymentScheduler
+from src.services import cluster as cluster_service
+from src.services import deployment as deployment_service
+from src.services.concurrency import OCC_MAX_RETRIES, ConflictError, VersionMismatchError, retry_on_conflict
+from src.utils import events
+
+
+def allocated_ram(db, cluster_id):
+    return db.scalar(select(Cluster.allocated_ram_mib).where(Cluster.id == cluster_id))
+
+
+def test_every_write_bumps_the_version(session_factory, seeded, create):
+    db = session_factory()
+    deployment_id = create(db, "bumped")
+    versions = [db.get(Deployment, deployment_id).version]
+    deployment_service.update_deployment(db, deployment_id, DeploymentUpdate(name="renamed"))
+    versions.append(db.get(Deployment, deployment_id).version)
+    deployment_service.start_deployments(db, [deployment_id])
+    versions.append(db.get(Deployment, deployment_id).version)
+    deployment_service.stop_deployments(db, [deployment_id])
+    versions.append(db.get(Deployment, deployment_id).version)
+    assert versions == [1, 2, 3, 4]
+
+    # Starting and stopping changed the cluster's allocated resources, so its version too
+    cluster_versions = [db.get(Cluster, seeded["cluster"], populate_existing=True).version]
+    cluster_service.update_cluster(db, seeded["cluster"], ClusterUpdate(name="renamed"))
+    cluster_versions.append(db.get(Cluster, seeded["cluster"]).version)
+    cluster_service.update_cluster(db, seeded["cluster"], ClusterUpdate(total_ram=8.0))
+    cluster_versions.append(db.get(Cluster, seeded["cluster"]).version)
+    assert cluster_versions == [3, 4, 5]
+    assert db.get(Cluster, seeded["cluster"]).available_ram == 8.0
+    db.close()
+
+
+def test_stale_stop_is_retried_instead_of_releasing_twice(session_factory, seeded, create):
+    api, other = session_factory(), session_factory()
+    other_running = create(api, "other")
+    deployment_id = create(api, "raced")
+    deployment_service.start_deployments(api, [other_running, deployment_id])
+    assert allocated_ram(api, seeded["cluster"]) == 2048
+
+    # One worker has the running deployment loaded when another fails it
+    assert api.get(Deployment, deployment_id).status == DeploymentStatus.RUNNING
+    deployment_service.update_deployment(other, deployment_id, DeploymentUpdate(status=DeploymentStatusEnum.FAILED))
+    other.close()
+
+    # The first worker's stop loses the race, starts over and finds nothing to stop
+    assert deployment_service.stop_deployment(api, deployment_id) is None
+    assert api.get(Deployment, deployment_id).status == DeploymentStatus.FAILED
+    assert allocated_ram(api, seeded["cluster"]) == 1024
+    api.close()
+
+
+def test_update_with_stale_expected_version_is_refused(session_factory, seeded, create):
+    db = session_factory()
+    deployment_id = create(db, "expected")
+    deployment_service.update_deployment(db, deployment_id, DeploymentUpdate(name="first"), expected_version=1)
+
+    with pytest.raises(VersionMismatchError) as error:
+        deployment_service.update_deployment(db, deployment_id, DeploymentUpdate(name="second"), expected_version=1)
+    assert error.value.status_code == 412
+    assert db.get(Deployment, deployment_id).name == "first"
+    with pytest.raises(VersionMismatchError):
+        cluster_service.update_cluster(db, seeded["cluster"], ClusterUpdate(name="late"), expected_version=7)
+    db.close()
+
+
+def test_retries_give_up_with_a_conflict(session_factory):
+    db = session_factory()
+    attempts = []
+
+    @retry_on_conflict
+    def always_stale(db):
+        attempts.append(1)
+        raise StaleDataError("lost the race")
+
+    with pytest.raises(ConflictError) as error:
+        always_stale(db)
+    assert error.value.status_code == 409
+    assert len(attempts) == OCC_MAX_RETRIES + 1
+    db.close()
+
+
+def test_scheduler_replans_when_a_deployment_changes(session_factory, seeded, create, monkeypatch):
+    db = session_factory()
+    deployment_id = create(db, "resized", size=1.0)
+
+    # Resize the deployment between the scheduler's snapshot and its commit, once
+    plan_cluster = scheduler_module.plan_cluster
+    def plan_then_resize(*args, **kwargs):
+        plan = plan_cluster(*args, **kwargs)
+        if not resized:
+            other = session_factory()
+            deployment_service.update_deployment(other, deployment_id, DeploymentUpdate(required_ram=2.0))
+            other.close()
+            resized.append(True)
+        return plan
+    resized = []
+    monkeypatch.setattr(scheduler_module, "plan_cluster", plan_then_resize)
+
+    result = DeploymentScheduler(db).schedule_cluster_deployments(seeded["cluster"])
+    assert (result["scheduled"], result["retries"]) == (1, 1)
+    # The deployment runs with the size it has now, not the one first planned with
+    allocation = db.scalars(select(ResourceAllocation).where(ResourceAllocation.deployment_id == deployment_id)).one()
+    assert allocation.ram_mib == 2048
+    assert allocated_ram(db, seeded["cluster"]) == 2048
+    db.close()
+
+
+def test_timed_out_cluster_is_skipped_until_its_run_finishes(session_factory, monkeypatch):
+    release = threading.Event()
+    runs, published = [], []
+    def schedule(self, cluster_id):
+        runs.append(cluster_id)
+        if cluster_id == 1:
+            release.wait(5)
+        return DeploymentScheduler._empty_result()
+    monkeypatch.setattr(DeploymentScheduler, "schedule_cluster_deployments", schedule)
+    monkeypatch.setattr(events, "publish_cluster_event", lambda cluster_id, reason: published.append(cluster_id))
+
+    def cycle():
+        db = session_factory()
+        scheduler = DeploymentScheduler(db, session_factory=session_factory, max_workers=2, cluster_timeout=0.2)
+        result = scheduler.schedule_clusters([1, 2])
+        db.close()
+        return result
+
+    assert cycle()[1]["timed_out"]
+    # The overrunning run could still apply a plan, so the next cycle leaves its cluster alone
+    runs.clear()
+    result = cycle()
+    assert result[1]["still_running"] and "still_running" not in result[2]
+    assert runs == [2]
+
+    # Once it finishes, the cluster is marked changed and scheduled again
+    release.set()
+    for _ in range(50):
+        if published:
+            break
+        time.sleep(0.1)
+    assert published == [1]
+    runs.clear()
+    assert "still_running" not in cycle()[1]
+    assert sorted(runs) == [1, 2]
@@ -386,3 +386,407 @@ def test_dependency_state_transitions(auth_token, test_cluster):
     assert del_resp2.status_code == 200
 
 
+
+def test_concurrent_starts_never_overcommit(auth_token, test_cluster):
+    from concurrent.futures import ThreadPoolExecutor
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    # The cluster has 4 CPUs, so at most 4 of these can run at once
+    deployments = []
+    for i in range(12):
+        deployment_data = {
+            "name": unique_deployment_name() + f"_{i}",
+            "docker_image": "test/image:latest",
+            "required_ram": 0.5,
+            "required_cpu": 1.0,
+            "required_gpu": 0.0,
+            "priority": 2,
+            "cluster_id": test_cluster["id"]
+        }
+        response = requests.post(f"{API_URL}/deployments/", json=deployment_data, headers=headers)
+        assert response.status_code == 200, response.text
+        deployments.append(response.json())
+    # Start every deployment, each one several times, all in parallel
+    start_urls = [f"{API_URL}/deployments/{d['id']}/start" for d in deployments] * 3
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        responses = list(executor.map(lambda url: requests.post(url, headers=headers), start_urls))
+    assert all(r.status_code in (200, 400) for r in responses), [r.text for r in responses]
+    started = [r.json()["id"] for r in responses if r.status_code == 200]
+    # Each deployment is started at most once and the cluster is never overcommitted
+    assert len(started) == len(set(started)) == 4
+    cluster = requests.get(f"{API_URL}/clusters/{test_cluster['id']}", headers=headers).json()
+    assert cluster["available_cpu"] == 0.0
+    assert cluster["available_ram"] == 8.0 - 4 * 0.5
+    # Cleanup
+    for d in deployments:
+        del_resp = requests.delete(f"{API_URL}/deployments/{d['id']}", headers=headers)
+        assert del_resp.status_code == 200
+
+def test_fractional_allocations_do_not_drift(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    # Repeated start/stop cycles of fractional deployments must leave the cluster exactly where it was
+    for round_number in range(5):
+        deployments = []
+        for i in range(3):
+            deployment_data = {
+                "name": unique_deployment_name() + f"_{round_number}_{i}",
+                "docker_image": "test/image:latest",
+                "required_ram": 0.1,
+                "required_cpu": 0.1,
+                "required_gpu": 0.1,
+                "priority": 2,
+                "cluster_id": test_cluster["id"]
+            }
+            response = requests.post(f"{API_URL}/deployments/", json=deployment_data, headers=headers)
+            assert response.status_code == 200, response.text
+            deployments.append(response.json())
+        for d in deployments:
+            response = requests.post(f"{API_URL}/deployments/{d['id']}/start", headers=headers)
+            assert response.status_code == 200, response.text
+        cluster = requests.get(f"{API_URL}/clusters/{test_cluster['id']}", headers=headers).json()
+        assert cluster["available_cpu"] == 3.7
+        assert cluster["available_gpu"] == 0.7
+        for d in deployments:
+            response = requests.post(f"{API_URL}/deployments/{d['id']}/stop", headers=headers)
+            assert response.status_code == 200, response.text
+            del_resp = requests.delete(f"{API_URL}/deployments/{d['id']}", headers=headers)
+            assert del_resp.status_code == 200
+    cluster = requests.get(f"{API_URL}/clusters/{test_cluster['id']}", headers=headers).json()
+    assert cluster["available_ram"] == cluster["total_ram"]
+    assert cluster["available_cpu"] == cluster["total_cpu"]
+    assert cluster["available_gpu"] == cluster["total_gpu"]
+
+def test_paginate_and_filter_deployments(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    deployments = []
+    for i in range(5):
+        deployment_data = {
+            "name": unique_deployment_name() + f"_{i}",
+            "docker_image": "test/image:latest",
+            "required_ram": 0.5,
+            "required_cpu": 0.5,
+            "required_gpu": 0.0,
+            "priority": 3 if i % 2 else 1,
+            "cluster_id": test_cluster["id"]
+        }
+        response = requests.post(f"{API_URL}/deployments/", json=deployment_data, headers=headers)
+        assert response.status_code == 200, response.text
+        deployments.append(response.json())
+    response = requests.post(f"{API_URL}/deployments/{deployments[0]['id']}/cancel", headers=headers)
+    assert response.status_code == 200, response.text
+    # Following the cursor visits every deployment once, in id order
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = requests.get(f"{API_URL}/deployments/", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(d["id"] for d in page)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == sorted(d["id"] for d in deployments)
+    # Filters are applied by the server
+    def list_ids(**filters):
+        response = requests.get(f"{API_URL}/deployments/", params=filters, headers=headers)
+        assert response.status_code == 200, response.text
+        return [d["id"] for d in response.json()]
+    assert list_ids(status="cancelled") == [deployments[0]["id"]]
+    assert list_ids(status="pending", priority=3) == [deployments[1]["id"], deployments[3]["id"]]
+    assert list_ids(cluster_id=test_cluster["id"]) == seen
+    assert list_ids(cluster_id=test_cluster["id"] + 1000) == []
+    assert list_ids(created_after="2000-01-01T00:00:00", created_before="2000-01-02T00:00:00") == []
+    # A malformed cursor is rejected
+    response = requests.get(f"{API_URL}/deployments/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400, response.text
+    # Cleanup
+    for d in deployments:
+        del_resp = requests.delete(f"{API_URL}/deployments/{d['id']}", headers=headers)
+        assert del_resp.status_code == 200
+
+def test_create_deployment_batch(auth_token, test_cluster, test_deployment):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    def item(ref, **fields):
+        return {
+            "name": unique_deployment_name() + f"_{ref}",
+            "docker_image": "test/image:latest",
+            "required_ram": 0.5,
+            "required_cpu": 0.5,
+            "required_gpu": 0.0,
+            "priority": 2,
+            "cluster_id": test_cluster["id"],
+            "ref": ref,
+            **fields
+        }
+    batch = {"deployments": [
+        item("base", dependency_ids=[test_deployment["id"]]),
+        item("child", dependency_refs=["base"]),
+        item("urgent", priority=3, dependency_refs=["base"]),
+        item("after-urgent", dependency_refs=["urgent"]),
+        item("forward", dependency_refs=["later"]),
+        item("elsewhere", cluster_id=test_cluster["id"] + 1000),
+        item("base"),
+        item("later"),
+    ]}
+    response = requests.post(f"{API_URL}/deployments/batch", json=batch, headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    results = {r["index"]: r for r in body["results"]}
+    assert [r["index"] for r in body["results"]] == list(range(8))
+    assert body["created"] == 3 and body["failed"] == 5
+    for index in (0, 1, 7):
+        assert results[index]["id"] is not None and results[index]["error"] is None
+    assert "lower priority" in results[2]["error"]
+    assert "rejected" in results[3]["error"]
+    assert "Unknown reference" in results[4]["error"]
+    assert results[5]["error"] == "Cluster not found"
+    assert "Duplicate" in results[6]["error"]
+    # Dependencies inside and outside the batch are linked and still block the dependents
+    base = requests.get(f"{API_URL}/deployments/{results[0]['id']}", headers=headers).json()
+    assert [d["id"] for d in base["dependencies"]] == [test_deployment["id"]]
+    child = requests.get(f"{API_URL}/deployments/{results[1]['id']}", headers=headers).json()
+    assert [d["id"] for d in child["dependencies"]] == [base["id"]]
+    response = requests.post(f"{API_URL}/deployments/{child['id']}/start", headers=headers)
+    assert response.status_code == 400, response.text
+    response = requests.post(f"{API_URL}/deployments/{results[7]['id']}/start", headers=headers)
+    assert response.status_code == 200, response.text
+    # Cleanup
+    for index in (7, 1, 0):
+        del_resp = requests.delete(f"{API_URL}/deployments/{results[index]['id']}", headers=headers)
+        assert del_resp.status_code == 200
+
+def test_bulk_start_stop_and_cancel(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    def create(**fields):
+        deployment_data = {
+            "name": unique_deployment_name(),
+            "docker_image": "test/image:latest",
+            "required_ram": 0.5,
+            "required_cpu": 1.0,
+            "required_gpu": 0.0,
+            "priority": 2,
+            "cluster_id": test_cluster["id"],
+            **fields
+        }
+        response = requests.post(f"{API_URL}/deployments/", json=deployment_data, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    # The cluster has 4 CPUs, so only the first four fit
+    ids = [create() for _ in range(6)]
+    dependent = create(dependency_ids=[ids[0]])
+    def bulk(action, deployment_ids):
+        response = requests.post(
+            f"{API_URL}/deployments/bulk/{action}", json={"deployment_ids": deployment_ids}, headers=headers
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+    body = bulk("start", ids + [dependent, 10 ** 9])
+    results = {r["id"]: r for r in body["results"]}
+    assert body["succeeded"] == 4 and body["failed"] == 4
+    assert all(results[i]["status"] == "running" and results[i]["error"] is None for i in ids[:4])
+    assert all(results[i]["status"] == "pending" and results[i]["error"] == "Insufficient resources" for i in ids[4:])
+    assert results[dependent]["error"] == "Deployment has unmet dependencies"
+    assert results[10 ** 9]["error"] == "Deployment not found" and results[10 ** 9]["status"] is None
+    cluster = requests.get(f"{API_URL}/clusters/{test_cluster['id']}", headers=headers).json()
+    assert cluster["available_cpu"] == 0.0 and cluster["available_ram"] == 6.0
+    # Stopping releases everything at once, and the dependent starts in the freed capacity
+    body = bulk("stop", ids)
+    results = {r["id"]: r for r in body["results"]}
+    assert body["succeeded"] == 4
+    assert all(results[i]["status"] == "completed" for i in ids[:4])
+    assert all(results[i]["error"] == "Deployment is not running" for i in ids[4:])
+    response = requests.get(f"{API_URL}/deployments/{dependent}", headers=headers)
+    assert response.json()["status"] == "running"
+    cluster = requests.get(f"{API_URL}/clusters/{test_cluster['id']}", headers=headers).json()
+    assert cluster["available_cpu"] == 3.0 and cluster["available_ram"] == 7.5
+    body = bulk("cancel", ids[4:] + [dependent])
+    results = {r["id"]: r for r in body["results"]}
+    assert body["succeeded"] == 2
+    assert all(results[i]["status"] == "cancelled" for i in ids[4:])
+    assert results[dependent]["error"] == "Deployment is not pending"
+    # Cleanup
+    for deployment_id in ids + [dependent]:
+        del_resp = requests.delete(f"{API_URL}/deployments/{deployment_id}", headers=headers)
+        assert del_resp.status_code == 200
+
+def test_update_rejects_circular_dependencies(auth_token, test_cluster, test_deployment):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    def item(ref, **fields):
+        return {
+            "name": unique_deployment_name() + f"_{ref}",
+            "docker_image": "test/image:latest",
+            "required_ram": 0.5,
+            "required_cpu": 0.5,
+            "required_gpu": 0.0,
+            "priority": 2,
+            "cluster_id": test_cluster["id"],
+            "ref": ref,
+            **fields
+        }
+    # A chain: top depends on middle, which depends on bottom
+    batch = {"deployments": [item("bottom"), item("middle", dependency_refs=["bottom"]), item("top", dependency_refs=["middle"])]}
+    response = requests.post(f"{API_URL}/deployments/batch", json=batch, headers=headers)
+    assert response.status_code == 200, response.text
+    bottom, middle, top = (r["id"] for r in response.json()["results"])
+
+    def update(deployment_id, dependency_ids):
+        return requests.put(
+            f"{API_URL}/deployments/{deployment_id}", json={"dependency_ids": dependency_ids}, headers=headers
+        )
+
+    # Direct and transitive cycles are caught, wherever they sit in the list
+    for dependency_ids in ([middle], [top], [test_deployment["id"], top]):
+        response = update(bottom, dependency_ids)
+        assert response.status_code == 400, response.text
+        assert response.json()["detail"] == "Circular dependency detected"
+    response = update(bottom, [bottom])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "A deployment cannot depend on itself"
+    response = update(bottom, [test_deployment["id"], 999999])
+    assert response.status_code == 404
+    # Depending on a deployment that is already a transitive dependency is fine
+    response = update(top, [middle, bottom])
+    assert response.status_code == 200, response.text
+    assert sorted(d["id"] for d in response.json()["dependencies"]) == sorted([middle, bottom])
+    response = update(bottom, [test_deployment["id"]])
+    assert response.status_code == 200, response.text
+    # Cleanup
+    for deployment_id in (top, middle, bottom):
+        del_resp = requests.delete(f"{API_URL}/deployments/{deployment_id}", headers=headers)
+        assert del_resp.status_code == 200
+
+def test_get_deployment_graph(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    def item(ref, **fields):
+        return {
+            "name": unique_deployment_name() + f"_{ref}",
+            "docker_image": "test/image:latest",
+            "required_ram": 0.5,
+            "required_cpu": 0.5,
+            "required_gpu": 0.0,
+            "priority": 2,
+            "cluster_id": test_cluster["id"],
+            "ref": ref,
+            **fields
+        }
+    # A diamond: top depends on left and right, which both depend on base
+    batch = {"deployments": [
+        item("base"),
+        item("left", dependency_refs=["base"]),
+        item("right", dependency_refs=["base"]),
+        item("top", dependency_refs=["left", "right"]),
+    ]}
+    response = requests.post(f"{API_URL}/deployments/batch", json=batch, headers=headers)
+    assert response.status_code == 200, response.text
+    base, left, right, top = (r["id"] for r in response.json()["results"])
+
+    def graph(deployment_id, **params):
+        response = requests.get(f"{API_URL}/deployments/{deployment_id}/graph", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    upstream = graph(top)
+    nodes = {node["id"]: node for node in upstream["nodes"]}
+    assert [node["id"] for node in upstream["nodes"]] == [top, left, right, base]
+    assert {n: nodes[n]["depth"] for n in nodes} == {top: 0, left: 1, right: 1, base: 2}
+    assert nodes[top]["dependency_ids"] == [left, right]
+    assert nodes[left]["dependency_ids"] == [base] and nodes[base]["dependency_ids"] == []
+    assert nodes[base]["status"] == "pending" and nodes[base]["priority"] == 2
+    assert upstream["critical_path"] == [base, left]
+    # The depth limit cuts the walk short
+    shallow = graph(top, max_depth=1)
+    assert [node["id"] for node in shallow["nodes"]] == [top, left, right]
+    assert shallow["critical_path"] == [left]
+    downstream = graph(base, direction="downstream")
+    nodes = {node["id"]: node for node in downstream["nodes"]}
+    assert {n: nodes[n]["depth"] for n in nodes} == {base: 0, left: 1, right: 1, top: 2}
+    assert nodes[top]["dependency_ids"] == [left, right]
+    assert downstream["critical_path"] is None
+    # Completed dependencies no longer block
+    assert requests.post(f"{API_URL}/deployments/{base}/start", headers=headers).status_code == 200
+    assert requests.post(f"{API_URL}/deployments/{base}/stop", headers=headers).status_code == 200
+    assert graph(top)["critical_path"] == [left]
+    response = requests.get(f"{API_URL}/deployments/999999/graph", headers=headers)
+    assert response.status_code == 404
+    # Cleanup
+    for deployment_id in (top, left, right, base):
+        del_resp = requests.delete(f"{API_URL}/deployments/{deployment_id}", headers=headers)
+        assert del_resp.status_code == 200
+
+def test_finished_at_is_set_on_terminal_states(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    def create():
+        response = requests.post(f"{API_URL}/deployments/", json={
+            "name": unique_deployment_name(),
+            "docker_image": "test/image:latest",
+            "required_ram": 0.5,
+            "required_cpu": 0.5,
+            "required_gpu": 0.0,
+            "priority": 2,
+            "cluster_id": test_cluster["id"]
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["finished_at"] is None
+        return response.json()["id"]
+    stopped, cancelled = create(), create()
+    response = requests.post(f"{API_URL}/deployments/{stopped}/start", headers=headers)
+    assert response.status_code == 200 and response.json()["finished_at"] is None
+    response = requests.post(f"{API_URL}/deployments/{stopped}/stop", headers=headers)
+    assert response.status_code == 200 and response.json()["finished_at"] is not None
+    response = requests.post(f"{API_URL}/deployments/bulk/cancel", json={"deployment_ids": [cancelled]}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert requests.get(f"{API_URL}/deployments/{cancelled}", headers=headers).json()["finished_at"] is not None
+    # Cleanup
+    for deployment_id in (stopped, cancelled):
+        del_resp = requests.delete(f"{API_URL}/deployments/{deployment_id}", headers=headers)
+        assert del_resp.status_code == 200
+
+
+def test_deployment_events(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = requests.post(f"{API_URL}/deployments/", json={
+        "name": unique_deployment_name(),
+        "docker_image": "test/image:latest",
+        "required_ram": 0.5,
+        "required_cpu": 0.5,
+        "required_gpu": 0.0,
+        "priority": 2,
+        "cluster_id": test_cluster["id"]
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    deployment_id = response.json()["id"]
+    assert requests.post(f"{API_URL}/deployments/{deployment_id}/start", headers=headers).status_code == 200
+    response = requests.put(f"{API_URL}/deployments/{deployment_id}", json={"status": "failed"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "failed"
+    
+    response = requests.get(f"{API_URL}/deployments/{deployment_id}/events", headers=headers)
+    assert response.status_code == 200, response.text
+    assert [(e["from_status"], e["to_status"], e["actor"], e["reason"]) for e in response.json()] == [
+        (None, "pending", "api", "submitted"),
+        ("pending", "running", "api", "started"),
+        ("running", "failed", "api", "updated"),
+    ]
+    assert requests.get(f"{API_URL}/deployments/999999/events", headers=headers).status_code == 404
+    # Cleanup
+    del_resp = requests.delete(f"{API_URL}/deployments/{deployment_id}", headers=headers)
+    assert del_resp.status_code == 200
+
+def test_update_deployment_if_match(auth_token, test_deployment):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    url = f"{API_URL}/deployments/{test_deployment['id']}"
+    response = requests.get(url, headers=headers)
+    etag = response.headers["ETag"]
+    assert etag == f'"{response.json()["version"]}"'
+    
+    response = requests.put(url, json={"name": unique_deployment_name()}, headers={**headers, "If-Match": etag})
+    assert response.status_code == 200, response.text
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+    
+    # A start bumps the version too, so an update based on what was read before it is refused
+    assert requests.post(f"{url}/start", headers=headers).status_code == 200
+    response = requests.put(url, json={"required_ram": 0.25}, headers={**headers, "If-Match": new_etag})
+    assert response.status_code == 412, response.text
+    assert requests.get(url, headers=headers).json()["required_ram"] == test_deployment["required_ram"]
+    assert requests.put(url, json={"priority": 1}, headers={**headers, "If-Match": f"W/{new_etag}"}).status_code == 412
@@ -0,0 +1,177 @@
+import pytest
+import requests
+import time
+
+API_URL = "http://localhost:8000"
+
+def unique_username():
+    return f"testuser_{int(time.time() * 1000)}"
+
+def unique_email():
+    return f"test_{int(time.time() * 1000)}@example.com"
+
+def unique_org_name():
+    return f"TestOrg_{int(time.time() * 1000)}"
+
+def unique_cluster_name():
+    return f"TestCluster_{int(time.time() * 1000)}"
+
+def unique_deployment_name():
+    return f"TestDeployment_{int(time.time() * 1000)}"
+
+@pytest.fixture
+def test_user():
+    return {
+        "username": unique_username(),
+        "email": unique_email(),
+        "password": "testpassword123"
+    }
+
+@pytest.fixture
+def register_user(test_user):
+    response = requests.post(f"{API_URL}/register", json=test_user)
+    assert response.status_code == 200, response.text
+    user = response.json()
+    yield test_user
+
+@pytest.fixture
+def auth_token(test_user, register_user):
+    data = {"username": test_user["username"], "password": test_user["password"]}
+    response = requests.post(f"{API_URL}/token", data=data)
+    assert response.status_code == 200, response.text
+    token = response.json()["access_token"]
+    return token
+
+@pytest.fixture
+def test_org(auth_token):
+    org_name = unique_org_name()
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = requests.post(f"{API_URL}/organizations/", json={"name": org_name}, headers=headers)
+    assert response.status_code == 200, response.text
+    org = response.json()
+    yield org
+    # Delete organization after test
+    del_resp = requests.delete(f"{API_URL}/organizations/{org['id']}", headers=headers)
+    assert del_resp.status_code == 200
+
+@pytest.fixture
+def test_cluster(auth_token, test_org):
+    cluster_data = {
+        "name": unique_cluster_name(),
+        "total_ram": 8.0,
+        "total_cpu": 4.0,
+        "total_gpu": 1.0,
+        "organization_id": test_org["id"]
+    }
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = requests.post(f"{API_URL}/clusters/", json=cluster_data, headers=headers)
+    assert response.status_code == 200, response.text
+    cluster = response.json()
+    yield cluster
+    # Delete cluster after test
+    del_resp = requests.delete(f"{API_URL}/clusters/{cluster['id']}", headers=headers)
+    assert del_resp.status_code == 200
+
+def unique_group_name():
+    return f"TestGroup_{int(time.time() * 1000)}"
+
+def group_member(cpu):
+    return {
+        "name": unique_deployment_name(),
+        "docker_image": "test/image:latest",
+        "required_ram": 1.0,
+        "required_cpu": cpu,
+        "required_gpu": 0.0
+    }
+
+def test_create_deployment_group(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    group_data = {
+        "name": unique_group_name(),
+        "cluster_id": test_cluster["id"],
+        "priority": 2,
+        "deployments": [group_member(1.0), group_member(1.0)]
+    }
+    response = requests.post(f"{API_URL}/deployment-groups/", json=group_data, headers=headers)
+    assert response.status_code == 200, response.text
+    group = response.json()
+    assert len(group["deployments"]) == 2
+    assert all(d["group_id"] == group["id"] for d in group["deployments"])
+    assert all(d["status"] == "pending" for d in group["deployments"])
+    # Cleanup
+    for d in group["deployments"]:
+        del_resp = requests.delete(f"{API_URL}/deployments/{d['id']}", headers=headers)
+        assert del_resp.status_code == 200
+
+def test_create_deployment_group_larger_than_cluster(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    group_data = {
+        "name": unique_group_name(),
+        "cluster_id": test_cluster["id"],
+        "deployments": [group_member(2.0), group_member(2.0), group_member(2.0)]
+    }
+    response = requests.post(f"{API_URL}/deployment-groups/", json=group_data, headers=headers)
+    assert response.status_code == 400, response.text
+
+def test_start_deployment_group_all_or_nothing(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    # Occupy one of the cluster's 4 CPUs
+    blocker_data = group_member(1.0)
+    blocker_data.update({"priority": 2, "cluster_id": test_cluster["id"]})
+    blocker_resp = requests.post(f"{API_URL}/deployments/", json=blocker_data, headers=headers)
+    assert blocker_resp.status_code == 200, blocker_resp.text
+    blocker = blocker_resp.json()
+    start_blocker = requests.post(f"{API_URL}/deployments/{blocker['id']}/start", headers=headers)
+    assert start_blocker.status_code == 200, start_blocker.text
+    # A group needing all 4 CPUs
+    group_data = {
+        "name": unique_group_name(),
+        "cluster_id": test_cluster["id"],
+        "deployments": [group_member(2.0), group_member(2.0)]
+    }
+    group_resp = requests.post(f"{API_URL}/deployment-groups/", json=group_data, headers=headers)
+    assert group_resp.status_code == 200, group_resp.text
+    group = group_resp.json()
+    # Starting one member tries to start the whole group, which doesn't fit
+    member_id = group["deployments"][0]["id"]
+    start_resp = requests.post(f"{API_URL}/deployments/{member_id}/start", headers=headers)
+    assert start_resp.status_code == 400, start_resp.text
+    group = requests.get(f"{API_URL}/deployment-groups/{group['id']}", headers=headers).json()
+    assert all(d["status"] == "pending" for d in group["deployments"])
+    cluster = requests.get(f"{API_URL}/clusters/{test_cluster['id']}", headers=headers).json()
+    assert cluster["available_cpu"] == 3.0
+    # Once the capacity is released the whole group starts
+    stop_blocker = requests.post(f"{API_URL}/deployments/{blocker['id']}/stop", headers=headers)
+    assert stop_blocker.status_code == 200, stop_blocker.text
+    start_group = requests.post(f"{API_URL}/deployment-groups/{group['id']}/start", headers=headers)
+    assert start_group.status_code == 200, start_group.text
+    assert all(d["status"] == "running" for d in start_group.json()["deployments"])
+    cluster = requests.get(f"{API_URL}/clusters/{test_cluster['id']}", headers=headers).json()
+    assert cluster["available_cpu"] == 0.0
+    # Cleanup
+    for d in group["deployments"]:
+        del_resp = requests.delete(f"{API_URL}/deployments/{d['id']}", headers=headers)
+        assert del_resp.status_code == 200
+    del_resp = requests.delete(f"{API_URL}/deployments/{blocker['id']}", headers=headers)
+    assert del_resp.status_code == 200
+
+def test_cancel_deployment_group_member(auth_token, test_cluster):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    group_data = {
+        "name": unique_group_name(),
+        "cluster_id": test_cluster["id"],
+        "deployments": [group_member(1.0), group_member(1.0)]
+    }
+    group_resp = requests.post(f"{API_URL}/deployment-groups/", json=group_data, headers=headers)
+    assert group_resp.status_code == 200, group_resp.text
+    group = group_resp.json()
+    # Cancelling one member cancels the rest of the group
+    member_id = group["deployments"][0]["id"]
+    cancel_resp = requests.post(f"{API_URL}/deployments/{member_id}/cancel", headers=headers)
+    assert cancel_resp.status_code == 200, cancel_resp.text
+    group = requests.get(f"{API_URL}/deployment-groups/{group['id']}", headers=headers).json()
+    assert all(d["status"] == "cancelled" for d in group["deployments"])
+    # Cleanup
+    for d in group["deployments"]:
+        del_resp = requests.delete(f"{API_URL}/deployments/{d['id']}", headers=headers)
+        assert del_resp.status_code == 200
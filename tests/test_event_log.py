@@ -0,0 +1,126 @@
+"""
+The deployment event log and the wait-time stats built on it.
+
+The scheduler and the services are driven directly, and the events they
+write inspected.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from src.models.models import Cluster, DeploymentEvent, DeploymentPriority, DeploymentStatus, Organization, TransitionActor
+from src.models.schemas import DeploymentStatusEnum, DeploymentUpdate
+from src.scheduler.scheduler import DeploymentScheduler
+from src.services import deployment as deployment_service
+from src.services import event_log
+
+PENDING, RUNNING = DeploymentStatus.PENDING, DeploymentStatus.RUNNING
+API, SCHEDULER, PREEMPTION = TransitionActor.API, TransitionActor.SCHEDULER, TransitionActor.PREEMPTION
+
+
+@pytest.fixture
+def seeded(seeded, session_factory):
+    """Also a cluster of an organization the user isn't in."""
+    db = session_factory()
+    other_org = Organization(name="other-org", invite_code="other")
+    db.add(other_org)
+    db.flush()
+    other_cluster = Cluster(
+        name="other",
+        total_ram=4.0, total_cpu=4.0, total_gpu=0.0,
+        available_ram=4.0, available_cpu=4.0, available_gpu=0.0,
+        total_ram_mib=4096, total_cpu_millicores=4000, total_gpu_milli=0,
+        organization_id=other_org.id, creator_id=seeded["user"]
+    )
+    db.add(other_cluster)
+    db.commit()
+    ids = {**seeded, "other_cluster": other_cluster.id}
+    db.close()
+    return ids
+
+
+def transitions(db, deployment_id):
+    return [
+        (e.from_status, e.to_status, e.actor, e.reason)
+        for e in event_log.get_deployment_events(db, deployment_id)
+    ]
+
+
+def test_every_transition_is_logged(session_factory, seeded, create):
+    db = session_factory()
+
+    # Started and stopped through the API, which starts its dependent
+    dependency = create(db, "dependency")
+    dependent = create(db, "dependent", 1.0, [dependency])
+    assert deployment_service.start_deployment(db, dependency)
+    assert deployment_service.stop_deployment(db, dependency)
+
+    # Started by the scheduler, then preempted for a high priority one
+    low = create(db, "low", 3.0, priority=1)
+    scheduler = DeploymentScheduler(db)
+    assert scheduler.schedule_cluster_deployments(seeded["cluster"])["scheduled"] == 1
+    # A start that doesn't fit leaves no trace
+    too_big = create(db, "too-big", 2.0)
+    assert deployment_service.start_deployment(db, too_big) is None
+    deployment_service.cancel_deployment(db, too_big)
+    high = create(db, "high", 2.0, priority=3)
+    assert scheduler.schedule_cluster_deployments(seeded["cluster"])["preempted"] == 1
+
+    # And a status change through an update
+    deployment_service.update_deployment(db, dependent, DeploymentUpdate(status=DeploymentStatusEnum.FAILED))
+
+    submitted = (None, PENDING, API, "submitted")
+    assert transitions(db, dependency) == [
+        submitted, (PENDING, RUNNING, API, "started"), (RUNNING, DeploymentStatus.COMPLETED, API, "stopped")
+    ]
+    assert transitions(db, dependent) == [
+        submitted, (PENDING, RUNNING, SCHEDULER, "dependencies_met"), (RUNNING, DeploymentStatus.FAILED, API, "updated")
+    ]
+    assert transitions(db, low) == [
+        submitted, (PENDING, RUNNING, SCHEDULER, "scheduled"), (RUNNING, DeploymentStatus.FAILED, PREEMPTION, "preempted")
+    ]
+    assert transitions(db, too_big) == [submitted, (PENDING, DeploymentStatus.CANCELLED, API, "cancelled")]
+    assert transitions(db, high) == [submitted, (PENDING, RUNNING, SCHEDULER, "scheduled")]
+
+    # Events carry what the stats need without the deployment
+    event = db.scalars(select(DeploymentEvent).where(DeploymentEvent.deployment_id == high)).all()[-1]
+    assert (event.cluster_id, event.priority) == (seeded["cluster"], DeploymentPriority.HIGH)
+    db.close()
+
+
+def test_wait_time_percentiles(session_factory, seeded, client):
+    db = session_factory()
+    now = datetime.utcnow()
+    cluster = seeded["cluster"]
+    def log(deployment_id, priority, from_status, to_status, at, cluster_id=cluster):
+        event_log.record_transitions(db, [(deployment_id, cluster_id, priority)], from_status, to_status, API, "test", at)
+
+    # HIGH deployments that waited 1..100 seconds, and a MEDIUM one that
+    # waited 5 since it was last put back to pending
+    for wait in range(1, 101):
+        log(wait, DeploymentPriority.HIGH, None, PENDING, now - timedelta(seconds=wait))
+        log(wait, DeploymentPriority.HIGH, PENDING, RUNNING, now)
+    log(101, DeploymentPriority.MEDIUM, None, PENDING, now - timedelta(minutes=10))
+    log(101, DeploymentPriority.MEDIUM, RUNNING, PENDING, now - timedelta(seconds=5))
+    log(101, DeploymentPriority.MEDIUM, PENDING, RUNNING, now)
+    # Not counted: submitted before the log existed, started too long ago, or on someone else's cluster
+    log(102, DeploymentPriority.LOW, PENDING, RUNNING, now)
+    log(103, DeploymentPriority.LOW, None, PENDING, now - timedelta(days=3))
+    log(103, DeploymentPriority.LOW, PENDING, RUNNING, now - timedelta(days=2))
+    log(104, DeploymentPriority.LOW, None, PENDING, now - timedelta(seconds=1), seeded["other_cluster"])
+    log(104, DeploymentPriority.LOW, PENDING, RUNNING, now, seeded["other_cluster"])
+    db.commit()
+    db.close()
+
+    response = client.get("/deployments/stats/wait-times")
+    assert response.status_code == 200, response.text
+    assert response.json()["priorities"] == [
+        {"priority": 3, "count": 100, "p50": 50.0, "p90": 90.0, "p99": 99.0},
+        {"priority": 2, "count": 1, "p50": 5.0, "p90": 5.0, "p99": 5.0},
+    ]
+
+    response = client.get("/deployments/stats/wait-times", params={"since": (now - timedelta(days=7)).isoformat()})
+    assert [p["priority"] for p in response.json()["priorities"]] == [3, 2, 1]
+    assert client.get("/deployments/stats/wait-times", params={"cluster_id": cluster}).json()["cluster_id"] == cluster
+    assert client.get("/deployments/stats/wait-times", params={"cluster_id": seeded["other_cluster"]}).status_code == 403
@@ -0,0 +1,165 @@
+"""
+History compaction and the history endpoints.
+
+The compaction job is run directly, against deployments that finished
+long ago.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from src.models.models import (
+    Deployment, DeploymentHistory, DeploymentStatus, deployment_dependencies, deployment_history_dependencies
+)
+from src.services import history as history_service
+from src.utils.migrations import run_migrations
+
+RETENTION = timedelta(days=30)
+
+
+@pytest.fixture
+def seeded(seeded, session_factory):
+    """The user's deployments in every situation the compaction job distinguishes, by name."""
+    db = session_factory()
+    now = datetime.utcnow()
+    long_ago = now - 2 * RETENTION
+
+    def deployment(name, status, finished_at=None, created_at=long_ago):
+        return Deployment(
+            name=name, docker_image="test/image:latest",
+            required_ram=1.0, required_cpu=1.0, required_gpu=0.0,
+            status=status, finished_at=finished_at, created_at=created_at,
+            cluster_id=seeded["cluster"], user_id=seeded["user"]
+        )
+
+    deployments = {
+        "old": deployment("old", DeploymentStatus.COMPLETED, long_ago),
+        "old_dependency": deployment("old_dependency", DeploymentStatus.COMPLETED, long_ago),
+        "cancelled": deployment("cancelled", DeploymentStatus.CANCELLED, long_ago),
+        "recent": deployment("recent", DeploymentStatus.COMPLETED, now - timedelta(days=1), created_at=now),
+        # Something unfinished still depends on it
+        "blocker": deployment("blocker", DeploymentStatus.FAILED, long_ago),
+        "waiting": deployment("waiting", DeploymentStatus.PENDING),
+        "running": deployment("running", DeploymentStatus.RUNNING),
+    }
+    deployments["old"].dependencies.append(deployments["old_dependency"])
+    deployments["recent"].dependencies.append(deployments["old"])
+    deployments["waiting"].dependencies.append(deployments["blocker"])
+    db.add_all(deployments.values())
+    db.commit()
+    ids = {name: d.id for name, d in deployments.items()}
+    db.close()
+    return ids
+
+
+def test_compaction_moves_only_finished_deployments(session_factory, seeded):
+    db = session_factory()
+    # Small batches, so the job has to loop
+    assert history_service.compact_history(db, RETENTION, batch_size=2) == 3
+
+    archived = {"old", "old_dependency", "cancelled"}
+    live_ids = set(db.scalars(select(Deployment.id)))
+    assert live_ids == {seeded[name] for name in seeded if name not in archived}
+    entries = {entry.id: entry for entry in db.scalars(select(DeploymentHistory))}
+    assert set(entries) == {seeded[name] for name in archived}
+    assert entries[seeded["old"]].status == DeploymentStatus.COMPLETED
+    assert entries[seeded["cancelled"]].status == DeploymentStatus.CANCELLED
+
+    # Edges touching archived deployments moved with them; the rest stayed
+    assert set(db.execute(select(deployment_history_dependencies))) == {
+        (seeded["old"], seeded["old_dependency"]),
+        (seeded["recent"], seeded["old"]),
+    }
+    assert set(db.execute(select(deployment_dependencies))) == {(seeded["waiting"], seeded["blocker"])}
+
+    # Nothing left to do
+    assert history_service.compact_history(db, RETENTION) == 0
+    assert db.scalar(select(func.count()).select_from(DeploymentHistory)) == 3
+    db.close()
+
+
+def test_history_endpoints(session_factory, seeded, client):
+    db = session_factory()
+    history_service.compact_history(db, RETENTION)
+    db.close()
+
+    response = client.get("/deployments/history", params={"limit": 2})
+    assert response.status_code == 200, response.text
+    first_page = [entry["id"] for entry in response.json()]
+    response = client.get("/deployments/history", params={"cursor": response.headers["X-Next-Cursor"]})
+    assert response.status_code == 200, response.text
+    assert first_page + [entry["id"] for entry in response.json()] == sorted(
+        seeded[name] for name in ("old", "old_dependency", "cancelled")
+    )
+
+    response = client.get("/deployments/history", params={"status": "cancelled"})
+    assert [entry["id"] for entry in response.json()] == [seeded["cancelled"]]
+    response = client.get("/deployments/history", params={"finished_after": datetime.utcnow().isoformat()})
+    assert response.json() == []
+
+    response = client.get(f"/deployments/history/{seeded['old']}")
+    assert response.status_code == 200, response.text
+    entry = response.json()
+    assert entry["status"] == "completed" and entry["name"] == "old"
+    assert entry["dependency_ids"] == [seeded["old_dependency"]]
+    assert entry["dependent_ids"] == [seeded["recent"]]
+
+    # Archived deployments are gone from the live endpoints
+    assert client.get(f"/deployments/{seeded['old']}").status_code == 404
+    assert client.get(f"/deployments/history/{seeded['running']}").status_code == 404
+
+
+def test_archived_ids_are_never_reused(session_factory):
+    db = session_factory()
+    last = Deployment(
+        name="last", docker_image="test/image:latest", status=DeploymentStatus.COMPLETED,
+        finished_at=datetime.utcnow() - 2 * RETENTION
+    )
+    db.add(last)
+    db.commit()
+    last_id = last.id
+    history_service.compact_history(db, RETENTION)
+
+    # The newest deployment's ID now only exists in the history, and stays its own
+    created = Deployment(name="created", docker_image="test/image:latest")
+    db.add(created)
+    db.commit()
+    assert created.id > last_id
+    assert history_service.get_history_entry(db, last_id)["name"] == "last"
+    db.close()
+
+
+def test_upgrade_continues_after_archived_ids(database_path):
+    engine = create_engine(f"sqlite:///{database_path}")
+    run_migrations(engine, revision="0007")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO deployments (id, status, unmet_dependencies) VALUES (1, 'PENDING', 0)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO deployment_history (id, finished_at, status, archived_at) "
+            "VALUES (5, '2025-01-01 00:00:00', 'COMPLETED', '2025-02-01 00:00:00')"
+        )
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO deployments (status, unmet_dependencies) VALUES ('PENDING', 0)")
+        assert conn.exec_driver_sql("SELECT max(id) FROM deployments").scalar() == 6
+    engine.dispose()
+
+
+def test_upgrade_backfills_finished_at(database_path):
+    engine = create_engine(f"sqlite:///{database_path}")
+    run_migrations(engine, revision="0003")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("""
+            INSERT INTO deployments (id, status, created_at, started_at, unmet_dependencies) VALUES
+                (1, 'COMPLETED', '2025-01-01 00:00:00', '2025-01-02 00:00:00', 0),
+                (2, 'CANCELLED', '2025-01-03 00:00:00', NULL, 0),
+                (3, 'RUNNING', '2025-01-04 00:00:00', '2025-01-05 00:00:00', 0)
+        """)
+    run_migrations(engine)
+    with engine.connect() as conn:
+        finished = dict(conn.exec_driver_sql("SELECT id, finished_at FROM deployments").all())
+    assert finished == {1: "2025-01-02 00:00:00", 2: "2025-01-03 00:00:00", 3: None}
+    engine.dispose()
@@ -0,0 +1,141 @@
+"""
+Authorization by organization membership, resolved once per request.
+
+The checks count the statements each membership check executes. Redis
+isn't needed: the shared cache is replaced by a dict where a test needs it.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.models.models import Organization, User
+from src.models.schemas import OrganizationCreate
+from src.services import organization as org_service
+from src.services import user as user_service
+from src.utils import memberships
+from src.utils.auth import Memberships
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    captured = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *_: captured.append(statement))
+    return captured
+
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    """The shared cache as a dict, with the users whose entries were invalidated."""
+    cache, invalidated = {}, []
+    monkeypatch.setattr(memberships, "get_org_ids", cache.get)
+    monkeypatch.setattr(memberships, "set_org_ids", lambda user_id, org_ids: cache.__setitem__(user_id, frozenset(org_ids)))
+
+    async def get_org_ids_async(user_id):
+        return cache.get(user_id)
+
+    async def set_org_ids_async(user_id, org_ids):
+        cache[user_id] = frozenset(org_ids)
+    monkeypatch.setattr(memberships, "get_org_ids_async", get_org_ids_async)
+    monkeypatch.setattr(memberships, "set_org_ids_async", set_org_ids_async)
+
+    def invalidate(user_ids):
+        for user_id in user_ids:
+            invalidated.append(user_id)
+            cache.pop(user_id, None)
+    monkeypatch.setattr(memberships, "invalidate", invalidate)
+    return cache, invalidated
+
+
+@pytest.fixture
+def seeded(db):
+    """A user in two of three organizations."""
+    orgs = [Organization(name=f"member-{i}", invite_code=f"member-{i}") for i in range(3)]
+    user = User(username="member", email="member@example.com", hashed_password="", is_active=True)
+    user.organizations.extend(orgs[:2])
+    db.add_all(orgs + [user])
+    db.commit()
+    return {"user": user.id, "orgs": [org.id for org in orgs]}
+
+
+def test_checks_query_once_per_organization(db, seeded, statements, monkeypatch):
+    # Nothing shared between requests
+    monkeypatch.setattr(memberships, "get_org_ids", lambda user_id: None)
+    monkeypatch.setattr(memberships, "set_org_ids", lambda user_id, org_ids: None)
+    member, other, outsider = seeded["orgs"]
+    checks = Memberships(seeded["user"])
+    statements.clear()
+
+    assert checks.includes(db, member) and checks.includes(db, member)
+    assert not checks.includes(db, outsider) and not checks.includes(db, outsider)
+    assert not checks.includes(db, None)
+    # One existence query per organization asked about, never the organizations themselves
+    assert len(statements) == 2
+    assert all("EXISTS" in statement and "organizations" not in statement for statement in statements)
+
+    assert checks.org_ids(db) == {member, other}
+    statements.clear()
+    assert checks.includes(db, other) and not checks.includes(db, outsider)
+    assert statements == []
+
+
+def test_shared_cache_answers_without_queries(db, seeded, statements, shared_cache):
+    cache, _ = shared_cache
+    member, other, outsider = seeded["orgs"]
+    assert Memberships(seeded["user"]).org_ids(db) == {member, other}
+    assert cache[seeded["user"]] == {member, other}
+
+    # A later request answers from the shared cache, without touching the database
+    statements.clear()
+    checks = Memberships(seeded["user"])
+    assert checks.includes(db, member) and not checks.includes(db, outsider)
+    assert checks.org_ids(db) == {member, other}
+    assert statements == []
+
+
+def test_membership_changes_invalidate_the_shared_cache(db, seeded, shared_cache):
+    cache, invalidated = shared_cache
+    user_id = seeded["user"]
+    member, _, outsider = seeded["orgs"]
+    Memberships(user_id).org_ids(db)
+
+    assert user_service.join_organization(db, user_id, "member-2")
+    assert invalidated == [user_id] and user_id not in cache
+    assert Memberships(user_id).includes(db, outsider)
+
+    Memberships(user_id).org_ids(db)
+    created = org_service.create_organization(db, OrganizationCreate(name="created"), user_id)
+    assert invalidated == [user_id] * 2 and user_id not in cache
+    assert Memberships(user_id).includes(db, created.id)
+
+    Memberships(user_id).org_ids(db)
+    assert org_service.delete_organization(db, member)
+    assert invalidated == [user_id] * 3 and user_id not in cache
+    assert not Memberships(user_id).includes(db, member)
+
+
+def test_async_checks_never_use_the_blocking_cache(database_path, seeded, shared_cache, monkeypatch):
+    cache, _ = shared_cache
+    def blocking(*args):
+        raise AssertionError("the blocking Redis client was used from an async route")
+    monkeypatch.setattr(memberships, "get_org_ids", blocking)
+    monkeypatch.setattr(memberships, "set_org_ids", blocking)
+    member, other, outsider = seeded["orgs"]
+
+    async def check():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+        async with AsyncSession(async_engine) as db:
+            assert await Memberships(seeded["user"]).org_ids_async(db) == {member, other}
+            assert cache[seeded["user"]] == {member, other}
+            checks = Memberships(seeded["user"])
+            assert await checks.includes_async(db, member) and not await checks.includes_async(db, outsider)
+        await async_engine.dispose()
+    asyncio.run(check())
@@ -0,0 +1,98 @@
+"""
+Upgrading a database created before migrations were introduced.
+
+The database is built at the baseline revision and its migration history
+dropped, like an install that ran Base.metadata.create_all, then filled
+with rows through plain SQL since today's models don't match its schema.
+
+The SQL generated offline for PostgreSQL is checked too, since SQLite
+ignores what only matters there, such as enum types.
+"""
+import io
+import re
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, inspect, text
+
+from src.utils.migrations import BASELINE_REVISION, alembic_config, run_migrations
+
+
+@pytest.fixture
+def engine(database_path):
+    engine = create_engine(f"sqlite:///{database_path}")
+    run_migrations(engine, BASELINE_REVISION)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE alembic_version"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def seeded(engine):
+    """A cluster running one deployment, with a completed one and two pending ones depending on them."""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO organizations (id, name, invite_code) VALUES (1, 'baseline', 'baseline')"
+        ))
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password, is_active) "
+            "VALUES (1, 'baseline', 'baseline@example.com', '', 1)"
+        ))
+        connection.execute(text(
+            "INSERT INTO clusters (id, name, total_ram, total_cpu, total_gpu, available_ram, available_cpu, "
+            "available_gpu, organization_id, creator_id) VALUES (1, 'baseline', 16, 8, 1, 12, 6, 1, 1, 1)"
+        ))
+        for id, name, status in [(1, "running", "RUNNING"), (2, "completed", "COMPLETED"),
+                                  (3, "waiting", "PENDING"), (4, "ready", "PENDING")]:
+            connection.execute(text(
+                "INSERT INTO deployments (id, name, docker_image, status, priority, required_ram, required_cpu, "
+                "required_gpu, cluster_id, user_id) VALUES (:id, :name, 'image', :status, 'MEDIUM', 4, 2, 0, 1, 1)"
+            ), {"id": id, "name": name, "status": status})
+        connection.execute(text(
+            "INSERT INTO deployment_dependencies (dependent_id, dependency_id) VALUES (3, 1), (3, 2), (4, 2)"
+        ))
+
+
+def test_baseline_database_is_upgraded(engine, seeded):
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() == "0008"
+        assert {"resource_allocations", "cluster_leases", "deployment_groups"} <= set(inspect(connection).get_table_names())
+
+        # Only the deployment whose dependencies have all completed is ready
+        assert connection.execute(text("SELECT name, unmet_dependencies FROM deployments ORDER BY id")).all() == [
+            ("running", 0), ("completed", 0), ("waiting", 1), ("ready", 0)
+        ]
+
+        # The running deployment's resources are in the ledger and counted against its cluster
+        assert connection.execute(text(
+            "SELECT deployment_id, cluster_id, ram_mib, cpu_millicores, gpu_milli FROM resource_allocations"
+        )).all() == [(1, 1, 4096, 2000, 0)]
+        assert connection.execute(text(
+            "SELECT total_ram_mib, total_cpu_millicores, total_gpu_milli, allocated_ram_mib, "
+            "allocated_cpu_millicores, allocated_gpu_milli, available_ram, available_cpu FROM clusters"
+        )).one() == (16384, 8000, 1000, 4096, 2000, 0, 12.0, 6.0)
+
+
+def postgresql_sql(revisions):
+    """The SQL `alembic upgrade <revisions> --sql` generates for PostgreSQL."""
+    config = alembic_config()
+    config.output_buffer = io.StringIO()
+    config.set_main_option("sqlalchemy.url", "postgresql://localhost/offline")
+    command.upgrade(config, revisions, sql=True)
+    return config.output_buffer.getvalue()
+
+
+@pytest.mark.parametrize("revisions,created", [
+    # Revision 0001 creates the deployment enums; the tables after it reuse them
+    ("0003:0004", []),
+    ("0004:0005", ["transitionactor"]),
+    # The whole chain renders, with no revision needing a live database
+    ("head", ["deploymentstatus", "deploymentpriority", "transitionactor"]),
+])
+def test_enum_types_are_only_created_once(revisions, created):
+    sql = postgresql_sql(revisions)
+    assert "UPDATE alembic_version" in sql
+    assert re.findall(r"CREATE TYPE (\w+)", sql) == created
@@ -0,0 +1,125 @@
+"""
+Query-count guards for the list endpoints.
+
+The API router is served by a TestClient (see tests/conftest.py). Each
+check requests the same endpoint for a small and a large result, counts
+the statements executed for each, and fails if the count grows with the
+size of the result, i.e. if a response lazy-loads something per row. The
+database is seeded once for the module, so it isn't rebuilt per check.
+"""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models.models import Cluster, Deployment, DeploymentGroup, DeploymentStatus, Organization, User
+from src.utils.auth import create_access_token
+from src.utils.migrations import run_migrations
+
+SMALL = 3
+LARGE = 30
+
+
+@pytest.fixture(scope="module")
+def engines(tmp_path_factory):
+    path = tmp_path_factory.mktemp("query_counts") / "counts.db"
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield engine, async_engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def seeded(engines):
+    """Two users, each with its own organizations, clusters, deployments and a group, SMALL and LARGE of each."""
+    engine, _ = engines
+    db = sessionmaker(bind=engine)()
+    seeded = {}
+    for size in (SMALL, LARGE):
+        user = User(username=f"counts-{size}", email=f"counts-{size}@example.com", hashed_password="", is_active=True)
+        orgs = [Organization(name=f"counts-{size}-{i}", invite_code=f"c{size}-{i}") for i in range(size)]
+        user.organizations.extend(orgs)
+        db.add(user)
+        db.flush()
+
+        clusters = [
+            Cluster(
+                name=f"counts-{size}-{i}",
+                total_ram=64.0, total_cpu=16.0, total_gpu=0.0,
+                available_ram=64.0, available_cpu=16.0, available_gpu=0.0,
+                organization_id=orgs[i].id, creator_id=user.id
+            )
+            for i in range(size)
+        ]
+        db.add_all(clusters)
+        db.flush()
+
+        def deployment(name, **kwargs):
+            return Deployment(
+                name=name, docker_image="test/image:latest",
+                required_ram=1.0, required_cpu=1.0, required_gpu=0.0,
+                status=DeploymentStatus.COMPLETED, cluster_id=clusters[0].id, user_id=user.id,
+                **kwargs
+            )
+
+        # A hub every other deployment depends on, and that depends on all of them
+        hub = deployment(f"counts-{size}-hub")
+        spokes = [deployment(f"counts-{size}-{i}") for i in range(size)]
+        hub.dependencies.extend(spokes)
+        hub.dependents.extend(spokes)
+        group = DeploymentGroup(name=f"counts-{size}", cluster_id=clusters[0].id, user_id=user.id)
+        group.deployments.extend(deployment(f"counts-{size}-member-{i}") for i in range(size))
+        db.add_all([hub, group])
+        db.commit()
+
+        seeded[size] = {"username": user.username, "hub": hub.id, "group": group.id}
+    db.close()
+    return seeded
+
+
+@pytest.fixture(scope="module")
+def client(engines, make_client):
+    return make_client(*engines)
+
+
+def count_queries(engines, client, username, path):
+    """Request `path` as `username` and return the number of statements it executed."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    targets = [engine.sync_engine if hasattr(engine, "sync_engine") else engine for engine in engines]
+    for target in targets:
+        event.listen(target, "before_cursor_execute", capture)
+    try:
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+        response = client.get(path, headers=headers)
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", capture)
+
+    assert response.status_code == 200, response.text
+    return len(statements), response.json()
+
+
+@pytest.mark.parametrize("path,expected_items", [
+    # The hub, its spokes and the group's members
+    ("/deployments/", lambda size: 2 * size + 1),
+    ("/clusters/", lambda size: size),
+    ("/organizations/", lambda size: size),
+    ("/deployments/{hub}/dependencies", lambda size: size),
+    ("/deployments/{hub}/dependents", lambda size: size),
+    ("/deployment-groups/{group}", lambda size: size),
+    # The hub and its spokes depend on each other, so the walk must also stop at cycles
+    ("/deployments/{hub}/graph", lambda size: size + 1),
+    ("/deployments/{hub}/graph?direction=downstream", lambda size: size + 1),
+])
+def test_query_count_does_not_grow_with_results(engines, client, seeded, path, expected_items):
+    counts = {}
+    for size in (SMALL, LARGE):
+        counts[size], body = count_queries(engines, client, seeded[size]["username"], path.format(**seeded[size]))
+        items = body.get("deployments", body.get("nodes")) if isinstance(body, dict) else body
+        assert len(items) == expected_items(size)
+    assert counts[SMALL] == counts[LARGE], counts
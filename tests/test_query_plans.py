@@ -0,0 +1,189 @@
+"""
+Query-plan checks for the scheduler's and the API's deployment lookups.
+
+Unlike the API tests, these run in-process against a SQLite database built
+by the Alembic migrations and filled with QUERY_PLAN_ROWS deployments
+(1,000,000 by default; lower it for a quick run). Each check runs the real
+query through the service or scheduler code, captures the SQL it emits and
+asserts that SQLite's plan searches the expected index rather than scanning
+the table or sorting the result.
+"""
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.models.models import DeploymentStatus, Deployment
+from src.models.schemas import DependencyDirectionEnum, DeploymentStatusEnum
+from src.scheduler.scheduler import DeploymentScheduler
+from src.services import deployment as deployment_service
+from src.services import event_log
+from src.services import history as history_service
+from src.services import organization as org_service
+from src.utils.migrations import run_migrations
+
+QUERY_PLAN_ROWS = int(os.getenv("QUERY_PLAN_ROWS", "1000000"))
+CLUSTERS = 100
+USERS = 500
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp("query_plans") / "plans.db"
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+
+    # Mostly finished deployments, like a long-lived installation
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"""
+            INSERT INTO deployments (
+                name, docker_image, status, priority, required_ram, required_cpu, required_gpu,
+                cluster_id, user_id, created_at, unmet_dependencies
+            )
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {QUERY_PLAN_ROWS})
+            SELECT
+                'deployment-' || i, 'test/image:latest',
+                CASE i % 20 WHEN 0 THEN 'PENDING' WHEN 1 THEN 'RUNNING' WHEN 2 THEN 'FAILED' ELSE 'COMPLETED' END,
+                CASE i % 3 WHEN 0 THEN 'LOW' WHEN 1 THEN 'MEDIUM' ELSE 'HIGH' END,
+                1.0, 1.0, 0.0,
+                i % {CLUSTERS} + 1, i % {USERS} + 1,
+                datetime('now', '-' || (i % 86400) || ' seconds'),
+                CASE WHEN i % 7 = 0 THEN 1 ELSE 0 END
+            FROM n
+        """)
+        conn.exec_driver_sql("""
+            INSERT INTO deployment_dependencies (dependent_id, dependency_id)
+            SELECT id, id - 1 FROM deployments WHERE id % 7 = 0
+        """)
+        conn.exec_driver_sql("ANALYZE")
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def query_plans(engine, run):
+    """Run `run` and return the SQLite query plan of every statement it executes."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert statements, "no statements captured"
+    plans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            plans.append([row[-1] for row in rows])
+    return plans
+
+
+def assert_uses_index(plan, table, index):
+    details = "\n".join(plan)
+    assert any(
+        step.startswith(f"SEARCH {table} USING") and f"INDEX {index} " in f"{step} "
+        for step in plan
+    ), details
+    assert not any(step.startswith(f"SCAN {table}") for step in plan), details
+    assert not any("TEMP B-TREE" in step for step in plan), details
+
+
+def test_ready_queue_uses_partial_index(engine, db):
+    scheduler = DeploymentScheduler(db)
+    plans = query_plans(engine, lambda: scheduler._query_deployments(
+        42, DeploymentStatus.PENDING, Deployment.unmet_dependencies == 0
+    ))
+    assert_uses_index(plans[0], "deployments", "ix_deployments_ready_queue")
+
+
+def test_pending_deployments_use_partial_index(engine, db):
+    plans = query_plans(engine, lambda: deployment_service.get_pending_deployments(db, 42, ready_only=True))
+    assert_uses_index(plans[0], "deployments", "ix_deployments_ready_queue")
+
+
+def test_running_set_uses_cluster_status_index(engine, db):
+    scheduler = DeploymentScheduler(db)
+    plans = query_plans(engine, lambda: scheduler._query_deployments(42, DeploymentStatus.RUNNING))
+    assert_uses_index(plans[0], "deployments", "ix_deployments_cluster_status")
+
+
+def test_user_deployments_use_user_index(engine, db):
+    plans = query_plans(engine, lambda: deployment_service.get_user_deployments(db, 7))
+    assert_uses_index(plans[0], "deployments", "ix_deployments_user_page")
+
+
+def test_deployment_pages_seek_user_index(engine, db):
+    # A page deep into a user's history is read from the index, without sorting
+    statement = deployment_service._user_deployments_select(
+        7, after_id=QUERY_PLAN_ROWS // 2, status=DeploymentStatusEnum.COMPLETED
+    ).limit(101)
+    plans = query_plans(engine, lambda: db.execute(statement).all())
+    assert_uses_index(plans[0], "deployments", "ix_deployments_user_page")
+    assert "id>?" in plans[0][0].replace(" ", ""), plans[0]
+
+
+def test_dependents_lookup_uses_dependency_index(engine, db):
+    plans = query_plans(engine, lambda: deployment_service.adjust_dependent_counters(db, 41, -1))
+    assert_uses_index(plans[0], "deployment_dependencies", "ix_deployment_dependencies_dependency_id")
+
+
+def test_cycle_check_walks_dependency_index(engine, db):
+    # One statement, and every step of the walk seeks the index
+    plans = query_plans(engine, lambda: deployment_service.find_dependency_cycles(db, 41, [1, 2]))
+    assert len(plans) == 1
+    assert_uses_index(plans[0], "deployment_dependencies", "ix_deployment_dependencies_dependency_id")
+    recursive_step = plans[0][plans[0].index("RECURSIVE STEP"):]
+    assert_uses_index(recursive_step, "deployment_dependencies", "ix_deployment_dependencies_dependency_id")
+
+
+@pytest.mark.parametrize("direction,index", [
+    (DependencyDirectionEnum.UPSTREAM, "sqlite_autoindex_deployment_dependencies_1"),
+    (DependencyDirectionEnum.DOWNSTREAM, "ix_deployment_dependencies_dependency_id"),
+])
+def test_graph_walk_seeks_edge_index(engine, db, direction, index):
+    # One statement: every step of the walk seeks the edges, and each node is read by primary key
+    plans = query_plans(engine, lambda: deployment_service.get_deployment_graph(db, 41, direction, max_depth=3))
+    assert len(plans) == 1
+    recursive_step = plans[0][plans[0].index("RECURSIVE STEP"):]
+    assert_uses_index(recursive_step, "deployment_dependencies", index)
+    assert not any(step.startswith("SCAN deployments") for step in plans[0]), plans[0]
+
+
+def test_compaction_scan_uses_finished_index(engine, db):
+    # Finished rows are picked from the partial index, not by scanning the live ones
+    plans = query_plans(engine, lambda: history_service._archivable_ids(db, datetime(2000, 1, 1), 1000))
+    assert_uses_index(plans[0], "deployments", "ix_deployments_finished")
+
+
+def test_wait_time_stats_seek_event_indexes(engine, db):
+    # Starts in the window are read from one index, and each one's pending event from the other
+    plans = query_plans(engine, lambda: event_log.get_wait_time_percentiles(
+        db, {1}, datetime(2000, 1, 1), datetime(2000, 1, 2)
+    ))
+    assert_uses_index(plans[0], "deployment_events", "ix_deployment_events_to_status_at")
+    correlated = plans[0][plans[0].index("CORRELATED SCALAR SUBQUERY 1"):]
+    assert_uses_index(correlated, "deployment_events_1", "ix_deployment_events_deployment")
+
+
+def test_membership_checks_use_membership_index(engine, db):
+    # Both answered from the index alone
+    for run in (lambda: org_service.is_member(db, 7, 3), lambda: org_service.get_user_organization_ids(db, 7)):
+        plans = query_plans(engine, run)
+        assert_uses_index(plans[0], "user_organization", "ix_user_organization_user_org")
+        assert any("COVERING INDEX" in step for step in plans[0]), plans[0]
@@ -0,0 +1,126 @@
+"""
+Units of work: composite operations that commit once.
+
+The checks count the commits the engine sees.
+"""
+import pytest
+from sqlalchemy import event, select
+
+from src.models.models import Cluster, Deployment, DeploymentStatus, ResourceAllocation
+from src.models.schemas import DeploymentStatusEnum, DeploymentUpdate
+from src.services import cluster as cluster_service
+from src.services import deployment as deployment_service
+from src.services import transaction
+from src.utils import events
+
+
+@pytest.fixture
+def commits(engine):
+    counted = []
+    event.listen(engine, "commit", lambda *_: counted.append(1))
+    return counted
+
+
+@pytest.fixture
+def cluster_size():
+    """A 2 GB, 2 CPU cluster, small enough to fill with a couple of deployments."""
+    return 2.0
+
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = []
+    monkeypatch.setattr(events, "publish_cluster_event", lambda cluster_id, reason: sent.append((cluster_id, reason)))
+    return sent
+
+
+def status(db, deployment_id):
+    return db.scalar(select(Deployment.status).where(Deployment.id == deployment_id))
+
+
+def ledger(db):
+    return set(db.scalars(select(ResourceAllocation.deployment_id)))
+
+
+def test_stop_and_cascade_commit_once(session_factory, seeded, create, commits, published):
+    db = session_factory()
+    dependency = create(db, "dependency")
+    dependents = [create(db, f"dependent-{i}", 0.5, [dependency]) for i in range(2)]
+    assert deployment_service.start_deployment(db, dependency)
+    commits.clear()
+    published.clear()
+
+    stopped = deployment_service.stop_deployment(db, dependency)
+    assert stopped.status == DeploymentStatus.COMPLETED
+    assert [status(db, d) for d in dependents] == [DeploymentStatus.RUNNING] * 2
+    assert len(commits) == 1
+    # One event per cluster, after the commit
+    assert published == [(seeded["cluster"], "deployment_stopped")]
+    db.close()
+
+
+def test_unit_of_work_rolls_back_as_a_whole(session_factory, seeded, create, published):
+    db = session_factory()
+    deployment_id = create(db, "rolled-back")
+    published.clear()
+
+    with pytest.raises(RuntimeError):
+        with transaction.unit_of_work(db):
+            assert deployment_service.start_deployment(db, deployment_id)
+            raise RuntimeError("later step failed")
+    assert status(db, deployment_id) == DeploymentStatus.PENDING
+    assert ledger(db) == set()
+    assert db.get(Cluster, seeded["cluster"]).allocated_ram_mib == 0
+    assert published == []
+    db.close()
+
+
+def test_failed_starts_inside_a_unit_of_work_undo_only_themselves(session_factory, seeded, create, commits, monkeypatch):
+    db = session_factory()
+    started = create(db, "started")
+    too_big = create(db, "too-big", 1.5)
+    raced = create(db, "raced")
+    
+    # Another worker cancels the deployment after its start has read it as pending
+    reserve = cluster_service.reserve_deployment_resources
+    def cancel_then_reserve(db, cluster_id, deployments):
+        if [d.id for d in deployments] == [raced]:
+            other = session_factory()
+            deployment_service.cancel_deployment(other, raced)
+            other.close()
+        return reserve(db, cluster_id, deployments)
+    monkeypatch.setattr(cluster_service, "reserve_deployment_resources", cancel_then_reserve)
+
+    with transaction.unit_of_work(db):
+        # Reserves, then fails its claim and hands the reservation back
+        assert deployment_service.start_deployment(db, raced) is None
+        commits.clear()
+        assert deployment_service.start_deployment(db, started)
+        # Doesn't fit next to the first one, so writes nothing
+        assert deployment_service.start_deployment(db, too_big) is None
+
+    assert len(commits) == 1
+    assert [status(db, d) for d in (started, too_big, raced)] == [
+        DeploymentStatus.RUNNING, DeploymentStatus.PENDING, DeploymentStatus.CANCELLED
+    ]
+    assert ledger(db) == {started}
+    assert db.get(Cluster, seeded["cluster"]).allocated_ram_mib == 1024
+    db.close()
+
+
+def test_refused_restart_leaves_counters_and_finished_at(session_factory, seeded, create):
+    db = session_factory()
+    completed = create(db, "completed")
+    dependent = create(db, "dependent", 0.5, [completed])
+    deployment_service.update_deployment(db, completed, DeploymentUpdate(status=DeploymentStatusEnum.COMPLETED))
+    finished_at = db.get(Deployment, completed).finished_at
+    assert db.get(Deployment, dependent).unmet_dependencies == 0
+    
+    # Restarting it doesn't fit next to a deployment holding the whole cluster
+    assert deployment_service.start_deployment(db, create(db, "full", 2.0))
+    updated = deployment_service.update_deployment(db, completed, DeploymentUpdate(status=DeploymentStatusEnum.RUNNING))
+    assert updated.status == DeploymentStatus.COMPLETED
+    db.expire_all()
+    assert db.get(Deployment, completed).finished_at == finished_at
+    assert db.get(Deployment, dependent).unmet_dependencies == 0
+    db.close()